@@ -0,0 +1,185 @@
+import argparse
+import math
+import random
+import time
+import pygame
+from settings import *
+from game import Game
+from objects import get_food_image
+from sprites import get_snake_sprites, get_dead_segment
+
+# 競技場牆：同時進行大量無畫面的電腦競技場對戰，以縮小的格子拼貼在同一個視窗中，用來一次觀察許多局 AI 的行為
+# 每個棋盤各自有一個 Game，直接由它的狀態繪製 (不經過 game_surface 的縮放)；所有棋盤共用同一組縮小的圖塊
+# 各棋盤的 tick 平均分散在不同的幀，每一幀只重繪狀態有變化的棋盤，並只把這些棋盤的區域更新到螢幕
+
+# 所有棋盤共用的縮小圖塊：棋盤格背景、食物、結束時的疊加層 (蛇的圖塊由 sprites.py 依大小快取)
+class WallSprites:
+    def __init__(self, cell):
+        self.cell = cell # 格子大小 (像素)
+        self.background = pygame.Surface((GRID_WIDTH * cell, GRID_HEIGHT * cell)) # 棋盤格背景
+        for y in range(GRID_HEIGHT):
+            for x in range(GRID_WIDTH):
+                color = CHECKERBOARD_COLOR_1 if (x + y) % 2 == 0 else CHECKERBOARD_COLOR_2
+                self.background.fill(color, (x * cell, y * cell, cell, cell))
+        self.finished = pygame.Surface(self.background.get_size(), pygame.SRCALPHA) # 對戰結束的棋盤蓋上的半透明疊加層
+        self.finished.fill(OVERLAY_COLOR)
+        self.foods = {} # 各種食物的圖塊 {食物類型: Surface}
+        for item in FOOD_TYPES:
+            image = get_food_image(item['image'], cell)
+            if image is None:
+                image = pygame.Surface((cell, cell), pygame.SRCALPHA)
+                pygame.draw.circle(image, item['color'], (cell // 2, cell // 2), max(1, cell // 2))
+            self.foods[item['type']] = image
+
+    # 把一個棋盤畫在 surface 的 origin 位置 (與 Game.draw 相同的圖層順序：背景、蛇、食物)
+    def draw_board(self, surface, game, origin):
+        """繪製棋盤"""
+        cell = self.cell
+        x0, y0 = origin
+        surface.blit(self.background, origin)
+        batch = []
+        for snake in game.snakes:
+            corners = [(x0 + c % GRID_WIDTH * cell, y0 + c // GRID_WIDTH * cell) for c in reversed(snake.cells())]
+            if snake.is_dead:
+                dead_segment = get_dead_segment(cell)
+                batch.extend((dead_segment, corner) for corner in corners)
+                continue
+            count = len(corners)
+            sprites = get_snake_sprites(snake.head_color, snake.body_color, cell)
+            segments = list(zip(sprites.palette(count), corners))
+            segments[-1] = (sprites.head(sprites.color(count - 1, count), snake.direction), corners[-1])
+            batch.extend(segments)
+        for food in game.foods:
+            batch.append((self.foods[food.type], (x0 + food.cell % GRID_WIDTH * cell, y0 + food.cell // GRID_WIDTH * cell)))
+        surface.blits(batch, False)
+        if not game.game_active:
+            surface.blit(self.finished, origin)
+
+# 牆上的一個棋盤：一局無畫面的電腦競技場對戰，結束後停留一段時間再重新開始
+class WallBoard:
+    def __init__(self, rect, snakes):
+        self.rect = rect # 在視窗中的位置
+        self.snakes = snakes # AI 蛇的數量
+        self.game = Game(None, None, None) # 無畫面、無音效的遊戲邏輯
+        self.games = 0 # 已開始的局數
+        self.ticks = 0 # 累計執行的 tick 數
+        self.idle_ticks = 0 # 這一局結束後經過的 tick 數
+        self.drawn = None # 上次繪製時的狀態，與目前相同時不需要重繪
+        self.reset()
+
+    # 開始新的一局
+    def reset(self):
+        """開始新的一局"""
+        self.game.reset_game(mode="arena", player_count=self.snakes)
+        self.game.game_active = True
+        self.games += 1
+        self.idle_ticks = 0
+
+    # 前進一個 tick (結束的對戰停留 WALL_RESTART_DELAY 個 tick 後重新開始)
+    def step(self):
+        """前進一個 tick"""
+        if self.game.game_active:
+            self.game.update()
+            self.ticks += 1
+        else:
+            self.idle_ticks += 1
+            if self.idle_ticks >= WALL_RESTART_DELAY:
+                self.reset()
+
+    # 決定畫面內容的狀態 (局數、tick、是否進行中)
+    def state(self):
+        """棋盤狀態"""
+        return (self.games, self.game.scheduler.tick, self.game.game_active)
+
+# 競技場牆：把 boards 個棋盤排成 columns 欄
+class ArenaWall:
+    def __init__(self, boards=WALL_BOARDS, snakes=ARENA_SNAKES, cell=WALL_CELL_SIZE, columns=None, tick_rate=SNAKE_SPEED):
+        self.cell = cell # 格子大小 (像素)
+        self.columns = columns or math.ceil(math.sqrt(boards)) # 每列的棋盤數
+        self.rows = math.ceil(boards / self.columns) # 列數
+        self.tick_rate = tick_rate # 每個棋盤每秒的 tick 數
+        self.phases = max(1, WALL_FPS // tick_rate) # 棋盤的 tick 分散在幾幀中 (每幀只推進其中一組棋盤)
+        board_width, board_height = GRID_WIDTH * cell, GRID_HEIGHT * cell
+        self.size = (self.columns * (board_width + WALL_GAP) + WALL_GAP, self.rows * (board_height + WALL_GAP) + WALL_GAP) # 視窗大小
+        self.boards = [] # 所有棋盤
+        for i in range(boards):
+            row, column = divmod(i, self.columns)
+            x = WALL_GAP + column * (board_width + WALL_GAP)
+            y = WALL_GAP + row * (board_height + WALL_GAP)
+            self.boards.append(WallBoard(pygame.Rect(x, y, board_width, board_height), snakes))
+        self.frames = 0 # 已執行的幀數
+        self.redraws = 0 # 已重繪的棋盤數
+
+    # 執行一幀：推進這一幀輪到的棋盤，重繪有變化的棋盤，回傳需要更新到螢幕的區域
+    def frame(self, surface, sprites):
+        """執行一幀"""
+        for board in self.boards[self.frames % self.phases::self.phases]:
+            board.step()
+        dirty = []
+        for board in self.boards:
+            state = board.state()
+            if state != board.drawn:
+                sprites.draw_board(surface, board.game, board.rect.topleft)
+                board.drawn = state
+                dirty.append(board.rect)
+        self.frames += 1
+        self.redraws += len(dirty)
+        return dirty
+
+    # 開啟視窗並持續執行，直到關閉視窗、按下 Esc 或超過 seconds 秒；空白鍵暫停所有棋盤
+    def run(self, seconds=None):
+        """競技場牆主迴圈"""
+        pygame.display.init()
+        screen = pygame.display.set_mode(self.size)
+        screen.fill(BLACK)
+        pygame.display.flip()
+        sprites = WallSprites(self.cell) # 食物圖片需要顯示模式才能轉換格式
+        clock = pygame.time.Clock()
+        start = report_time = time.perf_counter()
+        report_ticks = 0
+        paused = False
+        running = True
+        while running:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                    running = False
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
+                    paused = not paused
+            if not paused:
+                dirty = self.frame(screen, sprites)
+                if dirty:
+                    pygame.display.update(dirty) # 只把有變化的棋盤更新到螢幕
+            now = time.perf_counter()
+            if now - report_time >= 1.0:
+                ticks = sum(board.ticks for board in self.boards)
+                active = sum(board.game.game_active for board in self.boards)
+                pygame.display.set_caption(f"競技場牆: {active}/{len(self.boards)} 局進行中，{(ticks - report_ticks) / (now - report_time):.0f} tick/秒")
+                report_time, report_ticks = now, ticks
+            if seconds is not None and now - start >= seconds:
+                running = False
+            clock.tick(WALL_FPS)
+        return time.perf_counter() - start
+
+# 以命令列開啟競技場牆
+def main():
+    parser = argparse.ArgumentParser(description="同時觀看大量電腦競技場對戰的競技場牆")
+    parser.add_argument("--boards", type=int, default=WALL_BOARDS, help="同時進行的對戰數量")
+    parser.add_argument("--snakes", type=int, default=ARENA_SNAKES, help="每局的 AI 蛇數量")
+    parser.add_argument("--cell", type=int, default=WALL_CELL_SIZE, help="格子大小 (像素)")
+    parser.add_argument("--columns", type=int, default=None, help="每列的棋盤數 (預設排成接近正方形)")
+    parser.add_argument("--tick-rate", type=int, default=SNAKE_SPEED, help="每個棋盤每秒的 tick 數")
+    parser.add_argument("--seconds", type=float, default=None, help="執行指定秒數後結束並印出統計 (測試用)")
+    parser.add_argument("--seed", type=int, default=None, help="亂數種子")
+    args = parser.parse_args()
+    random.seed(args.seed)
+    wall = ArenaWall(args.boards, args.snakes, args.cell, args.columns, args.tick_rate)
+    elapsed = wall.run(args.seconds)
+    games = sum(board.games for board in wall.boards)
+    ticks = sum(board.ticks for board in wall.boards)
+    print(f"{len(wall.boards)} 個棋盤，{games} 局，{ticks} tick ({ticks / elapsed:.0f} tick/秒)，"
+          f"{wall.frames} 幀 ({wall.frames / elapsed:.1f} 幀/秒)，每幀平均重繪 {wall.redraws / max(1, wall.frames):.1f} 個棋盤")
+    pygame.quit()
+
+# 程式執行入口
+if __name__ == "__main__":
+    main()
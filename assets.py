@@ -0,0 +1,264 @@
+import io
+import os
+import mmap
+import struct
+import hashlib
+import threading
+import pygame
+from settings import *
+from audio import SoundBoard
+
+# 資源封存檔格式 (由 pack_assets.py 產生，小端序)：
+#   標頭  : 魔術字 8 位元組, 版本 (H), 檔案數 (I), 索引長度 (I)
+#   索引  : 每個檔案一筆 [名稱長度 (H), 名稱 (UTF-8, 以 / 分隔的相對路徑), 位移 (Q), 大小 (Q)]
+#   資料  : 各檔案內容依序排列，每個檔案對齊 ARCHIVE_ALIGNMENT 位元組
+ARCHIVE_MAGIC = b'SNAKEPAK' # 封存檔的魔術字
+ARCHIVE_VERSION = 1 # 封存檔格式版本
+ARCHIVE_ALIGNMENT = 16 # 檔案內容的對齊位元組數
+ARCHIVE_HEADER = struct.Struct('<8sHII') # 魔術字, 版本, 檔案數, 索引長度
+ARCHIVE_ENTRY_NAME = struct.Struct('<H') # 名稱長度
+ARCHIVE_ENTRY_RANGE = struct.Struct('<QQ') # 位移, 大小
+
+# 封存檔中單一檔案的唯讀檔案物件，直接讀取記憶體映射的內容而不先複製整個檔案
+class ArchiveView(io.RawIOBase):
+    def __init__(self, data, name):
+        self.data = data # 記憶體映射中這個檔案範圍的 memoryview
+        self.name = name # 檔案名稱 (供 Pygame 判斷格式)
+        self.position = 0 # 目前讀取位置
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    # 將內容讀入呼叫端提供的緩衝區
+    def readinto(self, buffer):
+        """讀取資料"""
+        count = min(len(buffer), len(self.data) - self.position)
+        if count <= 0:
+            return 0
+        buffer[:count] = self.data[self.position:self.position + count]
+        self.position += count
+        return count
+
+    # 移動讀取位置
+    def seek(self, offset, whence=io.SEEK_SET):
+        """移動位置"""
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += len(self.data)
+        self.position = max(0, offset)
+        return self.position
+
+    def tell(self):
+        return self.position
+
+# 以記憶體映射開啟的資源封存檔
+class AssetArchive:
+    def __init__(self, path):
+        self.path = path # 封存檔路徑
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) # 映射後即可關閉檔案
+        self.view = memoryview(self.map)
+        magic, version, count, _ = ARCHIVE_HEADER.unpack_from(self.map, 0)
+        if magic != ARCHIVE_MAGIC or version != ARCHIVE_VERSION:
+            raise ValueError(f"不支援的資源封存檔: {path}")
+        self.entries = {} # 索引 {相對路徑: (位移, 大小)}
+        offset = ARCHIVE_HEADER.size
+        for _ in range(count):
+            (name_length,) = ARCHIVE_ENTRY_NAME.unpack_from(self.map, offset)
+            offset += ARCHIVE_ENTRY_NAME.size
+            name = self.map[offset:offset + name_length].decode('utf-8')
+            offset += name_length
+            self.entries[name] = ARCHIVE_ENTRY_RANGE.unpack_from(self.map, offset)
+            offset += ARCHIVE_ENTRY_RANGE.size
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    # 取得檔案內容的 memoryview (不複製)
+    def read(self, name):
+        """取得檔案內容"""
+        start, size = self.entries[name]
+        return self.view[start:start + size]
+
+    # 開啟檔案，回傳可交給 Pygame 載入的檔案物件
+    def open(self, name):
+        """開啟檔案"""
+        return ArchiveView(self.read(name), name)
+
+_archive = None # 已開啟的資源封存檔
+_archive_checked = False # 是否已經檢查過封存檔
+
+# 取得資源封存檔；不存在 (例如從原始碼執行) 時回傳 None，改用 assets 目錄中的檔案
+def get_archive():
+    """取得資源封存檔"""
+    global _archive, _archive_checked
+    if not _archive_checked:
+        _archive_checked = True
+        if os.path.exists(ASSET_ARCHIVE_PATH):
+            try:
+                _archive = AssetArchive(ASSET_ARCHIVE_PATH)
+            except (OSError, ValueError) as e:
+                print(f"無法開啟資源封存檔: {e}")
+    return _archive
+
+# 將 assets 目錄中的路徑轉換成封存檔中的名稱
+def _archive_name(path):
+    """封存檔名稱"""
+    return os.path.relpath(path, ASSETS_DIR).replace(os.sep, '/')
+
+# 檢查資源是否存在 (封存檔或 assets 目錄)
+def asset_exists(path):
+    """檢查資源是否存在"""
+    archive = get_archive()
+    if archive is not None and _archive_name(path) in archive:
+        return True
+    return os.path.exists(path)
+
+# 開啟資源檔案：優先從封存檔取得零複製的檔案物件，否則開啟 assets 目錄中的檔案
+def open_asset(path):
+    """開啟資源"""
+    archive = get_archive()
+    if archive is not None:
+        name = _archive_name(path)
+        if name in archive:
+            return archive.open(name)
+    return open(path, 'rb')
+
+# 載入圖片資源 (傳入檔名讓 Pygame 判斷圖片格式)
+def load_image(path):
+    """載入圖片"""
+    with open_asset(path) as f:
+        return pygame.image.load(f, os.path.basename(path))
+
+# 字體快取：字體檔案只讀取一次，各種大小在第一次使用時才建立，主選單與遊戲共用
+class FontCache:
+    def __init__(self, path=FONT_PATH):
+        self.path = path # 字體檔案路徑
+        self.data = None # 字體檔案內容 (只讀取一次；使用封存檔時不需要)
+        self.failed = False # 自訂字體是否無法使用 (改用 Pygame 預設字體)
+        self.fonts = {} # 已建立的字體 {大小: Font}
+
+    # 取得指定大小的字體
+    def get(self, size):
+        """取得字體"""
+        font = self.fonts.get(size)
+        if font is None:
+            font = self.fonts[size] = self._load(size)
+        return font
+
+    # 建立指定大小的字體；自訂字體失敗時直接使用 Pygame 預設字體 (不列舉系統字體，避免拖慢啟動)
+    def _load(self, size):
+        """載入字體"""
+        if not self.failed:
+            try:
+                if not asset_exists(self.path):
+                    raise FileNotFoundError(f"找不到字體檔案: {self.path}")
+                # 每個字體需要各自的檔案物件 (Pygame 會在繪製時持續讀取)，共用同一份記憶體中的資料
+                archive = get_archive()
+                if archive is not None and _archive_name(self.path) in archive:
+                    return pygame.font.Font(archive.open(_archive_name(self.path)), size)
+                if self.data is None:
+                    with open(self.path, 'rb') as f:
+                        self.data = f.read()
+                return pygame.font.Font(io.BytesIO(self.data), size)
+            except Exception as e:
+                print(f"無法載入自訂字體: {e}")
+                self.failed = True
+        return pygame.font.Font(None, size)
+
+# 全域共用的字體快取
+fonts = FontCache()
+
+# 讀取資源檔案的全部內容 (封存檔中的檔案直接回傳映射內容的 memoryview)
+def read_asset(path):
+    """讀取資源內容"""
+    archive = get_archive()
+    if archive is not None:
+        name = _archive_name(path)
+        if name in archive:
+            return archive.read(name)
+    with open(path, 'rb') as f:
+        return f.read()
+
+# 在背景執行緒初始化音效模組並解碼音效，完成後填入共用的音效面板
+# 面板物件本身在載入前就交給遊戲使用，載入完成前播放音效會被略過
+# 解碼後的 PCM 資料會依檔案內容雜湊與混音器格式快取在磁碟上，之後啟動時不需要再解碼 MP3
+class SoundLoader:
+    def __init__(self, paths, cache_dir=SOUND_CACHE_DIR):
+        self.paths = paths # 要載入的音效 {名稱: 路徑}
+        self.cache_dir = cache_dir # 解碼後音效的快取目錄
+        self.sounds = SoundBoard() # 共用的音效面板 (背景執行緒載入後填入)
+        self.cache_hits = 0 # 從快取載入的音效數量
+        self.ready = threading.Event() # 載入完成的事件
+        self.elapsed = 0.0 # 背景載入所花的時間 (秒)
+        self.thread = None # 背景執行緒
+
+    # 啟動背景載入
+    def start(self):
+        """開始載入"""
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self.sounds
+
+    # 背景執行緒：初始化音效模組並逐一載入音效
+    def _run(self):
+        """背景載入"""
+        started = pygame.time.get_ticks()
+        try:
+            pygame.mixer.init() # 開啟音效裝置可能很慢，因此放在背景執行
+            self.sounds.configure_channels()
+        except Exception as e:
+            print(f"無法初始化音效模組: {e}")
+        else:
+            for name, path in self.paths.items():
+                self.sounds[name] = self._load_sound(path)
+        self.elapsed = (pygame.time.get_ticks() - started) / 1000
+        self.ready.set()
+
+    # 安全地載入單個音效檔案
+    def _load_sound(self, path):
+        """安全載入音效檔案"""
+        try:
+            # 檢查檔案是否存在
+            if not asset_exists(path):
+                print(f"無法找到音效檔案: {path}")
+                return None
+            # 載入音效：快取存在時直接使用解碼後的資料
+            data = read_asset(path)
+            cache_path = self._cache_path(path, data)
+            if os.path.exists(cache_path):
+                with open(cache_path, 'rb') as f:
+                    sound = pygame.mixer.Sound(buffer=f.read())
+                self.cache_hits += 1
+                return sound
+            sound = pygame.mixer.Sound(file=io.BytesIO(data))
+            self._write_cache(cache_path, sound)
+            return sound
+        except Exception as e:
+            # 處理載入錯誤
+            print(f"載入音效時發生錯誤: {e}")
+            return None
+
+    # 快取檔案的路徑：以原始檔案內容的雜湊與目前混音器的格式 (取樣率, 位元格式, 聲道數) 為鍵
+    def _cache_path(self, path, data):
+        """快取路徑"""
+        frequency, size, channels = pygame.mixer.get_init()
+        digest = hashlib.sha1(data).hexdigest()[:16]
+        name = os.path.splitext(os.path.basename(path))[0]
+        return os.path.join(self.cache_dir, f"{name}-{digest}-{frequency}hz-{size}bit-{channels}ch.pcm")
+
+    # 將解碼後的 PCM 資料寫入快取 (先寫入暫存檔再改名，避免留下不完整的檔案)
+    def _write_cache(self, cache_path, sound):
+        """寫入快取"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            temp_path = cache_path + ".tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(sound.get_raw())
+            os.replace(temp_path, cache_path)
+        except OSError as e:
+            print(f"無法寫入音效快取: {e}") # 快取只是加速，失敗時下次啟動再重新解碼即可
@@ -0,0 +1,55 @@
+import pygame
+from settings import *
+
+# 音效面板：保存已載入的音效 (可當作 {名稱: Sound} 字典使用)，並管理混音器的聲道
+# 重要的音效 (遊戲結束、選單選擇) 各自保留一個聲道，不會被大量的吃食物音效擠掉；
+# 同一個 tick 內重複觸發的相同音效只播放一次，同一音效同時播放的數量也有上限
+class SoundBoard(dict):
+    def __init__(self):
+        super().__init__()
+        self.reserved = {} # 保留聲道的音效 {名稱: Channel}
+        self.played = set() # 這個 tick 已經播放過的音效名稱
+        self.merged = 0 # 因同一個 tick 重複而合併掉的播放次數
+        self.dropped = 0 # 因達到同時播放上限或沒有空聲道而略過的播放次數
+
+    # 初始化混音器之後設定聲道數量，並替重要音效保留專用聲道
+    def configure_channels(self):
+        """設定聲道"""
+        pygame.mixer.set_num_channels(SOUND_CHANNELS)
+        pygame.mixer.set_reserved(len(SOUND_RESERVED_CHANNELS)) # 保留的聲道不會被 find_channel 分配
+        self.reserved = {name: pygame.mixer.Channel(index) for index, name in enumerate(SOUND_RESERVED_CHANNELS)}
+
+    # 開始新的 tick，之後相同的音效可以再次播放
+    def new_tick(self):
+        """開始新的 tick"""
+        self.played.clear()
+
+    # 播放指定名稱的音效
+    def play(self, name):
+        """播放音效"""
+        sound = self.get(name)
+        if not sound:
+            return False # 音效尚未載入或載入失敗
+        if name in self.played:
+            self.merged += 1 # 同一個 tick 內已經播放過，合併成一次
+            return False
+        channel = self.reserved.get(name)
+        if channel is None:
+            # 一般音效使用共用的聲道，同時播放的數量有上限
+            if sound.get_num_channels() >= SOUND_MAX_VOICES:
+                self.dropped += 1
+                return False
+            channel = pygame.mixer.find_channel() # 只會回傳未保留且空閒的聲道
+            if channel is None:
+                self.dropped += 1
+                return False
+        channel.play(sound)
+        self.played.add(name)
+        return True
+
+    # 停止指定名稱的音效
+    def stop(self, name):
+        """停止音效"""
+        sound = self.get(name)
+        if sound:
+            sound.stop()
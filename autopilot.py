@@ -0,0 +1,191 @@
+import argparse
+import os
+import random
+import struct
+import time
+import pygame
+from settings import *
+
+# 哈密頓迴路自動駕駛：蛇沿著一條經過棋盤每一格剛好一次的迴路前進，永遠不會撞到自己
+# 蛇短的時候允許抄捷徑 (直接走到迴路前方較遠的格子)，只要落點仍在尾巴之前並保留足夠的空格
+#
+# 不變量：蛇身從尾巴到頭部依迴路順序排列，頭部到尾巴之間 (沿迴路向前) 的格子都是空的
+# 沿迴路前進時，正在長大的蛇每走一步空格少一格；吃到食物時空格扣掉尚未長出的長度只會減少食物的分數，
+# 尾巴移動時空格會增加。抄捷徑只在空格扣掉尚未長出的長度仍有 AUTOPILOT_SAFETY_MARGIN 時才允許
+#
+# 迴路快取檔 (cycle-{寬}x{高}.bin) 的格式 (little-endian)：
+#   標頭 : magic (8 bytes) + 寬 (uint16) + 高 (uint16)
+#   內容 : 迴路依序經過的格子編號 (y * 寬 + x)，每個 uint16
+
+CYCLE_MAGIC = b'SNAKECYC' # 迴路快取檔的識別碼
+CYCLE_HEADER = struct.Struct('<8sHH') # 迴路快取檔的標頭
+
+# 建立 width x height 棋盤的哈密頓迴路 (至少一邊是偶數才存在)
+# 以第 0 欄作為回程，其餘的欄位逐列來回掃過：高度為偶數時最後一列剛好結束在第 1 欄，接回第 0 欄往上
+def build_cycle(width, height):
+    """建立哈密頓迴路"""
+    if height % 2 and width % 2:
+        raise ValueError(f"{width}x{height} 的棋盤沒有哈密頓迴路")
+    if height % 2:
+        # 高度為奇數時轉置棋盤，改成逐欄來回
+        return [y * width + x for y, x in ((cell % height, cell // height) for cell in build_cycle(height, width))]
+    cycle = []
+    for y in range(height):
+        columns = range(1, width) if y % 2 == 0 else range(width - 1, 0, -1)
+        cycle.extend(y * width + x for x in columns)
+    cycle.extend(y * width for y in range(height - 1, -1, -1))
+    return cycle
+
+# 檢查迴路是否經過每一格剛好一次，且相鄰兩格 (含頭尾) 在棋盤上相鄰
+def is_valid_cycle(cycle, width, height):
+    """檢查迴路"""
+    if len(cycle) != width * height or sorted(cycle) != list(range(width * height)):
+        return False
+    for a, b in zip(cycle, cycle[1:] + cycle[:1]):
+        ax, ay = a % width, a // width
+        bx, by = b % width, b // width
+        if abs(ax - bx) + abs(ay - by) != 1:
+            return False
+    return True
+
+# 取得棋盤大小對應的迴路：先讀磁碟快取，沒有或損壞時重新建立並寫入快取
+def load_cycle(width=GRID_WIDTH, height=GRID_HEIGHT, cache_dir=CYCLE_CACHE_DIR):
+    """載入哈密頓迴路"""
+    path = os.path.join(cache_dir, f"cycle-{width}x{height}.bin")
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, cached_width, cached_height = CYCLE_HEADER.unpack_from(data)
+        cycle = list(struct.unpack_from(f'<{width * height}H', data, CYCLE_HEADER.size))
+        if magic == CYCLE_MAGIC and (cached_width, cached_height) == (width, height) and is_valid_cycle(cycle, width, height):
+            return cycle
+    except (OSError, struct.error):
+        pass # 沒有快取或檔案不完整，重新建立
+    cycle = build_cycle(width, height)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        temp_path = path + ".tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(CYCLE_HEADER.pack(CYCLE_MAGIC, width, height))
+            f.write(struct.pack(f'<{len(cycle)}H', *cycle))
+        os.replace(temp_path, path)
+    except OSError as e:
+        print(f"無法寫入迴路快取: {e}") # 快取只是加速，下次再重新建立即可
+    return cycle
+
+# 自動駕駛：每個 tick 為一條蛇選擇下一步
+class Autopilot:
+    def __init__(self, width=GRID_WIDTH, height=GRID_HEIGHT):
+        self.width = width # 棋盤寬度 (格)
+        self.height = height # 棋盤高度 (格)
+        self.cycle = load_cycle(width, height) # 迴路依序經過的格子編號
+        self.order = [0] * len(self.cycle) # 每個格子在迴路中的順序
+        for index, cell in enumerate(self.cycle):
+            self.order[cell] = index
+        # 每個格子的相鄰格子 (預先計算，不需要檢查邊界)
+        self.neighbors = [
+            [(y + dy) * width + x + dx for dx, dy in ((0, -1), (0, 1), (-1, 0), (1, 0)) if 0 <= x + dx < width and 0 <= y + dy < height]
+            for y in range(height) for x in range(width)
+        ]
+
+    # 沿迴路從格子 a 走到格子 b 需要的步數
+    def ahead(self, a, b):
+        """迴路距離"""
+        return (self.order[b] - self.order[a]) % len(self.cycle)
+
+    # 為蛇選擇下一步並轉向：優先不越過最近的加分食物，再來是不吃毒藥，並盡量走得遠
+    # (毒藥不會擋住去路：繞過毒藥要多走一整圈，吃下去只少幾節)
+    def steer(self, snake, foods):
+        """決定下一步"""
+        if snake.is_dead or not snake.size:
+            return
+        width = self.width
+        size = len(self.cycle)
+        head = snake.head_cell # 蛇身的格子編號與迴路相同，直接使用
+        body = snake.occupied # 每格被身體佔據的節數
+        to_tail = self.ahead(head, snake.tail_cell) if snake.size > 1 else size # 沿迴路到尾巴的步數
+        pending = snake.length - snake.size # 尚未長出的長度 (這段期間尾巴不會移動)
+        food_scores = {food.cell: food.score for food in foods}
+        targets = [self.ahead(head, cell) for cell, score in food_scores.items() if score > 0]
+        avoid_poison = bool(targets) # 場上只剩毒藥時改去吃毒藥，讓新的食物生成
+        if not avoid_poison:
+            targets = [self.ahead(head, cell) for cell in food_scores]
+        target = min(targets) if targets else size # 沿迴路到最近的目標食物的步數
+        shortcuts = snake.length <= size * AUTOPILOT_SHORTCUT_LIMIT
+        best_cell = None
+        best_key = None
+        for cell in self.neighbors[head]:
+            if body[cell]:
+                continue
+            step = self.ahead(head, cell)
+            if step != 1:
+                # 抄捷徑：落點必須在尾巴之前，且跳過的格子之後仍保留足夠的空格
+                if not shortcuts or step >= to_tail:
+                    continue
+                growth = pending + max(0, food_scores.get(cell, 0))
+                if to_tail - step - 1 - growth < AUTOPILOT_SAFETY_MARGIN:
+                    continue
+            key = (step <= target, not (avoid_poison and food_scores.get(cell, 0) < 0), step if step <= target else -step)
+            if best_key is None or key > best_key:
+                best_cell = cell
+                best_key = key
+        if best_cell is None:
+            best_cell = self.cycle[(self.order[head] + 1) % size] # 棋盤已滿，只能沿迴路前進
+        snake.turn((best_cell % width - head % width, best_cell // width - head // width))
+
+# 長時間測試：以自動駕駛進行多局無畫面的單人遊戲，一路玩到蛇填滿整個棋盤 (遊戲以勝利結束)，確認蛇從不死亡
+# render 大於 0 時每隔 render 個 tick 把畫面繪製到離屏的 Surface (包含棋盤全滿時的結束畫面)，回傳每局的結果
+def soak(games, max_ticks, seed=0, render=0):
+    """自動駕駛長時間測試"""
+    from game import Game
+    autopilot = Autopilot()
+    size = GRID_WIDTH * GRID_HEIGHT
+    surface = pygame.Surface((GAME_WIDTH, GAME_HEIGHT)) if render else None
+    results = []
+    for index in range(games):
+        random.seed(seed + index)
+        game = Game(None, surface, None)
+        game.autopilot = autopilot
+        game.reset_game(mode="single")
+        game.game_active = True
+        snake = game.snakes[0]
+        ticks = 0
+        while game.game_active and ticks < max_ticks:
+            game.update()
+            ticks += 1
+            if render and ticks % render == 0:
+                game.draw()
+        if render:
+            game.draw() # 最後的畫面 (填滿時為結束畫面)
+        results.append({'seed': seed + index, 'ticks': ticks, 'length': snake.length, 'score': snake.score,
+                        'died': snake.is_dead, 'filled': snake.size >= size})
+    return results
+
+# 以命令列執行長時間測試
+def main():
+    parser = argparse.ArgumentParser(description="哈密頓迴路自動駕駛的長時間測試")
+    parser.add_argument("--games", type=int, default=10, help="進行的局數")
+    parser.add_argument("--max-ticks", type=int, default=200000, help="每局的 tick 上限")
+    parser.add_argument("--seed", type=int, default=0, help="第一局的亂數種子")
+    parser.add_argument("--render", type=int, default=0, metavar="N", help="每隔 N 個 tick 在無畫面的 Surface 上繪製一次 (0 表示不繪製)")
+    args = parser.parse_args()
+    if args.render:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy") # 只在離屏的 Surface 上繪製，不需要真正的視窗
+        pygame.display.init()
+        pygame.font.init()
+        pygame.display.set_mode((1, 1)) # 食物圖片轉換格式需要顯示模式
+    start = time.perf_counter()
+    results = soak(args.games, args.max_ticks, args.seed, args.render)
+    elapsed = time.perf_counter() - start
+    for result in results:
+        status = "死亡" if result['died'] else "填滿" if result['filled'] else "未完成"
+        print(f"種子 {result['seed']}: {status}  {result['ticks']} tick  長度 {result['length']}  分數 {result['score']}")
+    deaths = sum(result['died'] for result in results)
+    unfinished = sum(not result['died'] and not result['filled'] for result in results)
+    ticks = sum(result['ticks'] for result in results)
+    print(f"{len(results)} 局，死亡 {deaths} 次，未填滿 {unfinished} 局，共 {ticks} tick ({ticks / elapsed:.0f} tick/秒)")
+    raise SystemExit(1 if deaths or unfinished else 0)
+
+# 程式執行入口
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import numpy as np
+import pygame
+from settings import *
+from sprites import get_snake_sprites, DEAD_COLOR
+
+# 以 NumPy 一次產生整個棋盤像素的替代繪圖器
+# 每個格子記錄種類 (背景 / 蛇身 / 食物) 與填色，用格子形狀的遮罩展開成像素後，
+# 直接寫入 game_surface 的像素陣列，不需要逐格呼叫 Pygame 的繪圖函式
+# 像素以 Surface 原生的 32 位元整數處理 (pixels2d)，比逐通道的 pixels3d 少了三倍的資料量與跨步寫入
+
+KIND_EMPTY = 0 # 背景格子
+KIND_SEGMENT = 1 # 蛇身 (圓角方塊)
+KIND_FOOD = 2 # 食物 (圓形)
+
+# 用 Pygame 畫出格子的形狀，轉成 [y, x] 排列的布林遮罩 (與逐格繪製的形狀完全相同)
+def _shape_mask(draw):
+    """產生形狀遮罩"""
+    tile = pygame.Surface((GRID_SIZE, GRID_SIZE), depth=32)
+    tile.fill((0, 0, 0))
+    draw(tile)
+    return pygame.surfarray.array2d(tile).T != 0
+
+# 將遊戲狀態轉成像素的繪圖器
+class BulkRenderer:
+    def __init__(self, width=GRID_WIDTH, height=GRID_HEIGHT):
+        self.width = width # 棋盤寬度 (格)
+        self.height = height # 棋盤高度 (格)
+        size = GRID_SIZE
+        # 各種格子的形狀遮罩，以 [格內 y, 種類, 格內 x] 排列，依格子種類取出後每一列像素在記憶體中是連續的
+        self.masks = np.stack([
+            np.zeros((size, size), dtype=bool),
+            _shape_mask(lambda tile: pygame.draw.rect(tile, WHITE, (1, 1, size - 2, size - 2), border_radius=min(8, size // 6))),
+            _shape_mask(lambda tile: pygame.draw.circle(tile, WHITE, (size // 2, size // 2), size // 2 - 2))
+        ], axis=1)
+        self.kind = np.zeros((height, width), dtype=np.uint8) # 每個格子的種類 [y, x]
+        self.fill = np.zeros((height, width), dtype=np.uint32) # 每個格子的填色 (Surface 的像素格式)
+        self.pixel_format = None # 目前使用的像素格式 (位移, 損失位元, alpha 遮罩)
+        self.background = None # 棋盤背景的像素 [格 y, 格內 y, 格 x, 格內 x]
+
+    # 把 RGB 顏色陣列 (..., 3) 轉成 Surface 像素格式的 32 位元整數
+    def _map_colors(self, colors):
+        """轉換顏色格式"""
+        shifts, losses, alpha = self.pixel_format
+        colors = np.asarray(colors, dtype=np.uint32)
+        mapped = np.full(colors.shape[:-1], alpha, dtype=np.uint32)
+        for channel in range(3):
+            mapped |= (colors[..., channel] >> losses[channel]) << shifts[channel]
+        return mapped
+
+    # 依目標 Surface 的像素格式準備棋盤背景 (只在第一次或格式改變時計算)
+    def _prepare(self, surface):
+        """準備背景"""
+        pixel_format = (surface.get_shifts()[:3], surface.get_losses()[:3], surface.get_masks()[3])
+        if pixel_format == self.pixel_format:
+            return
+        self.pixel_format = pixel_format
+        checker = np.add.outer(np.arange(self.height), np.arange(self.width)) % 2 # 棋盤格的顏色編號 [y, x]
+        colors = self._map_colors([CHECKERBOARD_COLOR_1, CHECKERBOARD_COLOR_2])
+        size = GRID_SIZE
+        self.background = np.ascontiguousarray(np.broadcast_to(colors[checker][:, None, :, None], (self.height, size, self.width, size)))
+
+    # 計算一條蛇從尾巴到頭部每一節的漸變顏色 (與逐格繪製的公式相同)
+    def _snake_colors(self, snake, count):
+        """計算蛇的顏色"""
+        if snake.is_dead:
+            return self._map_colors(DEAD_COLOR)
+        start = np.array(snake.head_color, dtype=np.float64)
+        end = np.array(snake.body_color, dtype=np.float64)
+        intensity = np.minimum(1.0, np.arange(count) / max(1, count - 1) * 1.2)
+        return self._map_colors((start + (end - start) * intensity[:, None]).astype(np.int64)) # 與 int() 相同，向零取整
+
+    # 把遊戲狀態寫入格子的種類與填色
+    def _rasterize(self, game):
+        """產生格子資料"""
+        self.kind.fill(KIND_EMPTY)
+        # 格子編號 (y * 寬度 + x) 就是 [y, x] 陣列攤平後的索引，直接寫入攤平的視圖
+        kind = self.kind.reshape(-1)
+        fill = self.fill.reshape(-1)
+        for snake in game.snakes:
+            if not snake.size:
+                continue
+            cells = np.array(snake.cells()[::-1], dtype=np.intp) # 從尾巴到頭部，頭部最後寫入
+            kind[cells] = KIND_SEGMENT
+            fill[cells] = self._snake_colors(snake, len(cells))
+        for food in game.foods:
+            kind[food.cell] = KIND_FOOD
+            fill[food.cell] = self._map_colors(food.color)
+
+    # 繪製棋盤、蛇與食物到 surface (分數等文字仍由 Game 繪製)
+    def draw(self, game, surface):
+        """繪製棋盤"""
+        self._prepare(surface)
+        self._rasterize(game)
+        size = GRID_SIZE
+        # pixels2d 是 [x, y] 排列，轉置後與記憶體順序相同，再把兩軸拆成 [格 y, 格內 y, 格 x, 格內 x] (不複製資料)
+        pixels = pygame.surfarray.pixels2d(surface)
+        board = pixels.T[:self.height * size, :self.width * size].reshape(self.height, size, self.width, size)
+        # 先鋪上棋盤背景，再依每個格子種類的形狀遮罩，把遮罩內的像素換成該格的填色
+        masks = self.masks[:, self.kind].transpose(1, 0, 2, 3)
+        np.copyto(board, self.background)
+        np.copyto(board, np.broadcast_to(self.fill[:, None, :, None], board.shape), where=masks)
+        del board, pixels # 釋放 Surface 的鎖定
+        # 蛇頭的眼睛只有少數幾個，直接貼上預先繪製的頭部圖塊
+        for snake in game.snakes:
+            if snake.is_dead or not snake.size:
+                continue
+            count = snake.size
+            sprites = get_snake_sprites(snake.head_color, snake.body_color)
+            x, y = snake.get_head_position()
+            surface.blit(sprites.head(sprites.color(count - 1, count), snake.direction), (x * size, y * size))
@@ -0,0 +1,109 @@
+from settings import *
+
+# 每個 tick 共用的距離場：所有電腦蛇的決策都從這裡查表，不再各自建立障礙物集合與搜尋
+# 每個場都是一次多源廣度優先搜尋 (從所有食物或所有蛇頭同時出發)，每個 tick 的成本與格子數成正比，與電腦蛇的數量無關
+# 格子以 y * 寬度 + x 的整數編號，場以一維列表儲存
+
+UNREACHABLE = -1 # 無法到達的格子的距離
+NO_OWNER = -1 # 沒有蛇能到達的格子
+CONTESTED = -2 # 兩條以上的蛇同時最先到達的格子
+
+# 距離場：食物距離、毒藥距離、蛇頭距離與勢力範圍 (Voronoi)、連通區域大小
+class DistanceFields:
+    def __init__(self, width=GRID_WIDTH, height=GRID_HEIGHT):
+        self.width = width # 棋盤寬度 (格)
+        self.height = height # 棋盤高度 (格)
+        cells = width * height
+        # 每個格子的相鄰格子 (預先計算，搜尋時不需要檢查邊界)
+        self.neighbors = [
+            [(y + dy) * width + x + dx for dx, dy in ((0, -1), (0, 1), (-1, 0), (1, 0)) if 0 <= x + dx < width and 0 <= y + dy < height]
+            for y in range(height) for x in range(width)
+        ]
+        self.blocked = bytearray(cells) # 被活著的蛇佔據的格子
+        self.food_distance = [UNREACHABLE] * cells # 到最近的非毒藥食物的步數
+        self.poison_distance = [UNREACHABLE] * cells # 到最近的毒藥的步數
+        self.head_distance = [UNREACHABLE] * cells # 最近的蛇頭到這格的步數
+        self.owner = [NO_OWNER] * cells # 最先到達這格的蛇 (Game.snakes 的索引)，或 NO_OWNER / CONTESTED
+        self.region = [0] * cells # 這格所在的空格連通區域大小 (被佔據的格子為 0)
+        self.territory = [] # 每條蛇的勢力範圍格子數
+        self.heads = [] # 活著的蛇的 (Game.snakes 的索引, 頭部格子編號)
+
+    # 座標轉成格子編號
+    def cell(self, position):
+        """座標轉編號"""
+        return position[1] * self.width + position[0]
+
+    # 從多個起點同時進行廣度優先搜尋，寫入 distance (被佔據的格子不會被經過，但可以是起點)
+    def _search(self, sources, distance, owner=None):
+        """多源廣度優先搜尋"""
+        distance[:] = [UNREACHABLE] * len(distance)
+        blocked = self.blocked
+        neighbors = self.neighbors
+        queue = []
+        for index, source in sources:
+            if distance[source] == 0:
+                if owner is not None and owner[source] != index:
+                    owner[source] = CONTESTED # 兩條蛇的頭在同一格
+                continue
+            distance[source] = 0
+            if owner is not None:
+                owner[source] = index
+            queue.append(source)
+        for cell in queue: # 佇列只會在尾端加入，直接以列表迭代
+            step = distance[cell] + 1
+            for neighbor in neighbors[cell]:
+                if blocked[neighbor]:
+                    continue
+                if distance[neighbor] == UNREACHABLE:
+                    distance[neighbor] = step
+                    if owner is not None:
+                        owner[neighbor] = owner[cell]
+                    queue.append(neighbor)
+                elif owner is not None and distance[neighbor] == step and owner[neighbor] != owner[cell]:
+                    owner[neighbor] = CONTESTED # 不同的蛇同時到達
+
+    # 標記空格的連通區域大小
+    def _label_regions(self):
+        """計算連通區域"""
+        region = self.region
+        region[:] = [0] * len(region)
+        blocked = self.blocked
+        neighbors = self.neighbors
+        for start in range(len(region)):
+            if blocked[start] or region[start]:
+                continue
+            component = [start]
+            region[start] = -1 # 已加入這個區域 (大小在搜尋結束後填入)
+            for cell in component:
+                for neighbor in neighbors[cell]:
+                    if not blocked[neighbor] and not region[neighbor]:
+                        region[neighbor] = -1
+                        component.append(neighbor)
+            size = len(component)
+            for cell in component:
+                region[cell] = size
+
+    # 依遊戲目前的狀態重新計算所有的場 (每個 tick 呼叫一次)
+    def update(self, game):
+        """更新距離場"""
+        blocked = self.blocked
+        blocked[:] = bytes(len(blocked))
+        heads = []
+        for index, snake in enumerate(game.snakes):
+            if snake.is_dead or not snake.size:
+                continue # 死亡的蛇不會造成碰撞
+            for cell in snake.cells(): # 蛇身與食物的格子編號與距離場相同，直接使用
+                blocked[cell] = 1
+            heads.append((index, snake.head_cell))
+        self.heads = heads
+        foods = [(0, food.cell) for food in game.foods if food.type != 'poison']
+        poisons = [(0, food.cell) for food in game.foods if food.type == 'poison']
+        self._search(foods, self.food_distance)
+        self._search(poisons, self.poison_distance)
+        self.owner[:] = [NO_OWNER] * len(self.owner)
+        self._search(heads, self.head_distance, self.owner)
+        self._label_regions()
+        self.territory = [0] * len(game.snakes)
+        for owner in self.owner:
+            if owner >= 0:
+                self.territory[owner] += 1
@@ -0,0 +1,133 @@
+from array import array
+from settings import *
+
+# 遊戲事件：Game 在模擬時把發生的事寫入預先配置的環狀緩衝區，音效、統計、重播與連線等使用者在每個 tick 之後批次讀取
+# 寫入只是把幾個整數放進固定大小的 array，模擬過程中不會呼叫任何觀察者的函式；
+# 每個使用者各自保存讀取位置 (游標)，互不影響，讀得太慢時最舊的事件會被覆蓋 (read 會回報遺失的數量)
+#
+# 每個事件有五個整數欄位：種類、tick、主體 (蛇在 Game.snakes 中的索引，沒有時為 -1)、數值、格子編號 (y * GRID_WIDTH + x)
+
+EVENT_SPAWN = 0 # 食物生成：數值為食物類型編號 (FOOD_TYPES 的索引)
+EVENT_EAT = 1 # 蛇吃到食物：數值為食物的分數
+EVENT_TURN = 2 # 蛇改變方向：數值為方向編號 (EVENT_DIRECTIONS 的索引)，格子為轉向前的頭部
+EVENT_DEATH = 3 # 蛇死亡：數值為死因 (CAUSE_*)，格子為頭部
+EVENT_COLLISION = 4 # 蛇頭撞到其他蛇：數值為被撞的蛇的索引
+EVENT_GAME_OVER = 5 # 遊戲結束：主體為勝利的蛇 (平局或沒有勝利者時為 -1)
+EVENT_NAMES = ('spawn', 'eat', 'turn', 'death', 'collision', 'game_over') # 事件種類的名稱
+
+EVENT_DIRECTIONS = ((0, -1), (0, 1), (-1, 0), (1, 0)) # 方向編號：上、下、左、右
+DIRECTION_CODES = {direction: i for i, direction in enumerate(EVENT_DIRECTIONS)} # 方向對應的編號
+
+CAUSE_WALL = 0 # 撞牆
+CAUSE_SELF = 1 # 撞到自己
+CAUSE_BODY = 2 # 撞到其他蛇的身體
+CAUSE_HEAD = 3 # 頭對頭碰撞落敗
+CAUSE_NAMES = ('wall', 'self', 'body', 'head') # 死因的名稱
+
+EVENT_BUFFER_SIZE = 4096 # 環狀緩衝區保留的事件數 (2 的次方)
+
+# 預先配置的事件環狀緩衝區
+class EventLog:
+    def __init__(self, capacity=EVENT_BUFFER_SIZE):
+        if capacity & (capacity - 1):
+            raise ValueError(f"事件緩衝區大小必須是 2 的次方: {capacity}")
+        self.mask = capacity - 1 # 以位元遮罩取代取餘數
+        self.kinds = array('b', bytes(capacity)) # 事件種類
+        self.ticks = array('l', bytes(array('l').itemsize * capacity)) # 發生的 tick
+        self.subjects = array('l', bytes(array('l').itemsize * capacity)) # 主體 (蛇的索引)
+        self.values = array('l', bytes(array('l').itemsize * capacity)) # 數值
+        self.cells = array('l', bytes(array('l').itemsize * capacity)) # 格子編號
+        self.written = 0 # 已寫入的事件總數 (也是下一個事件的序號)
+
+    # 緩衝區可以保留的事件數
+    @property
+    def capacity(self):
+        return self.mask + 1
+
+    # 寫入一個事件 (模擬過程中呼叫，只寫入預先配置的陣列)
+    def emit(self, kind, tick, subject=-1, value=0, cell=-1):
+        """寫入事件"""
+        index = self.written & self.mask
+        self.kinds[index] = kind
+        self.ticks[index] = tick
+        self.subjects[index] = subject
+        self.values[index] = value
+        self.cells[index] = cell
+        self.written += 1
+
+    # 讀取游標之後的所有事件，回傳 (事件列表, 新的游標, 被覆蓋而遺失的事件數)
+    # 每個事件為 (種類, tick, 主體, 數值, 格子) 的 tuple
+    def read(self, cursor):
+        """批次讀取事件"""
+        start = max(cursor, self.written - self.capacity)
+        mask = self.mask
+        events = [
+            (self.kinds[i & mask], self.ticks[i & mask], self.subjects[i & mask], self.values[i & mask], self.cells[i & mask])
+            for i in range(start, self.written)
+        ]
+        return events, self.written, start - cursor
+
+    # 目前最新的游標 (新的使用者從這裡開始讀，不會收到之前的事件)
+    def cursor(self):
+        """目前的游標"""
+        return self.written
+
+    # 捨棄游標之後的事件 (回滾到之前的快照時使用，之後寫入的事件沿用同樣的序號)
+    def truncate(self, cursor):
+        """捨棄之後的事件"""
+        self.written = min(self.written, cursor)
+
+# 比賽統計：批次讀取事件並累計每條蛇的數據 (用於結束畫面與比賽紀錄)
+class MatchStats:
+    def __init__(self, log):
+        self.log = log # 讀取的事件緩衝區
+        self.cursor = log.cursor() # 讀取位置
+        self.reset()
+
+    # 清除統計 (新的一局)，之前的事件不再計入
+    def reset(self):
+        """重置統計"""
+        self.cursor = self.log.cursor()
+        self.eaten = {} # 每條蛇吃到的食物數 {蛇的索引: 數量}
+        self.turns = {} # 每條蛇轉向的次數
+        self.deaths = {} # 每條蛇的死因 {蛇的索引: CAUSE_*}
+        self.spawned = 0 # 生成的食物數
+        self.collisions = 0 # 蛇頭撞到其他蛇的次數
+        self.winner = None # 勝利的蛇的索引 (平局為 -1，尚未結束為 None)
+        self.end_tick = None # 遊戲結束的 tick
+        self.lost = 0 # 讀取太慢而遺失的事件數
+
+    # 複製目前的統計 (狀態快照使用)
+    def save(self):
+        """保存統計"""
+        return (self.cursor, dict(self.eaten), dict(self.turns), dict(self.deaths), self.spawned, self.collisions,
+                self.winner, self.end_tick, self.lost)
+
+    # 還原 save 保存的統計 (同一個快照可以重複還原)
+    def restore(self, state):
+        """還原統計"""
+        self.cursor, eaten, turns, deaths, self.spawned, self.collisions, self.winner, self.end_tick, self.lost = state
+        self.eaten = dict(eaten)
+        self.turns = dict(turns)
+        self.deaths = dict(deaths)
+
+    # 讀取上次之後的所有事件並更新統計
+    def consume(self):
+        """更新統計"""
+        events, self.cursor, lost = self.log.read(self.cursor)
+        self.lost += lost
+        for kind, tick, subject, value, cell in events:
+            if kind == EVENT_EAT:
+                self.eaten[subject] = self.eaten.get(subject, 0) + 1
+            elif kind == EVENT_TURN:
+                self.turns[subject] = self.turns.get(subject, 0) + 1
+            elif kind == EVENT_SPAWN:
+                self.spawned += 1
+            elif kind == EVENT_DEATH:
+                self.deaths[subject] = value
+            elif kind == EVENT_COLLISION:
+                self.collisions += 1
+            elif kind == EVENT_GAME_OVER:
+                self.winner = subject
+                self.end_tick = tick
+        return events
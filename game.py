@@ -1,9 +1,12 @@
 import pygame
-import os
 import math
 import random
 from settings import *
-from objects import Snake, Food, AISnake
+from objects import Snake, Food, AISnake, HeuristicAISnake
+from assets import fonts
+from distance_field import DistanceFields
+from scheduler import TickScheduler
+from events import EventLog, MatchStats, EVENT_SPAWN, EVENT_EAT, EVENT_TURN, EVENT_DEATH, EVENT_COLLISION, EVENT_GAME_OVER, DIRECTION_CODES, CAUSE_WALL, CAUSE_SELF, CAUSE_BODY, CAUSE_HEAD
 
 # 遊戲邏輯類別，負責處理蛇的移動、碰撞、食物生成、分數計算等
 class Game:
@@ -18,40 +21,34 @@ class Game:
         self.game_active = False # 標記遊戲邏輯是否正在運行 (True 為遊戲中, False 為選單/結束/倒數)
         self.game_paused = False # 標記遊戲是否被玩家暫停
         self.winner_message = "" # 遊戲結束時顯示的勝利/失敗/平局訊息
-        self.create_fonts() # 初始化載入遊戲內所需的字體
-
-    # 載入遊戲中顯示分數和遊戲結束訊息所需的字體
-    def create_fonts(self):
-        """加載字體"""
-        try:
-            # 檢查自訂字體檔案是否存在
-            if not os.path.exists(FONT_PATH):
-                raise FileNotFoundError(f"找不到字體檔案: {FONT_PATH}") # 拋出檔案未找到錯誤
-            # 載入分數和遊戲結束畫面的字體，使用指定的路徑和大小
-            self.score_font = pygame.font.Font(FONT_PATH, SCORE_FONT_SIZE)
-            self.game_over_font = pygame.font.Font(FONT_PATH, GAME_OVER_FONT_SIZE)
-        except Exception as e: # 捕獲所有可能的異常 (檔案找不到、字體損壞等)
-            # 處理自訂字體載入錯誤
-            print(f"無法載入自訂字體: {e}")
-            try:
-                # 嘗試獲取系統可用字體列表
-                available_fonts = pygame.font.get_fonts()
-                if available_fonts: # 如果系統中存在可用字體
-                    # 使用列表中的第一個系統字體作為備選
-                    system_font = available_fonts[0]
-                    self.score_font = pygame.font.SysFont(system_font, SCORE_FONT_SIZE)
-                    self.game_over_font = pygame.font.SysFont(system_font, GAME_OVER_FONT_SIZE)
-                else: # 如果連系統字體都沒有
-                    # 使用 Pygame 的預設字體 (通常是 sans-serif)
-                    self.score_font = pygame.font.Font(None, SCORE_FONT_SIZE)
-                    self.game_over_font = pygame.font.Font(None, GAME_OVER_FONT_SIZE)
-            except Exception: # 如果載入系統字體也失敗
-                # 最後的保險措施：使用 Pygame 預設字體
-                self.score_font = pygame.font.Font(None, SCORE_FONT_SIZE)
-                self.game_over_font = pygame.font.Font(None, GAME_OVER_FONT_SIZE)
+        self.game_over_sound_played = False # 標記遊戲結束音效是否已播放
+        self.defer_game_over_sound = False # 預測的遊戲結束不播放音效 (由 RollbackClient 在伺服器確認後播放)
+        self.renderer = None # 替代的棋盤繪圖器 (例如 BulkRenderer)，None 表示逐一繪製
+        self.observer = None # NumPy 棋盤觀測 (第一次呼叫 observation 時才建立)
+        self.policy = None # 批次決定所有 AI 蛇方向的策略 (例如 NeuralPolicy)，None 表示各自呼叫 decide_direction
+        self.ai_weights = None # 電腦蛇的啟發式權重 (例如演化訓練的結果)，None 表示使用原本的簡單 AI
+        self.fields = None # 所有電腦蛇共用的距離場 (第一次需要時才建立)
+        self.autopilot = None # 代替玩家 1 操作的自動駕駛 (例如 Autopilot)，None 表示由玩家操作
+        self.scheduler = TickScheduler() # 以 tick 計時的事件 (食物超時等)，暫停時不會前進
+        self.events = EventLog() # 遊戲事件的環狀緩衝區 (生成、吃食物、轉向、死亡、碰撞、結束)，使用者在 tick 之後批次讀取
+        self.stats = MatchStats(self.events) # 本局的統計 (由事件累計)
+        self.sound_cursor = 0 # 音效已處理到的事件位置
+        self.headings = [] # 每條蛇上個 tick 的方向 (用來產生轉向事件)
+
+    # 分數文字的字體，在第一次繪製時才從共用快取建立 (無畫面模式永遠不會載入字體)
+    @property
+    def score_font(self):
+        """分數字體"""
+        return fonts.get(SCORE_FONT_SIZE)
+
+    # 遊戲結束與暫停標題的字體
+    @property
+    def game_over_font(self):
+        """遊戲結束字體"""
+        return fonts.get(GAME_OVER_FONT_SIZE)
 
     # 根據指定的遊戲模式重置遊戲狀態，清除蛇和食物，重新生成物件
-    def reset_game(self, mode="single"):
+    def reset_game(self, mode="single", player_count=ROOM_CAPACITY):
         """根據模式重置遊戲狀態"""
         self.stop_sound('gameover') # 確保停止上局可能播放的遊戲結束音效
         self.mode = mode # 設定當前遊戲模式 ('single', 'multi', 'ai')
@@ -61,6 +58,9 @@ class Game:
         self.game_active = False # 遊戲尚未開始，邏輯不活躍
         self.game_paused = False # 重置暫停狀態
         self.game_over_sound_played = False # 重置遊戲結束音效播放標記
+        self.scheduler.clear() # 清除上一局的計時事件
+        self.stats.reset() # 統計從這一局的事件開始累計
+        self.sound_cursor = self.events.cursor() # 上一局尚未處理的音效不再播放
 
         # 根據不同的遊戲模式，創建不同組合的蛇物件
         if self.mode == "single":
@@ -73,41 +73,77 @@ class Game:
         elif self.mode == "ai":
             # 電腦對戰模式：創建一條玩家蛇和一條 AI 蛇，配置同雙人模式
             self.snakes.append(Snake(player_id=1, start_pos=(GRID_WIDTH // 4, GRID_HEIGHT // 2), start_dir=(1, 0), color_config=(GREEN, DARK_GREEN))) # 玩家1
-            self.snakes.append(AISnake(player_id=2, start_pos=(GRID_WIDTH * 3 // 4, GRID_HEIGHT // 2), start_dir=(-1, 0), color_config=(BLUE, DARK_BLUE))) # AI 玩家
-
+            self.snakes.append(self.create_ai_snake(player_id=2, start_pos=(GRID_WIDTH * 3 // 4, GRID_HEIGHT // 2), start_dir=(-1, 0), color_config=(BLUE, DARK_BLUE))) # AI 玩家
+        elif self.mode == "online":
+            # 連線模式：依玩家數量平均分配起始位置，奇偶玩家分列左右兩側並相向移動
+            for i in range(player_count):
+                start_pos, start_dir = self.get_spawn_point(i, player_count)
+                color_config = PLAYER_COLORS[i % len(PLAYER_COLORS)]
+                self.snakes.append(Snake(player_id=i + 1, start_pos=start_pos, start_dir=start_dir, color_config=color_config))
+        elif self.mode == "arena":
+            # 電腦競技場模式：多條 AI 蛇互相對戰 (用於觀戰)，起始位置與連線模式相同
+            for i in range(player_count):
+                start_pos, start_dir = self.get_spawn_point(i, player_count)
+                color_config = PLAYER_COLORS[i % len(PLAYER_COLORS)]
+                self.snakes.append(self.create_ai_snake(player_id=i + 1, start_pos=start_pos, start_dir=start_dir, color_config=color_config))
+
+        self.headings = [snake.direction for snake in self.snakes]
         # 在場景中生成初始數量的食物
         self.spawn_initial_foods()
 
+    # 建立電腦蛇：有指定啟發式權重時使用參數化的 AI
+    def create_ai_snake(self, player_id, start_pos, start_dir, color_config):
+        """建立電腦蛇"""
+        if self.ai_weights is not None:
+            return HeuristicAISnake(player_id, start_pos, start_dir, color_config, self.ai_weights)
+        return AISnake(player_id, start_pos, start_dir, color_config)
+
+    # 計算多人連線模式下第 index 條蛇的起始位置與方向
+    def get_spawn_point(self, index, player_count):
+        """計算起始位置與方向"""
+        rows = (player_count + 1) // 2 # 左右兩側各需要的列數
+        row = index // 2 # 這條蛇所在的列
+        y = (row + 1) * GRID_HEIGHT // (rows + 1) # 在垂直方向平均分配
+        if index % 2 == 0:
+            return (GRID_WIDTH // 4, y), (1, 0) # 左側，向右移動
+        return (GRID_WIDTH * 3 // 4, y), (-1, 0) # 右側，向左移動
+
     # 生成遊戲開始時的初始食物
     def spawn_initial_foods(self):
         """生成初始數量的食物"""
         # 根據遊戲模式決定場上最多允許存在的食物數量
         max_foods = MAX_FOOD_SINGLE if self.mode == "single" else MAX_FOOD_MULTI
-        # 創建一個集合，用於儲存所有已被蛇佔據的初始位置
+        # 創建一個集合，用於儲存所有已被蛇佔據的初始格子編號
         occupied_positions = set()
         for snake in self.snakes:
-            occupied_positions.update(snake.positions) # 將蛇的初始位置加入集合
-        # 迴圈生成食物，直到達到該模式下的最大食物數量
-        while len(self.foods) < max_foods:
-            self.spawn_new_food(occupied_positions) # 呼叫生成單個食物的方法
+            occupied_positions.update(snake.cells()) # 將蛇的初始位置加入集合
+        # 迴圈生成食物，直到達到該模式下的最大食物數量 (棋盤沒有空格時停止)
+        while len(self.foods) < max_foods and self.spawn_new_food(occupied_positions):
+            pass
 
-    # 在隨機未被佔用的位置生成一個新的食物
+    # 在隨機未被佔用的位置生成一個新的食物，棋盤已經沒有空格時不生成並回傳 False
     def spawn_new_food(self, occupied_positions):
         """根據概率生成一個新的食物"""
+        if len(occupied_positions) >= GRID_WIDTH * GRID_HEIGHT:
+            return False # 棋盤已滿 (蛇與食物佔據所有格子)
         # 根據 settings.py 中定義的食物類型和概率，隨機選擇一種食物
         # random.choices 返回一個列表，取第一個元素 [0]
         chosen_type_data = random.choices(FOOD_TYPES, weights=FOOD_PROBABILITIES, k=1)[0]
         # 創建 Food 物件實例，傳入已佔用位置集合以避免生成在蛇身上或已有食物上
         new_food = Food(occupied_positions, chosen_type_data)
+        # 在計時器登記超時事件 (FOOD_TIMEOUT_TICKS 個 tick 之後消失)
+        new_food.expire_tick = self.scheduler.schedule(FOOD_TIMEOUT_TICKS, self.expire_food, new_food)
         self.foods.append(new_food) # 將新生成的食物加入食物列表
-        occupied_positions.add(new_food.position) # 將新食物的位置也加入已佔用位置集合 (供下一次生成參考)
+        self.events.emit(EVENT_SPAWN, self.scheduler.tick, -1, FOOD_TYPES.index(chosen_type_data), new_food.cell)
+        occupied_positions.add(new_food.cell) # 將新食物的位置也加入已佔用位置集合 (供下一次生成參考)
+        return True
 
     # 播放指定名稱的音效 (如果音效已載入且存在於字典中)
     def play_sound(self, sound_name):
         """播放指定音效"""
         # 檢查 self.sounds 是否存在，音效名稱是否存在於字典中，以及對應的值是否為有效的 Sound 物件
         if self.sounds and sound_name in self.sounds and self.sounds[sound_name]:
-            self.sounds[sound_name].play() # 播放音效
+            self.sounds.play(sound_name) # 透過音效面板播放 (分配聲道並合併同一個 tick 的重複音效)
 
     # 停止指定名稱的音效 (如果音效已載入且存在於字典中)
     def stop_sound(self, sound_name):
@@ -150,48 +186,148 @@ class Game:
         """更新遊戲狀態"""
         # 如果遊戲未開始 (game_active is False) 或已暫停 (game_paused is True)，則不進行任何邏輯更新
         if not self.game_active or self.game_paused:
-            return # 直接返回，跳過後續更新步驟
+            return # 直接返回，跳過後續更新步驟 (計時器也不會前進)
+        self.scheduler.advance() # 計時器前進一個 tick
 
         # 讓所有 AI 蛇決定下一步的移動方向
-        for snake in self.snakes:
-            # 檢查蛇是否為 AISnake 的實例並且還活著
-            if isinstance(snake, AISnake) and not snake.is_dead:
-                # 呼叫 AI 蛇的決策方法，傳入當前的食物列表和其他蛇的列表作為參考
-                snake.decide_direction(self.foods, self.snakes)
+        if self.policy is not None:
+            self.policy.decide(self) # 由策略一次批次決定所有 AI 蛇的方向
+        else:
+            # 找出所有活著的 AI 蛇
+            ai_snakes = [snake for snake in self.snakes if isinstance(snake, AISnake) and not snake.is_dead]
+            if ai_snakes:
+                # 每個 tick 只計算一次距離場 (食物距離、勢力範圍等)，所有 AI 蛇共用查表
+                if self.fields is None:
+                    self.fields = DistanceFields()
+                self.fields.update(self)
+            for snake in ai_snakes:
+                # 呼叫 AI 蛇的決策方法，傳入當前的食物列表、其他蛇的列表與共用的距離場
+                snake.decide_direction(self.foods, self.snakes, self.fields)
+
+        # 自動駕駛代替玩家 1 決定方向 (覆蓋這個 tick 的按鍵輸入)
+        if self.autopilot is not None and self.snakes and not isinstance(self.snakes[0], AISnake):
+            self.autopilot.steer(self.snakes[0], self.foods)
+
+        # 記錄這個 tick 改變方向的蛇 (轉向事件)
+        tick = self.scheduler.tick
+        if len(self.headings) != len(self.snakes):
+            self.headings = [snake.direction for snake in self.snakes] # 蛇的組成被外部替換
+        for i, snake in enumerate(self.snakes):
+            if snake.direction != self.headings[i] and not snake.is_dead:
+                self.headings[i] = snake.direction
+                self.events.emit(EVENT_TURN, tick, i, DIRECTION_CODES.get(snake.direction, -1), snake.head_cell)
 
         # 移動所有活著的蛇 (包括玩家和 AI)
-        for snake in self.snakes:
+        for i, snake in enumerate(self.snakes):
             if not snake.is_dead: # 只移動活著的蛇
                 move_success = snake.move() # 呼叫蛇自身的 move 方法嘗試移動
                 if not move_success: # 如果 move 方法返回 False (表示撞牆或撞自身)
                     snake.die() # 將這條蛇標記為死亡狀態
+                    x, y = snake.get_head_position()
+                    inside = 0 <= x + snake.direction[0] < GRID_WIDTH and 0 <= y + snake.direction[1] < GRID_HEIGHT
+                    self.events.emit(EVENT_DEATH, tick, i, CAUSE_SELF if inside else CAUSE_WALL, snake.head_cell)
 
         # 檢查各種碰撞情況 (蛇撞蛇、頭對頭碰撞等)
         self.check_collisions()
 
         # 碰撞檢測後，遊戲狀態可能變為非活躍 (game_active=False)
         if not self.game_active:
-            # 如果遊戲剛剛結束，並且遊戲結束音效還沒播放過
-            if not self.game_over_sound_played:
-                self.play_sound('gameover') # 播放遊戲結束音效
-                self.game_over_sound_played = True # 標記已播放，防止重複播放
+            self.finish_tick()
             return # 遊戲已結束，不需要再處理食物邏輯，直接返回
 
         # 如果遊戲仍然活躍，處理蛇吃食物的邏輯
         self.handle_food_eating()
-        # 處理食物超時消失的邏輯
+        # 單人模式的蛇佔滿所有格子時已經無處可走，視為勝利 (最後一格的食物已經吃下)
+        if self.mode == "single" and self.snakes[0].size >= GRID_WIDTH * GRID_HEIGHT:
+            self.end_game("恭喜! 填滿了整個棋盤", self.snakes[0])
+            self.finish_tick()
+            return
+        # 執行這個 tick 到期的計時事件 (食物超時消失等)
         self.handle_food_timeout()
-
-    # 獲取當前所有被蛇身體和食物佔據的格子位置集合
+        self.finish_tick()
+
+    # tick 結束後讓觀測、統計與音效批次處理這個 tick 的變化與事件
+    def finish_tick(self):
+        """tick 結束的處理"""
+        self.sync_observer()
+        self.stats.consume()
+        self.play_event_sounds()
+
+    # 依這個 tick 的事件播放音效 (吃到食物、遊戲結束)，同一個 tick 的多個相同事件只播放一次
+    def play_event_sounds(self):
+        """播放事件音效"""
+        if not self.sounds:
+            self.sound_cursor = self.events.cursor() # 沒有音效 (無畫面) 時直接跳過
+            return
+        events, self.sound_cursor, _ = self.events.read(self.sound_cursor)
+        kinds = {event[0] for event in events}
+        if EVENT_EAT in kinds:
+            self.play_sound('eating') # 播放吃東西的音效
+        if EVENT_GAME_OVER in kinds and not self.game_over_sound_played and not self.defer_game_over_sound:
+            self.play_sound('gameover') # 播放遊戲結束音效
+            self.game_over_sound_played = True # 標記已播放，防止重複播放
+
+    # 讓棋盤觀測跟上這個 tick 的變化 (只在有人使用觀測時才需要)
+    def sync_observer(self):
+        """同步棋盤觀測"""
+        if self.observer is not None:
+            self.observer.sync(self)
+
+    # 取得第 index 條蛇的棋盤觀測 (唯讀的 NumPy 視圖，隨遊戲進行就地更新，不需要每次重新取得)
+    # local 為 True 時回傳以蛇頭為中心、大小為 2 * OBSERVATION_RADIUS + 1 的裁切視窗，棋盤外以牆壁通道表示
+    def observation(self, index, local=False):
+        """取得棋盤觀測"""
+        if self.observer is None:
+            from observation import BoardObserver # 需要 NumPy，只在使用時才匯入
+            self.observer = BoardObserver()
+        self.observer.sync(self)
+        return self.observer.local(index) if local else self.observer.board(index)
+
+    # 儲存目前的遊戲狀態快照 (用於連線模式的回滾)，只複製會變動的欄位
+    def save_state(self):
+        """儲存狀態快照"""
+        snakes = tuple(
+            (s, s.cells(), s.direction, s.length, s.score, s.is_dead, s.death_time)
+            for s in self.snakes
+        )
+        # 食物建立後不會再被修改，直接保存物件參考即可
+        # 事件游標與統計也一起保存，還原後重新模擬的 tick 不會重複產生事件或重複計入統計
+        events = (self.events.cursor(), self.sound_cursor, self.stats.save())
+        return (snakes, self.foods[:], self.game_active, self.winner_message, self.game_over_sound_played,
+                self.scheduler.save(), self.headings[:], events)
+
+    # 將遊戲狀態還原到指定的快照
+    def restore_state(self, state):
+        """還原狀態快照"""
+        snakes, foods, self.game_active, self.winner_message, self.game_over_sound_played, scheduler, headings, events = state
+        self.scheduler.restore(scheduler)
+        self.headings = headings[:]
+        cursor, self.sound_cursor, stats = events
+        self.events.truncate(cursor) # 捨棄預測產生的事件
+        self.stats.restore(stats)
+        self.snakes = []
+        for snake, cells, direction, length, score, is_dead, death_time in snakes:
+            snake.set_cells(cells) # 複製到蛇自己的緩衝區，同一個快照可以重複還原
+            snake.direction = direction
+            snake.length = length
+            snake.score = score
+            snake.is_dead = is_dead
+            snake.death_time = death_time
+            self.snakes.append(snake)
+        self.foods = foods[:]
+        if self.observer is not None:
+            self.observer.invalidate() # 身體可能被整段替換，觀測在下次同步時重建
+
+    # 獲取當前所有被蛇身體和食物佔據的格子編號集合 (y * GRID_WIDTH + x)
     def get_all_occupied_positions(self):
         """獲取所有被蛇和食物佔據的位置"""
         occupied = set() # 使用集合可以自動去重，並且查找效率高
         # 遍歷所有蛇
         for snake in self.snakes:
-            occupied.update(snake.positions) # 將蛇的所有身體部分的座標加入集合
+            occupied.update(snake.cells()) # 將蛇的所有身體部分的格子編號加入集合
         # 遍歷所有食物
         for food in self.foods:
-            occupied.add(food.position) # 將食物的座標加入集合
+            occupied.add(food.cell) # 將食物的格子編號加入集合
         return occupied # 返回包含所有佔用位置的集合
 
     # 處理蛇吃到食物的邏輯：蛇增長、播放音效、移除食物、生成新食物
@@ -201,68 +337,60 @@ class Game:
         # 遍歷食物列表，獲取索引 i 和食物物件 food
         for i, food in enumerate(self.foods):
             # 對於每個食物，遍歷所有蛇
-            for snake in self.snakes:
+            for index, snake in enumerate(self.snakes):
                 # 檢查蛇是否活著，以及蛇頭的位置是否與當前食物的位置相同
-                if not snake.is_dead and snake.get_head_position() == food.position:
+                if not snake.is_dead and snake.head_cell == food.cell:
                     snake.grow(food.score) # 呼叫蛇的 grow 方法，傳入食物的分值 (可能為負)
-                    self.play_sound('eating') # 播放吃東西的音效
+                    self.events.emit(EVENT_EAT, self.scheduler.tick, index, food.score, food.cell) # 音效在 tick 結束後依事件播放
                     eaten_foods_indices.append(i) # 將該食物的索引記錄下來
                     break # 一個食物只能被一條蛇吃，找到吃的蛇後跳出內層循環，檢查下一個食物
 
         # 如果本輪有食物被吃掉
         if eaten_foods_indices:
-            # 重新計算當前所有被佔用的位置 (因為蛇可能增長了)
-            occupied_positions = self.get_all_occupied_positions()
             # 從後往前遍歷被吃掉食物的索引列表，這樣刪除元素時不會影響前面元素的索引
             for index in sorted(eaten_foods_indices, reverse=True):
-                eaten_food_pos = self.foods[index].position # 獲取被吃食物的位置
-                # 從佔用位置集合中移除該位置 (如果存在的話)
-                if eaten_food_pos in occupied_positions:
-                    occupied_positions.remove(eaten_food_pos)
                 del self.foods[index] # 從食物列表中刪除該食物物件
+            # 重新計算當前所有被佔用的位置 (被吃掉的食物所在的格子仍被蛇頭佔據，新的食物不能生成在那裡)
+            occupied_positions = self.get_all_occupied_positions()
             # 根據遊戲模式確定場上應有的最大食物數
             max_foods = MAX_FOOD_SINGLE if self.mode == "single" else MAX_FOOD_MULTI
-            # 持續生成新食物，直到場上食物數量達到最大值
-            while len(self.foods) < max_foods:
-                self.spawn_new_food(occupied_positions) # 傳入更新後的佔用位置集合
-
-    # 處理食物因超時而消失的邏輯
+            # 持續生成新食物，直到場上食物數量達到最大值 (棋盤沒有空格時停止)
+            while len(self.foods) < max_foods and self.spawn_new_food(occupied_positions): # 傳入更新後的佔用位置集合
+                pass
+
+    # 計時器的食物超時事件：食物仍在場上 (沒有被吃掉或被清除) 時移除
+    def expire_food(self, food):
+        """食物超時消失"""
+        if food in self.foods:
+            self.foods.remove(food)
+
+    # 執行這個 tick 到期的計時事件，有食物超時消失時補充新的食物
+    # 每個 tick 只處理到期的事件，成本與場上的食物數量無關
     def handle_food_timeout(self):
         """處理食物超時邏輯"""
-        timed_out_foods_indices = [] # 用於儲存本輪超時消失的食物索引
-        # 遍歷所有食物
-        for i, food in enumerate(self.foods):
-            # 呼叫食物自身的 is_timed_out 方法檢查是否超時
-            if food.is_timed_out():
-                timed_out_foods_indices.append(i) # 如果超時，記錄索引
-
-        # 如果本輪有食物超時
-        if timed_out_foods_indices:
-            # 重新獲取當前所有佔用位置 (雖然食物消失不會改變蛇的位置，但保持一致性)
+        food_count = len(self.foods)
+        self.scheduler.run_due() # 執行到期的事件 (可能移除超時的食物)
+        # 根據模式確定最大食物數
+        max_foods = MAX_FOOD_SINGLE if self.mode == "single" else MAX_FOOD_MULTI
+        if len(self.foods) < food_count:
             occupied_positions = self.get_all_occupied_positions()
-            # 從後往前遍歷超時食物的索引列表
-            for index in sorted(timed_out_foods_indices, reverse=True):
-                timed_out_food_pos = self.foods[index].position # 獲取超時食物的位置
-                # 從佔用位置集合中移除該位置
-                if timed_out_food_pos in occupied_positions:
-                    occupied_positions.remove(timed_out_food_pos)
-                del self.foods[index] # 從食物列表中刪除該食物物件
-            # 根據模式確定最大食物數
-            max_foods = MAX_FOOD_SINGLE if self.mode == "single" else MAX_FOOD_MULTI
-            # 持續生成新食物，補充因超時消失的食物，直到達到最大值
-            while len(self.foods) < max_foods:
-                self.spawn_new_food(occupied_positions)
+            # 持續生成新食物，補充因超時消失的食物，直到達到最大值 (棋盤沒有空格時停止)
+            while len(self.foods) < max_foods and self.spawn_new_food(occupied_positions):
+                pass
 
     # 繪製遊戲的主要畫面內容
     def draw(self):
         """繪製遊戲畫面"""
-        self.draw_background() # 首先繪製棋盤格背景
-        # 遍歷所有蛇並呼叫它們的 draw 方法
-        for snake in self.snakes:
-            snake.draw(self.game_surface)
-        # 遍歷所有食物並呼叫它們的 draw 方法
-        for food in self.foods:
-            food.draw(self.game_surface)
+        if self.renderer is not None:
+            self.renderer.draw(self, self.game_surface) # 由替代繪圖器一次產生棋盤、蛇與食物
+        else:
+            self.draw_background() # 首先繪製棋盤格背景
+            # 遍歷所有蛇並呼叫它們的 draw 方法
+            for snake in self.snakes:
+                snake.draw(self.game_surface)
+            # 遍歷所有食物並呼叫它們的 draw 方法
+            for food in self.foods:
+                food.draw(self.game_surface)
         # 在遊戲元素上方繪製分數顯示
         self.draw_score()
         # 如果遊戲已結束 (非活躍狀態)
@@ -296,7 +424,7 @@ class Game:
             # 根據蛇的類型和遊戲模式確定玩家標籤
             player_label = f"玩家 {snake.player_id}" # 預設標籤
             if isinstance(snake, AISnake): # 如果是 AI 蛇
-                player_label = "電腦"
+                player_label = f"電腦 {snake.player_id}" if self.mode == "arena" else "電腦"
             elif self.mode == "single": # 如果是單人模式
                  player_label = "分數" # 只顯示 "分數"
             # 組合最終要顯示的文字
@@ -359,7 +487,7 @@ class Game:
             # 確定玩家標籤
             player_label = f"玩家 {snake.player_id}"
             if isinstance(snake, AISnake):
-                player_label = "電腦"
+                player_label = f"電腦 {snake.player_id}" if self.mode == "arena" else "電腦"
             elif self.mode == "single":
                  player_label = "最終分數" # 單人模式下顯示 "最終分數"
             score_text = f"{player_label}: {snake.score}" # 組合分數文字
@@ -422,7 +550,7 @@ class Game:
             # 使用 next 查找第一條非 AI 且已死亡的蛇，如果找不到則返回 None
             player_snake = next((s for s in self.snakes if not isinstance(s, AISnake) and s.is_dead), None)
             if player_snake: # 如果找到了死掉的玩家蛇
-                self.end_game("電腦獲勝!") # 呼叫結束遊戲方法
+                self.end_game("電腦獲勝!", next((s for s in self.snakes if isinstance(s, AISnake)), None)) # 呼叫結束遊戲方法
                 return # 不再進行後續的碰撞檢測
 
         # --- 廣泛碰撞檢測 --- #
@@ -430,20 +558,22 @@ class Game:
         live_snakes = [s for s in self.snakes if not s.is_dead]
         # 用於儲存本輪因碰撞確定要死亡的蛇在 live_snakes 列表中的索引
         collided_indices = set()
-        # 創建一個字典，用於儲存所有蛇的身體部分 (不包括頭部) 的座標及其對應的蛇在 self.snakes 中的原始索引
+        causes = {} # 每條要死亡的蛇的死因 (live_snakes 的索引: CAUSE_*)
+        tick = self.scheduler.tick
+        # 創建一個字典，用於儲存所有蛇的身體部分 (不包括頭部) 的格子編號及其對應的蛇在 self.snakes 中的原始索引
         all_body_parts = {}
 
         # 填充 all_body_parts 字典
         for i, snake in enumerate(self.snakes): # 遍歷所有蛇 (包括可能已死的，雖然死的蛇身體不應該造成碰撞)
             if not snake.is_dead: # 只考慮活蛇的身體
                  # 遍歷蛇的身體部分 (從索引 1 開始，跳過頭部)
-                 for part in snake.positions[1:]:
-                     all_body_parts[part] = i # 將座標作為 key，蛇的原始索引作為 value
+                 for part in snake.cells()[1:]:
+                     all_body_parts[part] = i # 將格子編號作為 key，蛇的原始索引作為 value
 
         # 1. 檢查蛇頭是否撞到其他蛇的身體
         for i, snake in enumerate(live_snakes): # 遍歷所有活蛇
-            head = snake.get_head_position() # 獲取當前活蛇的頭部座標
-            # 檢查頭部座標是否存在於身體部位字典中
+            head = snake.head_cell # 獲取當前活蛇的頭部格子編號
+            # 檢查頭部格子是否存在於身體部位字典中
             if head in all_body_parts:
                 collided_snake_index = all_body_parts[head] # 獲取被撞身體部位所屬蛇的原始索引
                 original_collided_snake = self.snakes[collided_snake_index] # 獲取被撞的蛇物件
@@ -451,11 +581,13 @@ class Game:
                 if snake != original_collided_snake:
                      # 如果頭撞到了別的蛇的身體，那麼這條蛇 (snake) 死亡
                      collided_indices.add(i) # 將當前蛇在 live_snakes 中的索引加入待死亡集合
+                     causes[i] = CAUSE_BODY
+                     self.events.emit(EVENT_COLLISION, tick, self.snakes.index(snake), collided_snake_index, head)
 
         # 2. 檢查蛇頭對撞 (Head-on collision)
         head_positions = {} # 創建一個字典，用於記錄每個格子座標上有哪些活蛇的頭部
         for i, snake in enumerate(live_snakes): # 遍歷所有活蛇
-            head = snake.get_head_position() # 獲取頭部座標
+            head = snake.head_cell # 獲取頭部格子編號
             if head not in head_positions: # 如果該座標是第一次出現
                 head_positions[head] = [] # 初始化一個空列表
             head_positions[head].append(i) # 將當前蛇在 live_snakes 中的索引加入該座標的列表
@@ -465,6 +597,9 @@ class Game:
             if len(indices) > 1: # 如果同一個格子上有超過一條蛇的頭 (發生了頭對頭碰撞)
                 # 獲取所有在該點碰撞的活蛇物件
                 colliding_live_snakes = [live_snakes[i] for i in indices]
+                for s in colliding_live_snakes:
+                    other = next(o for o in colliding_live_snakes if o is not s) # 記錄其中一條對撞的蛇
+                    self.events.emit(EVENT_COLLISION, tick, self.snakes.index(s), self.snakes.index(other), head)
                 max_score = -1 # 初始化最高分數為 -1
                 winners = [] # 用於記錄分數最高的蛇 (可能不止一條)
 
@@ -483,16 +618,18 @@ class Game:
                     for i in indices:
                         if live_snakes[i] != winner_snake:
                             collided_indices.add(i) # 將其索引加入待死亡集合
+                            causes.setdefault(i, CAUSE_HEAD)
                 else: # 如果有多個最高分 (平局)
                     # 所有參與頭對頭碰撞的蛇都死亡
                     for i in indices:
                         collided_indices.add(i) # 將所有參與碰撞的索引加入待死亡集合
+                        causes.setdefault(i, CAUSE_HEAD)
 
         # --- 處理碰撞結果 --- #
         # 如果 collided_indices 集合不為空，表示本輪有蛇因碰撞死亡
         if collided_indices:
             # 需要從 live_snakes 列表中移除這些蛇，並在 self.snakes 中標記它們為死亡
-            indices_to_kill = set() # 用於儲存需要在 self.snakes 中標記死亡的蛇的原始索引
+            indices_to_kill = {} # 用於儲存需要在 self.snakes 中標記死亡的蛇的原始索引與死因
             # 對 collided_indices (是 live_snakes 的索引) 進行排序，從後往前處理，避免索引問題
             sorted_collided_indices = sorted(list(collided_indices), reverse=True)
             for live_idx in sorted_collided_indices:
@@ -503,11 +640,12 @@ class Game:
                      snake_to_die = live_snakes.pop(live_idx) # 獲取要死的蛇物件
                      # 找到這條蛇在原始 self.snakes 列表中的索引
                      original_idx = self.snakes.index(snake_to_die)
-                     indices_to_kill.add(original_idx) # 記錄原始索引
+                     indices_to_kill[original_idx] = causes[live_idx] # 記錄原始索引與死因
 
             # 根據記錄的原始索引，在 self.snakes 中將對應的蛇標記為死亡
-            for original_idx in indices_to_kill:
+            for original_idx, cause in indices_to_kill.items():
                  self.snakes[original_idx].die()
+                 self.events.emit(EVENT_DEATH, tick, original_idx, cause, self.snakes[original_idx].head_cell)
 
             # 在處理完所有碰撞死亡後，重新生成最新的活蛇列表
             live_snakes = [s for s in self.snakes if not s.is_dead]
@@ -535,20 +673,20 @@ class Game:
 
                     # 比較分數決定勝負
                     if score1 > score2:
-                        self.end_game("玩家 1 獲勝!")
+                        self.end_game("玩家 1 獲勝!", self.snakes[0])
                     elif score2 > score1:
-                        self.end_game("玩家 2 獲勝!")
+                        self.end_game("玩家 2 獲勝!", self.snakes[1])
                     else: # 分數相同，比較死亡時間
                         # 活得更久的獲勝 (死亡時間戳更大)
                         if time1 > time2: # 玩家1 後死
-                            self.end_game("玩家 1 獲勝!")
+                            self.end_game("玩家 1 獲勝!", self.snakes[0])
                         elif time2 > time1: # 玩家2 後死
-                            self.end_game("玩家 2 獲勝!")
+                            self.end_game("玩家 2 獲勝!", self.snakes[1])
                         else: # 分數和死亡時間都相同 (極少情況，例如同時撞牆)
                             self.end_game("平局!")
                 elif len(live_snakes) == 1: # 如果還剩下一條活蛇
                      winner = live_snakes[0] # 剩下的就是勝利者
-                     self.end_game(f"玩家 {winner.player_id} 獲勝!") # 宣布勝利者
+                     self.end_game(f"玩家 {winner.player_id} 獲勝!", winner) # 宣布勝利者
             return # 雙人模式的碰撞處理到此結束
 
         elif self.mode == "ai":
@@ -559,38 +697,57 @@ class Game:
 
             # 如果 AI 蛇死亡，並且玩家蛇還活著
             if ai_snake and ai_snake.is_dead and player_snake and not player_snake.is_dead:
-                self.end_game("玩家獲勝!") # 玩家獲勝
+                self.end_game("玩家獲勝!", player_snake) # 玩家獲勝
             # 如果兩者都死亡了
             elif not live_snakes:
                  # 比較分數決定勝負 (類似雙人模式，但標籤不同)
                  player_score = player_snake.score if player_snake else -1
                  ai_score = ai_snake.score if ai_snake else -1
                  if player_score > ai_score:
-                     self.end_game("玩家獲勝!")
+                     self.end_game("玩家獲勝!", player_snake)
                  elif ai_score > player_score:
-                     self.end_game("電腦獲勝!")
+                     self.end_game("電腦獲勝!", ai_snake)
                  else: # 分數相同，比較死亡時間
                      player_time = player_snake.death_time if player_snake and player_snake.death_time is not None else float('inf')
                      ai_time = ai_snake.death_time if ai_snake and ai_snake.death_time is not None else float('inf')
                      if player_time > ai_time: # 玩家活得久
-                         self.end_game("玩家獲勝!")
+                         self.end_game("玩家獲勝!", player_snake)
                      elif ai_time > player_time: # AI 活得久
-                         self.end_game("電腦獲勝!")
+                         self.end_game("電腦獲勝!", ai_snake)
                      else: # 都相同
                          self.end_game("平局!")
             # 如果只剩下 AI 蛇活著 (玩家蛇已死)，這種情況已在開頭處理
             # 如果只剩下玩家蛇活著 (AI 蛇已死)，則上面已處理
             return # AI 模式的碰撞處理到此結束
 
-
-    # 結束當前遊戲，設定結束原因 (勝利訊息) 並標記遊戲為非活躍狀態
-    def end_game(self, reason):
+        elif self.mode in ("online", "arena"):
+            # 連線與競技場模式：只有一名玩家時，蛇死亡即結束；多名玩家時剩下一條或沒有活蛇即結束
+            if len(self.snakes) <= 1:
+                if not live_snakes:
+                    self.end_game("遊戲結束!")
+            elif len(live_snakes) == 1:
+                self.end_game(f"玩家 {live_snakes[0].player_id} 獲勝!", live_snakes[0])
+            elif not live_snakes:
+                # 全部死亡時先比分數，再比死亡時間 (活得久者勝)
+                ranking = sorted(
+                    self.snakes,
+                    key=lambda s: (s.score, s.death_time if s.death_time is not None else float('inf')),
+                    reverse=True
+                )
+                best, second = ranking[0], ranking[1]
+                if (best.score, best.death_time) == (second.score, second.death_time):
+                    self.end_game("平局!")
+                else:
+                    self.end_game(f"玩家 {best.player_id} 獲勝!", best)
+            return # 連線與競技場模式的碰撞處理到此結束
+
+
+    # 結束當前遊戲，設定結束原因 (勝利訊息) 並標記遊戲為非活躍狀態，winner 為勝利的蛇 (沒有時為 None)
+    def end_game(self, reason, winner=None):
         """結束遊戲並記錄原因"""
         # 確保遊戲當前是活躍的，避免重複結束
         if self.game_active:
             self.game_active = False # 將遊戲標記為非活躍狀態
             self.winner_message = reason # 儲存結束的原因/勝利訊息，用於顯示在結束畫面上
-            # 播放遊戲結束音效 (如果還沒播放過)
-            if not self.game_over_sound_played:
-                self.play_sound('gameover')
-                self.game_over_sound_played = True
+            # 遊戲結束事件 (音效在 tick 結束後依事件播放)
+            self.events.emit(EVENT_GAME_OVER, self.scheduler.tick, -1 if winner is None else self.snakes.index(winner))
@@ -0,0 +1,236 @@
+import argparse
+import collections
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from settings import *
+
+# 比賽紀錄：每一局結束時的結果存進本機的 SQLite 資料庫
+# 寫入由背景執行緒處理，一批紀錄在同一個交易中寫入，繪圖執行緒只是把紀錄放進佇列，不會等待磁碟
+# 排行榜以 (模式, 最高分, 編號) 的索引查詢，翻頁使用上一頁最後一筆的鍵 (keyset) 而不是 OFFSET，
+# 即使有數百萬筆紀錄，每一頁也只讀取索引中相鄰的幾筆
+#
+# 資料表 matches 的欄位：
+#   id         : 自動遞增的編號
+#   played_at  : 結束的時間 (Unix 秒)
+#   mode       : 遊戲模式 (single / multi / ai / online / arena)
+#   duration   : 進行的 tick 數
+#   winner     : 勝利玩家的 player_id (平局或單人模式為 NULL)
+#   best_score : 所有玩家中的最高分 (排行榜依此排序)
+#   scores     : 每位玩家的分數 (依 Game.snakes 的順序，以逗號分隔)
+#   seed       : 亂數種子 (沒有時為 NULL)
+#   replay     : 重播檔路徑 (沒有錄製時為 NULL)
+
+HISTORY_SCHEMA_VERSION = 1 # 資料庫結構版本 (PRAGMA user_version)
+HISTORY_COLUMNS = ('played_at', 'mode', 'duration', 'winner', 'best_score', 'scores', 'seed', 'replay') # 寫入的欄位
+
+# 一筆比賽紀錄 (查詢結果)
+MatchRecord = collections.namedtuple('MatchRecord', ('id',) + HISTORY_COLUMNS)
+
+# 開啟資料庫並建立資料表與索引 (WAL 模式讓選單的查詢與背景寫入互不阻擋)
+def connect(path=HISTORY_DB_PATH):
+    """開啟比賽紀錄資料庫"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL") # WAL 模式下仍能保證資料庫一致，只是斷電時可能少最後幾筆
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version > HISTORY_SCHEMA_VERSION:
+        conn.close()
+        raise ValueError(f"不支援的比賽紀錄版本: {version}")
+    with conn:
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS matches ("
+            "id INTEGER PRIMARY KEY, played_at REAL NOT NULL, mode TEXT NOT NULL, duration INTEGER NOT NULL, "
+            "winner INTEGER, best_score INTEGER NOT NULL, scores TEXT NOT NULL, seed INTEGER, replay TEXT)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS matches_top ON matches (mode, best_score DESC, id DESC)")
+        conn.execute(f"PRAGMA user_version = {HISTORY_SCHEMA_VERSION}")
+    return conn
+
+# 由結束的 Game 產生一筆紀錄 (欄位順序與 HISTORY_COLUMNS 相同)
+def match_record(game, seed=None, replay=None):
+    """產生比賽紀錄"""
+    scores = [snake.score for snake in game.snakes]
+    winner = game.stats.winner # 勝利的蛇在 Game.snakes 中的索引 (由遊戲結束事件得到)
+    winner_id = game.snakes[winner].player_id if winner is not None and winner >= 0 else None
+    return (time.time(), game.mode, game.scheduler.tick, winner_id, max(scores, default=0), ",".join(map(str, scores)), seed, replay)
+
+# 背景寫入比賽紀錄：submit 只把紀錄放進佇列，執行緒把累積的紀錄一次寫入同一個交易
+class HistoryWriter:
+    def __init__(self, path=HISTORY_DB_PATH, batch_size=HISTORY_BATCH_SIZE):
+        self.path = path # 資料庫路徑
+        self.batch_size = batch_size # 每個交易最多寫入的紀錄數
+        self.queue = queue.Queue() # 等待寫入的紀錄 (None 表示結束)
+        self.written = 0 # 已寫入的紀錄數
+        self.error = None # 寫入失敗的原因 (失敗後不再寫入)
+        self.thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self.thread.start()
+
+    # 加入一筆紀錄 (不會阻擋呼叫的執行緒)
+    def submit(self, record):
+        """加入紀錄"""
+        if self.error is None:
+            self.queue.put(record)
+
+    # 背景執行緒：等待紀錄，取出目前佇列中所有的紀錄後一次寫入
+    def _run(self):
+        """寫入迴圈"""
+        try:
+            conn = connect(self.path) # SQLite 連線只能在建立它的執行緒中使用
+        except (sqlite3.Error, OSError, ValueError) as e:
+            self.error = e
+            print(f"無法開啟比賽紀錄資料庫 {self.path}: {e}")
+            return
+        sql = f"INSERT INTO matches ({', '.join(HISTORY_COLUMNS)}) VALUES ({', '.join('?' * len(HISTORY_COLUMNS))})"
+        running = True
+        while running:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                running = False
+                batch = [record for record in batch if record is not None]
+            if not batch:
+                continue
+            try:
+                with conn: # 一批紀錄在同一個交易中寫入
+                    conn.executemany(sql, batch)
+                self.written += len(batch)
+            except sqlite3.Error as e:
+                self.error = e
+                print(f"無法寫入比賽紀錄: {e}")
+                break
+        conn.close()
+
+    # 寫完佇列中所有的紀錄後結束背景執行緒
+    def close(self, timeout=5.0):
+        """關閉寫入器"""
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join(timeout)
+
+# 查詢比賽紀錄 (在呼叫的執行緒中開啟自己的連線)
+class HistoryStore:
+    def __init__(self, path=HISTORY_DB_PATH):
+        self.path = path # 資料庫路徑
+        self.conn = connect(path)
+
+    # 取得某個模式排行榜的一頁 (依最高分由高到低，同分時較新的在前)
+    # after 為上一頁最後一筆的 (best_score, id)，回傳最多 limit 筆紀錄
+    def top(self, mode, limit=HISTORY_PAGE_SIZE, after=None):
+        """排行榜查詢"""
+        columns = ', '.join(MatchRecord._fields)
+        if after is None:
+            rows = self.conn.execute(
+                f"SELECT {columns} FROM matches WHERE mode = ? ORDER BY best_score DESC, id DESC LIMIT ?",
+                (mode, limit))
+        else:
+            rows = self.conn.execute(
+                f"SELECT {columns} FROM matches WHERE mode = ? AND (best_score, id) < (?, ?) ORDER BY best_score DESC, id DESC LIMIT ?",
+                (mode, after[0], after[1], limit))
+        return [MatchRecord(*row) for row in rows]
+
+    # 關閉連線
+    def close(self):
+        """關閉資料庫"""
+        self.conn.close()
+
+# 排行榜的分頁狀態：目前的模式、每一頁起點的堆疊與目前這一頁的紀錄 (只在切換時查詢)
+class HistoryPager:
+    def __init__(self, store, modes=tuple(HISTORY_MODE_NAMES), page_size=HISTORY_PAGE_SIZE):
+        self.store = store # 查詢用的 HistoryStore
+        self.modes = modes # 可以切換的模式
+        self.page_size = page_size # 每頁筆數
+        self.mode_index = 0 # 目前模式的索引
+        self.starts = [None] # 每一頁開始前的鍵 (第一頁為 None)，往前翻頁時取出
+        self.rows = [] # 目前這一頁的紀錄
+        self.has_next = False # 是否還有下一頁
+        self.load()
+
+    # 目前的模式
+    @property
+    def mode(self):
+        return self.modes[self.mode_index]
+
+    # 目前的頁碼 (從 1 開始)
+    @property
+    def page(self):
+        return len(self.starts)
+
+    # 查詢目前這一頁 (多取一筆判斷是否還有下一頁，不需要計算總筆數)
+    def load(self):
+        """載入目前的頁面"""
+        rows = self.store.top(self.mode, self.page_size + 1, self.starts[-1])
+        self.rows = rows[:self.page_size]
+        self.has_next = len(rows) > self.page_size
+
+    # 切換模式 (step 為 1 或 -1)，回到第一頁
+    def switch_mode(self, step):
+        """切換模式"""
+        self.mode_index = (self.mode_index + step) % len(self.modes)
+        self.starts = [None]
+        self.load()
+
+    # 下一頁
+    def next_page(self):
+        """下一頁"""
+        if self.has_next:
+            last = self.rows[-1]
+            self.starts.append((last.best_score, last.id))
+            self.load()
+
+    # 上一頁
+    def previous_page(self):
+        """上一頁"""
+        if len(self.starts) > 1:
+            self.starts.pop()
+            self.load()
+
+# 測試用：寫入大量隨機紀錄 (例如模擬錦標賽產生的資料)，回傳每秒寫入的筆數
+def fill_random(path, count, seed=0):
+    """寫入隨機紀錄"""
+    rng = random.Random(seed)
+    writer = HistoryWriter(path)
+    modes = tuple(HISTORY_MODE_NAMES)
+    start = time.perf_counter()
+    for _ in range(count):
+        players = rng.randint(1, 4)
+        scores = [rng.randint(0, 120) for _ in range(players)]
+        winner = scores.index(max(scores)) + 1 if players > 1 else None
+        writer.submit((time.time(), rng.choice(modes), rng.randint(10, 5000), winner, max(scores), ",".join(map(str, scores)), rng.getrandbits(31), None))
+    writer.close(timeout=None)
+    return count / (time.perf_counter() - start)
+
+# 以命令列查詢排行榜或寫入測試資料
+def main():
+    parser = argparse.ArgumentParser(description="查詢比賽紀錄")
+    parser.add_argument("--db", default=HISTORY_DB_PATH, help="資料庫路徑")
+    parser.add_argument("--mode", choices=sorted(HISTORY_MODE_NAMES), default="single", help="排行榜的模式")
+    parser.add_argument("--top", type=int, default=HISTORY_PAGE_SIZE, help="顯示的筆數")
+    parser.add_argument("--fill", type=int, default=0, metavar="N", help="測試用：先寫入 N 筆隨機紀錄")
+    args = parser.parse_args()
+    if args.fill:
+        rate = fill_random(args.db, args.fill)
+        print(f"已寫入 {args.fill} 筆隨機紀錄 ({rate:.0f} 筆/秒)")
+    store = HistoryStore(args.db)
+    start = time.perf_counter()
+    rows = store.top(args.mode, args.top)
+    elapsed = time.perf_counter() - start
+    for rank, row in enumerate(rows, 1):
+        played = time.strftime('%Y-%m-%d %H:%M', time.localtime(row.played_at))
+        print(f"{rank:3d}. {row.best_score:5d} 分  {row.duration / SNAKE_SPEED:7.1f} 秒  分數 {row.scores:<16} {played}")
+    print(f"{HISTORY_MODE_NAMES[args.mode]}排行榜查詢耗時 {elapsed * 1000:.2f} 毫秒")
+    store.close()
+
+# 程式執行入口
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import asyncio
+import argparse
+import random
+import time
+from settings import *
+from protocol import encode_message, decode_message
+
+DIRECTIONS = [(0, -1), (0, 1), (-1, 0), (1, 0)] # 機器人隨機選擇的方向
+
+# 壓力測試用的機器人客戶端：加入房間後隨機轉向，並統計收到的訊息
+class BotClient:
+    def __init__(self, host, port, turn_chance):
+        self.host = host # 伺服器位址
+        self.port = port # 伺服器埠號
+        self.turn_chance = turn_chance # 每收到一個 tick 時轉向的機率
+        self.messages = 0 # 收到的訊息數
+        self.bytes = 0 # 收到的位元組數
+        self.keyframes = 0 # 收到的關鍵幀數
+        self.max_gap = 0.0 # 相鄰兩個 tick 訊息的最大間隔 (秒)
+
+    # 連線並持續收發，直到 duration 秒後結束
+    async def run(self, duration):
+        """執行機器人"""
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        writer.write(encode_message({'t': 'join'}))
+        deadline = time.perf_counter() + duration
+        last_tick = None
+        try:
+            while True:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    line = await asyncio.wait_for(reader.readline(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if not line:
+                    break
+                self.messages += 1
+                self.bytes += len(line)
+                message = decode_message(line)
+                if message['t'] == 'key':
+                    self.keyframes += 1
+                    last_tick = None # 新的一局開始，不把房間重開的等待時間算進間隔
+                elif message['t'] == 'd':
+                    now = time.perf_counter()
+                    if last_tick is not None:
+                        self.max_gap = max(self.max_gap, now - last_tick)
+                    last_tick = now
+                    if random.random() < self.turn_chance:
+                        writer.write(encode_message({'t': 'in', 'd': list(random.choice(DIRECTIONS))}))
+        finally:
+            writer.close()
+
+# 對伺服器執行壓力測試，並印出統計結果
+async def run_load_test(host, port, rooms, capacity, duration, turn_chance, spawn_server):
+    """執行壓力測試"""
+    server = None
+    if spawn_server:
+        from server import GameServer # 只有在需要時才載入伺服器 (會初始化 pygame)
+        server = GameServer(host, port, capacity)
+        await server.start()
+        port = server.port
+    bots = [BotClient(host, port, turn_chance) for _ in range(rooms * capacity)]
+    started = time.perf_counter()
+    await asyncio.gather(*(bot.run(duration) for bot in bots))
+    elapsed = time.perf_counter() - started
+    total_messages = sum(b.messages for b in bots)
+    total_bytes = sum(b.bytes for b in bots)
+    print(f"房間數: {rooms}，客戶端數: {len(bots)}，測試時間: {elapsed:.1f} 秒")
+    print(f"收到訊息: {total_messages} ({total_messages / elapsed:.0f} 則/秒)")
+    print(f"收到資料: {total_bytes / 1024:.1f} KB ({total_bytes / max(1, total_messages):.1f} 位元組/則)")
+    print(f"關鍵幀: {sum(b.keyframes for b in bots)}")
+    print(f"最大 tick 間隔: {max(b.max_gap for b in bots) * 1000:.1f} 毫秒 (目標 {1000 / SNAKE_SPEED:.0f} 毫秒)")
+    if server:
+        print(f"伺服器 tick: {server.tick_count}，延遲的 tick: {server.late_ticks}")
+        await server.stop()
+
+# 以命令列執行壓力測試
+def main():
+    parser = argparse.ArgumentParser(description="貪吃蛇伺服器壓力測試")
+    parser.add_argument("--host", default=SERVER_HOST, help="伺服器位址")
+    parser.add_argument("--port", type=int, default=SERVER_PORT, help="伺服器埠號")
+    parser.add_argument("--rooms", type=int, default=100, help="同時進行的房間數")
+    parser.add_argument("--capacity", type=int, default=ROOM_CAPACITY, help="每個房間的玩家數量 (需與伺服器一致)")
+    parser.add_argument("--duration", type=float, default=10.0, help="測試秒數")
+    parser.add_argument("--turn-chance", type=float, default=0.2, help="每個 tick 轉向的機率")
+    parser.add_argument("--spawn-server", action="store_true", help="在同一個程序內啟動伺服器")
+    args = parser.parse_args()
+    asyncio.run(run_load_test(args.host, args.port, args.rooms, args.capacity, args.duration, args.turn_chance, args.spawn_server))
+
+# 程式執行入口
+if __name__ == "__main__":
+    main()
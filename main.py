@@ -1,18 +1,32 @@
+from startup import timer as startup_timer # 最先匯入，讓啟動計時包含其他模組的載入時間
 import pygame
 import sys
-import os
 import math
+import time
+import argparse
 from settings import *
+from assets import fonts, SoundLoader, load_image
 from objects import Button
+from sprites import get_snake_sprites
 from game import Game
+from net_client import NetClient
+from rollback import RollbackClient
+from spectator import SpectatorClient
+from history import HistoryWriter, HistoryStore, HistoryPager, match_record
+from savegame import GameSaver, read_save, restore_save
 
 # 主遊戲類別，負責管理遊戲的整體流程、狀態和畫面顯示
 class SnakeGame:
     # 初始化遊戲引擎、音效、視窗、字體和遊戲物件
-    def __init__(self):
-        pygame.init() # 初始化 Pygame 模組
-        pygame.mixer.init() # 初始化音效模組
-        self.load_sounds() # 載入遊戲音效
+    def __init__(self, connect_address=None, delay_ms=0, jitter_ms=0, watch_address=None, startup_report=False, renderer="sprites", policy_path=None, ai_weights_path=None, autopilot=False, pipelined=False):
+        startup_timer.mark("匯入模組")
+        # 只初始化第一幀需要的模組；pygame.init() 會同步開啟音效裝置，改由背景執行緒處理
+        pygame.display.init()
+        pygame.font.init()
+        self.clock = pygame.time.Clock() # 創建時脈物件以控制幀率
+        self.clock.tick() # 第一次 tick 會初始化 SDL 計時器，get_ticks() 從此開始計時
+        self.load_sounds() # 在背景載入遊戲音效
+        startup_timer.mark("初始化 Pygame")
         self.initial_size = self.calculate_initial_window_size() # 計算初始視窗大小
         # 設定遊戲視窗，允許調整大小
         self.screen = pygame.display.set_mode(
@@ -22,50 +36,139 @@ class SnakeGame:
         pygame.display.set_caption("貪吃蛇") # 設定視窗標題
         # 載入並設定視窗圖示
         try:
-            program_icon = pygame.image.load(os.path.join(ASSETS_DIR, "images", "icon.png")) # 載入圖示檔
+            program_icon = load_image(ICON_PATH) # 載入圖示檔
             pygame.display.set_icon(program_icon) # 設定圖示
         except Exception as e:
             print(f"無法載入或設定圖示: {e}") # 如果載入失敗，印出錯誤訊息
+        startup_timer.mark("建立視窗")
         # 創建用於繪製遊戲內容的 Surface
         self.game_surface = pygame.Surface((GAME_WIDTH, GAME_HEIGHT))
         self.load_fonts() # 載入遊戲字體
+        startup_timer.mark("載入字體")
         # 創建 Game 類別的實例，負責處理遊戲邏輯
         self.game = Game(self.screen, self.game_surface, self.sounds)
+        if renderer == "numpy":
+            from bulk_render import BulkRenderer # 需要 NumPy，只在選用時才匯入
+            self.game.renderer = BulkRenderer()
+        if policy_path:
+            from policy import NeuralPolicy # 需要 NumPy，只在選用時才匯入
+            self.game.policy = NeuralPolicy.load(policy_path) # 電腦對戰改用神經網路策略
+        if ai_weights_path:
+            from train_ai import load_weights
+            self.game.ai_weights = load_weights(ai_weights_path) # 電腦對戰改用參數化的啟發式 AI
+        if autopilot:
+            from autopilot import Autopilot
+            self.game.autopilot = Autopilot() # 玩家 1 由哈密頓迴路自動駕駛操作
+        self.saver = GameSaver() # 在背景執行緒寫入進行中遊戲的存檔
+        self.last_save_time = 0 # 上次存檔的時間 (毫秒)
+        self.saved_tick = None # 存檔中的 tick (沒有這一局的存檔時為 None)
+        self.save_message_time = None # 按下存檔鍵的時間 (顯示提示文字)
         self.buttons = [] # 初始化按鈕列表
-        self.create_menu_buttons() # 創建主選單按鈕
+        self.create_menu_buttons(resume=self.saver.exists()) # 創建主選單按鈕 (有存檔時多一個接續按鈕)
         self.state = "menu" # 設定初始遊戲狀態為主選單
         self.game_mode = None # 初始化遊戲模式
         self.countdown_start_time = 0 # 初始化倒數計時開始時間
         self.countdown_duration = 3000 # 設定倒數計時持續時間 (毫秒)
         self.countdown_number = 3 # 初始化倒數計時數字
-        self.clock = pygame.time.Clock() # 創建時脈物件以控制幀率
         self.exit_requested = False # 標記是否請求退出遊戲
         self.exit_sound_playing = False # 標記退出音效是否正在播放
+        self.net_client = None # 連線模式下的客戶端 (單機遊戲時為 None)
+        self.rollback = None # 連線模式下負責預測與回滾的物件
+        self.spectator = None # 觀戰模式下的串流客戶端
+        self.history = HistoryWriter() # 在背景執行緒寫入每一局的比賽紀錄
+        self.history_pager = None # 歷史紀錄畫面的分頁狀態 (第一次開啟時才查詢資料庫)
+        self.match_recorded = False # 這一局的結果是否已經送出紀錄
+        self.pending_events = [] # 閒置時等待到的事件 (留給下一次 handle_events 處理)
+        self.last_input_time = 0 # 最後一次輸入的時間 (毫秒)，超過 IDLE_DELAY 沒有輸入才進入閒置
+        self.redraw_needed = True # 靜止畫面收到事件 (滑鼠、視窗曝光等) 後需要重繪一次
+        self.drawn_screen = None # 上一次繪製時的畫面狀態 (狀態改變時靜止畫面也要重繪)
+        self.pipelined = pipelined # 是否以管線模式進行本機遊戲 (模擬與繪圖分在兩個執行緒)
+        self.pipeline = None # 進行中的管線 (本機遊戲開始時建立)
+        self.view = None # 管線模式下只用來繪圖的 Game (套用模擬執行緒產生的快照)
+        self.rewind = None # 練習 (單人) 模式的倒帶緩衝區 (第一次進行單人遊戲時才配置)
+        self.rewinding = False # 這一幀是否按住倒帶鍵
+        if connect_address:
+            self.connect(connect_address, delay_ms, jitter_ms) # 以精簡客戶端模式連線到伺服器
+        elif watch_address:
+            self.watch(watch_address) # 以觀眾身分觀看伺服器上的對戰
+        self.startup_report = startup_report # 是否在第一幀與音效載入完成後印出啟動時間報告
+        self.first_frame_drawn = False # 標記第一幀是否已繪製
+        startup_timer.mark("建立選單")
 
-    # 載入所有遊戲所需的音效檔案
+    # 在背景執行緒初始化音效模組並載入所有音效；音效字典會在載入完成後被填入
     def load_sounds(self):
         """載入音效"""
-        self.sounds = {
-            'eating': self._load_sound(EATING_SOUND_PATH), # 載入吃食物音效
-            'gameover': self._load_sound(GAMEOVER_SOUND_PATH), # 載入遊戲結束音效
-            'select': self._load_sound(SELECT_SOUND_PATH) # 載入選擇音效
-        }
-
-    # 內部輔助方法，安全地載入單個音效檔案
-    def _load_sound(self, path):
-        """安全載入音效檔案"""
+        self.sound_loader = SoundLoader({
+            'eating': EATING_SOUND_PATH, # 吃食物音效
+            'gameover': GAMEOVER_SOUND_PATH, # 遊戲結束音效
+            'select': SELECT_SOUND_PATH # 選擇音效
+        })
+        self.sounds = self.sound_loader.start()
+
+    # 連線到權威伺服器，進入連線模式 (本地只負責輸入與繪製)
+    def connect(self, address, delay_ms=0, jitter_ms=0):
+        """連線到伺服器"""
+        host, _, port = address.rpartition(":")
         try:
-            # 檢查檔案是否存在
-            if not os.path.exists(path):
-                print(f"無法找到音效檔案: {path}")
-                return None
-            # 載入音效
-            sound = pygame.mixer.Sound(path)
-            return sound
-        except Exception as e:
-            # 處理載入錯誤
-            print(f"載入音效時發生錯誤: {e}")
-            return None
+            self.net_client = NetClient(host or SERVER_HOST, int(port) if port else SERVER_PORT, delay_ms=delay_ms, jitter_ms=jitter_ms)
+        except (OSError, ValueError) as e:
+            print(f"無法連線到伺服器 {address}: {e}")
+            self.net_client = None
+            return
+        self.game.reset_game(mode="online", player_count=0) # 清空本地狀態，等待伺服器的關鍵幀
+        self.rollback = RollbackClient(self.net_client, self.game) # 本地輸入立即預測，收到權威狀態後回滾修正
+        self.game_mode = "online"
+        self.state = "online"
+
+    # 以觀眾身分連線到伺服器；位址可加上 #房間編號 指定房間
+    def watch(self, address):
+        """觀戰"""
+        address, _, room = address.partition("#")
+        host, _, port = address.rpartition(":")
+        try:
+            self.spectator = SpectatorClient(self.game, host or SERVER_HOST, int(port) if port else SERVER_PORT, int(room) if room else None)
+        except (OSError, ValueError) as e:
+            print(f"無法連線到伺服器 {address}: {e}")
+            self.spectator = None
+            return
+        self.game.reset_game(mode="online", player_count=0) # 清空本地狀態，等待串流的關鍵幀
+        self.game_mode = "watch"
+        self.state = "watch"
+
+    # 中斷連線並返回主選單
+    def disconnect(self):
+        """中斷連線"""
+        if self.net_client:
+            self.net_client.close()
+            self.net_client = None
+            self.rollback = None
+        if self.spectator:
+            self.spectator.close()
+            self.spectator = None
+        self.state = "menu"
+        self.game_mode = None
+
+    # 處理連線模式下的按鍵：方向鍵或 WASD 轉向，Esc 離開；遊戲結束後按任意鍵返回主選單
+    def handle_online_events(self, events):
+        """處理連線模式事件"""
+        for event in events:
+            if event.type != pygame.KEYDOWN:
+                continue
+            if event.key == pygame.K_ESCAPE or (self.rollback.has_state and not self.game.game_active):
+                self._stop_game_sounds()
+                self.disconnect()
+                break
+            direction = PLAYER1_CONTROLS.get(event.key) or PLAYER2_CONTROLS.get(event.key)
+            if direction:
+                self.rollback.local_input(direction) # 下一個預測 tick 立即生效，不必等伺服器回應
+
+    # 繪製等待其他玩家加入的畫面
+    def draw_waiting(self):
+        """繪製等待畫面"""
+        self.game.draw_background()
+        text_surface = self.button_font.render("等待其他玩家...", False, TITLE_COLOR)
+        text_rect = text_surface.get_rect(center=(GAME_WIDTH // 2, GAME_HEIGHT // 2))
+        self.game_surface.blit(text_surface, text_rect)
 
     # 計算初始視窗大小，使其適應螢幕尺寸並保留邊界
     def calculate_initial_window_size(self):
@@ -86,52 +189,42 @@ class SnakeGame:
             # 若無法獲取螢幕資訊，使用預設大小
             return 600
 
-    # 載入遊戲所需的字體檔案，若自訂字體失敗則嘗試使用系統字體或預設字體
+    # 載入主選單第一幀需要的字體 (字體檔案只讀取一次，若自訂字體失敗則使用預設字體)
     def load_fonts(self):
         """載入字體"""
-        try:
-            # 檢查自訂字體檔案是否存在
-            if not os.path.exists(FONT_PATH):
-                raise FileNotFoundError(f"找不到字體檔案: {FONT_PATH}")
-            # 載入標題、按鈕和倒數計時的字體
-            self.title_font = pygame.font.Font(FONT_PATH, MENU_TITLE_FONT_SIZE)
-            self.button_font = pygame.font.Font(FONT_PATH, MENU_BUTTON_FONT_SIZE)
-            self.countdown_font = pygame.font.Font(FONT_PATH, 150)
-        except Exception as e:
-            # 處理自訂字體載入錯誤
-            print(f"無法載入自訂字體: {e}")
-            try:
-                # 嘗試獲取系統可用字體
-                available_fonts = pygame.font.get_fonts()
-                if available_fonts:
-                    # 使用第一個可用的系統字體
-                    system_font = available_fonts[0]
-                    self.title_font = pygame.font.SysFont(system_font, MENU_TITLE_FONT_SIZE)
-                    self.button_font = pygame.font.SysFont(system_font, MENU_BUTTON_FONT_SIZE)
-                    self.countdown_font = pygame.font.SysFont(system_font, 150)
-                else:
-                    # 若無系統字體，使用 Pygame 預設字體
-                    self.title_font = pygame.font.Font(None, MENU_TITLE_FONT_SIZE)
-                    self.button_font = pygame.font.Font(None, MENU_BUTTON_FONT_SIZE)
-                    self.countdown_font = pygame.font.Font(None, 150)
-            except Exception:
-                # 若系統字體也失敗，使用 Pygame 預設字體
-                self.title_font = pygame.font.Font(None, MENU_TITLE_FONT_SIZE)
-                self.button_font = pygame.font.Font(None, MENU_BUTTON_FONT_SIZE)
-                self.countdown_font = pygame.font.Font(None, 150)
-
-    # 創建主選單上的按鈕 (單人、雙人、電腦、離開)
-    def create_menu_buttons(self):
+        self.title_font = fonts.get(MENU_TITLE_FONT_SIZE)
+        self.button_font = fonts.get(MENU_BUTTON_FONT_SIZE)
+
+    # 倒數計時的字體在第一次倒數時才建立
+    @property
+    def countdown_font(self):
+        """倒數字體"""
+        return fonts.get(COUNTDOWN_FONT_SIZE)
+
+    # 創建主選單上的按鈕 (單人、雙人、電腦、歷史紀錄、離開)
+    # 有存檔時在最上方加入接續上一局的按鈕 (放在列表最後，其他按鈕依序往下移一格)
+    def create_menu_buttons(self, resume=False):
         """創建主畫面按鈕，包含模式選擇"""
         button_width = 350 # 按鈕寬度
-        button_height = 70 # 按鈕高度
-        button_spacing = 20 # 按鈕間距
+        button_height = 62 # 按鈕高度
+        button_spacing = 14 # 按鈕間距
         # 計算按鈕群組的總高度
-        total_button_height = (button_height + button_spacing) * 4 - button_spacing
+        total_button_height = (button_height + button_spacing) * 5 - button_spacing
         # 計算第一個按鈕的起始 Y 座標，使其大致居中偏上
-        button_y_start = GAME_HEIGHT // 2 - total_button_height // 2 + 50
+        button_y_start = GAME_HEIGHT // 2 - total_button_height // 2 + 90
         # 計算按鈕的 X 座標，使其水平居中
         button_x = GAME_WIDTH // 2 - button_width // 2
+        # 創建接續上一局按鈕
+        resume_button = Button(
+            button_x,
+            button_y_start,
+            button_width,
+            button_height,
+            "接續上一局",
+            self.button_font
+        )
+        if resume:
+            button_y_start += button_height + button_spacing
         # 創建單人遊戲按鈕
         single_button = Button(
             button_x,
@@ -159,23 +252,39 @@ class SnakeGame:
             "電腦對戰",
             self.button_font
         )
+        # 創建歷史紀錄按鈕
+        history_button = Button(
+            button_x,
+            button_y_start + (button_height + button_spacing) * 3,
+            button_width,
+            button_height,
+            "歷史紀錄",
+            self.button_font
+        )
         # 創建離開遊戲按鈕
         exit_button = Button(
             button_x,
-            button_y_start + (button_height + button_spacing) * 3,
+            button_y_start + (button_height + button_spacing) * 4,
             button_width,
             button_height,
             "離開遊戲",
             self.button_font
         )
         # 將所有按鈕添加到列表中
-        self.buttons = [single_button, multi_button, ai_button, exit_button]
+        self.buttons = [single_button, multi_button, ai_button, history_button, exit_button]
+        if resume:
+            self.buttons.append(resume_button)
 
     # 處理遊戲中的所有事件，如關閉視窗、調整大小、按鍵和滑鼠點擊
     def handle_events(self):
         """處理遊戲事件"""
-        events = pygame.event.get() # 獲取當前所有事件
+        events = self.pending_events + pygame.event.get() # 獲取當前所有事件 (包含閒置時等待到的事件)
+        self.pending_events = []
+        if events:
+            self.redraw_needed = True
         for event in events:
+            if event.type in IDLE_WAKE_EVENTS:
+                self.last_input_time = pygame.time.get_ticks() # 有輸入，恢復正常幀率
             # 處理關閉視窗事件
             if event.type == pygame.QUIT:
                 # 避免重複觸發退出
@@ -195,21 +304,41 @@ class SnakeGame:
         elif self.state == "countdown":
             pass # 倒數計時狀態下不處理輸入
         elif self.state == "game":
-            self.game.handle_events(events) # 將事件傳遞給 Game 物件處理遊戲內事件
+            if self.pipeline is not None:
+                self.pipeline.submit(events) # 管線模式：交給模擬執行緒在下一個 tick 處理
+            else:
+                self.game.handle_events(events) # 將事件傳遞給 Game 物件處理遊戲內事件
+                for event in events:
+                    if event.type == pygame.KEYDOWN and event.key == SAVE_KEY and self.game.game_active:
+                        self.save_game()
+                        self.save_message_time = pygame.time.get_ticks() # 顯示已存檔的提示
             # 如果遊戲結束 (game_active 為 False)
-            if not self.game.game_active:
-                # 檢查是否有按鍵按下，若有則返回主選單
+            if not self.shown_game().game_active:
+                # 檢查是否有按鍵按下，若有則返回主選單 (練習模式的倒帶鍵除外)
                 for event in events:
-                    if event.type == pygame.KEYDOWN:
+                    if event.type == pygame.KEYDOWN and not (event.key == REWIND_KEY and self.rewind_available()):
+                        self.stop_pipeline()
+                        self.finish_match() # 離開結束畫面，比賽結果確定
                         self.state = "menu" # 切換回主選單狀態
                         self.game_mode = None # 重置遊戲模式
                         self._stop_game_sounds() # 停止遊戲結束音效
                         break # 找到按鍵事件後跳出迴圈
+        elif self.state == "online":
+            self.handle_online_events(events) # 處理連線模式的輸入
+        elif self.state == "history":
+            self.handle_history_events(events) # 處理歷史紀錄畫面的翻頁
+        elif self.state == "watch":
+            # 觀戰模式只處理 Esc 離開
+            for event in events:
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                    self.disconnect()
+                    break
 
         # 處理退出請求，確保音效播放完畢後才真正退出
         if self.exit_requested and self.exit_sound_playing:
             # 檢查選擇音效是否已播放完畢
-            if self.sounds['select'] and not pygame.mixer.get_busy():
+            # 音效尚未載入或載入失敗時不需要等待
+            if not self.sounds.get('select') or not pygame.mixer.get_busy():
                 self.exit_sound_playing = False # 重置音效播放標記
                 self.quit_game() # 執行退出遊戲的清理工作
 
@@ -225,6 +354,10 @@ class SnakeGame:
         mouse_pos = pygame.mouse.get_pos() # 獲取滑鼠在視窗上的座標
         # 將滑鼠螢幕座標轉換為遊戲 Surface 上的座標
         scaled_mouse_pos = self.screen_to_game_coords(mouse_pos)
+        # 存檔被建立或刪除後重新排列按鈕
+        resume = self.saver.exists()
+        if resume != (len(self.buttons) > 5):
+            self.create_menu_buttons(resume=resume)
 
         # 更新每個按鈕的懸停狀態
         for button in self.buttons:
@@ -237,13 +370,17 @@ class SnakeGame:
 
         # 如果滑鼠被點擊，檢查哪個按鈕被點擊
         if mouse_clicked:
-            if self.buttons[0].check_click(scaled_mouse_pos, mouse_clicked): # 單人遊戲
+            if len(self.buttons) > 5 and self.buttons[5].check_click(scaled_mouse_pos, mouse_clicked): # 接續上一局
+                self.resume_game()
+            elif self.buttons[0].check_click(scaled_mouse_pos, mouse_clicked): # 單人遊戲
                 self.start_game("single")
             elif self.buttons[1].check_click(scaled_mouse_pos, mouse_clicked): # 雙人對戰
                 self.start_game("multi")
             elif self.buttons[2].check_click(scaled_mouse_pos, mouse_clicked): # 電腦對戰
                 self.start_game("ai")
-            elif self.buttons[3].check_click(scaled_mouse_pos, mouse_clicked): # 離開遊戲
+            elif self.buttons[3].check_click(scaled_mouse_pos, mouse_clicked): # 歷史紀錄
+                self.open_history()
+            elif self.buttons[4].check_click(scaled_mouse_pos, mouse_clicked): # 離開遊戲
                 # 避免重複觸發退出
                 if not self.exit_sound_playing:
                     self._stop_game_sounds()
@@ -251,22 +388,111 @@ class SnakeGame:
                     self.exit_requested = True
                     self.exit_sound_playing = True
 
+    # 開啟歷史紀錄畫面 (每次開啟都重新查詢第一頁，包含剛結束的比賽)
+    def open_history(self):
+        """開啟歷史紀錄"""
+        self._play_sound('select')
+        try:
+            if self.history_pager is None:
+                self.history_pager = HistoryPager(HistoryStore(self.history.path))
+            else:
+                self.history_pager.starts = [None]
+                self.history_pager.load()
+        except Exception as e:
+            print(f"無法讀取比賽紀錄: {e}")
+            return
+        self.state = "history"
+
+    # 處理歷史紀錄畫面的按鍵：左右切換模式、上下翻頁、Esc 返回主選單
+    def handle_history_events(self, events):
+        """處理歷史紀錄事件"""
+        pager = self.history_pager
+        for event in events:
+            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                self.state = "menu"
+            elif event.type != pygame.KEYDOWN:
+                continue
+            elif event.key in (pygame.K_ESCAPE, pygame.K_RETURN, pygame.K_SPACE):
+                self.state = "menu"
+            elif event.key in (pygame.K_LEFT, pygame.K_a):
+                pager.switch_mode(-1)
+            elif event.key in (pygame.K_RIGHT, pygame.K_d):
+                pager.switch_mode(1)
+            elif event.key in (pygame.K_DOWN, pygame.K_s, pygame.K_PAGEDOWN):
+                pager.next_page()
+            elif event.key in (pygame.K_UP, pygame.K_w, pygame.K_PAGEUP):
+                pager.previous_page()
+
     # 根據選擇的模式開始遊戲，進入倒數計時狀態
     def start_game(self, mode):
         """準備開始遊戲，進入倒數狀態"""
         self._play_sound('select') # 播放選擇音效
         self.game_mode = mode # 設定遊戲模式
+        self.match_recorded = False
         self.game.reset_game(mode=self.game_mode) # 重置 Game 物件的狀態
+        self.prepare_rewind()
         self.state = "countdown" # 切換到倒數計時狀態
         self.countdown_start_time = pygame.time.get_ticks() # 記錄倒數開始時間
         self.countdown_number = 3 # 重置倒數數字
 
+    # 從存檔接續上一局 (還原後先暫停，按 P 繼續)
+    def resume_game(self):
+        """接續上一局"""
+        self._play_sound('select')
+        try:
+            saved = read_save(self.saver.path)
+            if saved is None:
+                return
+            restore_save(self.game, saved)
+        except (OSError, ValueError) as e:
+            print(f"無法讀取存檔: {e}")
+            self.saver.delete() # 損壞的存檔不再顯示
+            return
+        self.game_mode = saved.mode
+        self.match_recorded = False
+        self.game.game_paused = True
+        self.saved_tick = saved.tick
+        self.last_save_time = pygame.time.get_ticks()
+        self.prepare_rewind()
+        self.state = "game"
+        if self.pipelined:
+            self.start_pipeline()
+        elif self.rewind_available():
+            self.rewind.record(self.game) # 從接續的位置開始記錄
+
+    # 練習 (單人) 模式準備倒帶緩衝區 (第一次才配置)，上一局的紀錄不能倒帶
+    def prepare_rewind(self):
+        """準備倒帶緩衝區"""
+        if self.game_mode == "single" and not self.pipelined:
+            if self.rewind is None:
+                from rewind import RewindBuffer
+                self.rewind = RewindBuffer()
+            self.rewind.clear()
+
+    # 確定比賽結果：送出比賽紀錄並刪除存檔 (結束的比賽不能再接續)
+    # 在關閉結束畫面時才呼叫，練習模式在這之前還可以從結束畫面倒帶回遊戲中
+    def finish_match(self):
+        """確定比賽結果"""
+        if not self.match_recorded:
+            self.history.submit(match_record(self.game)) # 交給背景執行緒寫入紀錄
+            self.match_recorded = True
+        if self.saved_tick is not None:
+            self.saver.delete()
+            self.saved_tick = None
+
+    # 把目前的遊戲交給背景執行緒存檔 (管線模式下遊戲由模擬執行緒更新，只在停止管線後存檔)
+    def save_game(self):
+        """存檔"""
+        if self.pipeline is not None or not self.game.game_active:
+            return
+        self.saver.save(self.game)
+        self.saved_tick = self.game.scheduler.tick
+        self.last_save_time = pygame.time.get_ticks()
+
     # 播放指定名稱的音效
     def _play_sound(self, sound_name):
         """播放指定音效"""
-        sound = self.sounds.get(sound_name) # 從字典中獲取音效物件
-        if sound:
-            sound.play() # 播放音效
+        self.sounds.play(sound_name) # 透過音效面板播放 (尚未載入時會略過)
 
     # 將螢幕上的座標轉換為固定大小的遊戲 Surface 上的座標
     def screen_to_game_coords(self, screen_pos):
@@ -344,40 +570,13 @@ class SnakeGame:
             (9, 5), (9, 6), (10, 6), (11, 6), (12, 6), (13, 6), (13, 7),
             (13, 8), (12, 8), (11, 8), (10, 8), (9, 8), (9, 9)
         ]
-        # 遍歷每個身體部分進行繪製
-        for i, segment in enumerate(segments):
-            segment_length = len(segments)
-            # 計算漸變強度，使蛇頭到蛇尾顏色漸變
-            gradient_intensity = min(1.0, i / (segment_length - 1) * 1.2)
-            # 根據漸變強度計算當前身體部分的顏色 (從 DARK_GREEN 到 GREEN)
-            r = int(DARK_GREEN[0] + (GREEN[0] - DARK_GREEN[0]) * gradient_intensity)
-            g = int(DARK_GREEN[1] + (GREEN[1] - DARK_GREEN[1]) * gradient_intensity)
-            b = int(DARK_GREEN[2] + (GREEN[2] - DARK_GREEN[2]) * gradient_intensity)
-            segment_color = (r, g, b)
-            # 計算身體部分的矩形區域
-            rect = pygame.Rect(
-                int(segment[0] * GRID_SIZE), # 格子 X 座標 * 格子大小
-                int(segment[1] * GRID_SIZE), # 格子 Y 座標 * 格子大小
-                GRID_SIZE, GRID_SIZE
-            )
-            # 計算內部矩形，用於繪製帶邊框效果的圓角矩形
-            inner_rect = pygame.Rect(
-                rect.x + 1, rect.y + 1,
-                rect.width - 2, rect.height - 2
-            )
-            # 繪製圓角矩形
-            pygame.draw.rect(self.game_surface, segment_color, inner_rect, border_radius=min(8, GRID_SIZE // 6))
-
-            # 如果是蛇頭 (i == 0)，繪製眼睛
-            if i == 0:
-                eye_size = max(4, GRID_SIZE // 10) # 眼睛大小
-                eye_offset = GRID_SIZE // 4 # 眼睛偏移量
-                # 根據假設的蛇頭朝向計算眼睛位置 (這裡假設朝左)
-                left_eye = (rect.x + eye_offset, rect.y + eye_offset)
-                right_eye = (rect.x + eye_offset, rect.y + GRID_SIZE - eye_offset - eye_size)
-                # 繪製黑色眼睛
-                pygame.draw.rect(self.game_surface, BLACK, (*left_eye, eye_size, eye_size))
-                pygame.draw.rect(self.game_surface, BLACK, (*right_eye, eye_size, eye_size))
+        # 顏色從蛇頭的 DARK_GREEN 漸變到 GREEN，使用預先繪製的圖塊一次批次繪製
+        sprites = get_snake_sprites(DARK_GREEN, GREEN)
+        palette = sprites.palette(len(segments))
+        batch = [(palette[i], (x * GRID_SIZE, y * GRID_SIZE)) for i, (x, y) in enumerate(segments)]
+        # 蛇頭 (第一節) 換成朝左的有眼睛圖塊
+        batch[0] = (sprites.head(sprites.color(0, len(segments)), (-1, 0)), batch[0][1])
+        self.game_surface.blits(batch, False)
 
     # 將固定大小的遊戲 Surface 內容縮放並繪製到可變大小的主視窗上，保持寬高比
     def draw_scaled_surface(self):
@@ -404,6 +603,7 @@ class SnakeGame:
     # 更新遊戲狀態，主要處理倒數計時邏輯和觸發遊戲邏輯更新
     def update(self):
         """更新遊戲狀態"""
+        self.sounds.new_tick() # 每一幀就是一個遊戲 tick，同一個 tick 內重複的音效只播放一次
         # 如果是倒數計時狀態
         if self.state == "countdown":
             current_time = pygame.time.get_ticks() # 獲取當前時間
@@ -419,9 +619,58 @@ class SnakeGame:
                 # 倒數結束，切換到遊戲狀態
                 self.state = "game"
                 self.game.game_active = True # 啟動遊戲邏輯
+                if self.pipelined:
+                    self.start_pipeline()
+                elif self.rewind_available():
+                    self.rewind.record(self.game) # 起點的關鍵幀，可以倒帶回開局
         # 如果是遊戲狀態
         elif self.state == "game":
-            self.game.update() # 調用 Game 物件的 update 方法處理遊戲邏輯
+            self.rewinding = self.rewind_available() and pygame.key.get_pressed()[REWIND_KEY]
+            if self.rewinding:
+                if self.rewind.rewind(self.game, REWIND_STEPS_PER_FRAME):
+                    self._stop_game_sounds() # 從結束畫面倒帶回遊戲中
+            elif self.pipeline is None:
+                self.game.update() # 調用 Game 物件的 update 方法處理遊戲邏輯
+                if self.rewind_available():
+                    self.rewind.record(self.game) # 記錄這個 tick 的差量
+            # 比賽結束後的紀錄與刪除存檔在關閉結束畫面時才處理 (finish_match)，管線模式由模擬執行緒更新，不在這裡存檔
+            if self.pipeline is None and self.game.game_active and self.game.scheduler.tick != self.saved_tick and pygame.time.get_ticks() - self.last_save_time >= SAVE_INTERVAL:
+                self.save_game() # 定期自動存檔 (只複製狀態，編碼與寫入在背景執行緒)
+        # 如果是連線模式，權威邏輯在伺服器上執行，本地預測並在收到權威狀態時回滾
+        elif self.state == "online":
+            self.rollback.advance()
+            if not self.net_client.connected:
+                print("與伺服器的連線已中斷")
+                self.disconnect()
+        # 如果是觀戰模式，套用串流收到的所有幀
+        elif self.state == "watch":
+            self.spectator.sync()
+            if not self.spectator.connected:
+                print("與伺服器的連線已中斷")
+                self.disconnect()
+
+    # 目前是否可以倒帶 (只有本機的單人練習模式，管線模式下遊戲由模擬執行緒更新)
+    def rewind_available(self):
+        """是否可以倒帶"""
+        return self.rewind is not None and self.game_mode == "single" and self.pipeline is None and self.state == "game"
+
+    # 啟動管線模式：之後由模擬執行緒更新 self.game，主執行緒只繪製 self.view
+    def start_pipeline(self):
+        """啟動管線模式"""
+        from pipeline import FramePipeline
+        self.view = Game(self.screen, self.game_surface, self.sounds) # 音效依快照在主執行緒播放
+        self.view.renderer = self.game.renderer # 繪圖器只在主執行緒使用，可以共用
+        self.pipeline = FramePipeline(self.game)
+        self.pipeline.start()
+
+    # 停止管線模式並印出丟棄與延遲的幀數統計
+    def stop_pipeline(self):
+        """停止管線模式"""
+        if self.pipeline is not None:
+            self.pipeline.stop()
+            print(self.pipeline.report())
+            self.pipeline = None
+            self.view = None
 
     # 繪製倒數計時畫面
     def draw_countdown(self):
@@ -449,6 +698,48 @@ class SnakeGame:
         # 繪製數字本身
         self.game_surface.blit(text_surface, text_rect)
 
+    # 繪製歷史紀錄畫面：目前模式的排行榜 (一頁)，資料只在翻頁或切換模式時查詢
+    def draw_history(self):
+        """繪製歷史紀錄"""
+        pager = self.history_pager
+        self.game.draw_background()
+        overlay = pygame.Surface((GAME_WIDTH, GAME_HEIGHT), pygame.SRCALPHA)
+        overlay.fill(OVERLAY_COLOR)
+        self.game_surface.blit(overlay, (0, 0))
+        title_surface = self.button_font.render(f"< {HISTORY_MODE_NAMES[pager.mode]} >", False, TITLE_COLOR)
+        self.game_surface.blit(title_surface, title_surface.get_rect(center=(GAME_WIDTH // 2, 70)))
+        font = self.game.score_font
+        columns = (60, 180, 340, 520, 700) # 名次、最高分、時間、勝利者、日期的 X 座標
+        headers = ("名次", "最高分", "時間", "勝利者", "日期")
+        for x, header in zip(columns, headers):
+            self.game_surface.blit(font.render(header, False, HIGHLIGHT_COLOR), (x, 140))
+        first_rank = (pager.page - 1) * pager.page_size + 1
+        for i, row in enumerate(pager.rows):
+            y = 200 + i * 60
+            winner = "-" if row.winner is None else f"玩家 {row.winner}"
+            played = time.strftime('%m/%d %H:%M', time.localtime(row.played_at))
+            cells = (str(first_rank + i), str(row.best_score), f"{row.duration / SNAKE_SPEED:.1f} 秒", winner, played)
+            for x, text in zip(columns, cells):
+                self.game_surface.blit(font.render(text, False, TEXT_COLOR), (x, y))
+        if not pager.rows:
+            empty_surface = font.render("還沒有比賽紀錄", False, TEXT_COLOR)
+            self.game_surface.blit(empty_surface, empty_surface.get_rect(center=(GAME_WIDTH // 2, GAME_HEIGHT // 2)))
+        hint = f"第 {pager.page} 頁  ←/→ 切換模式  ↑/↓ 翻頁  Esc 返回"
+        hint_surface = font.render(hint, False, TEXT_COLOR)
+        self.game_surface.blit(hint_surface, hint_surface.get_rect(center=(GAME_WIDTH // 2, GAME_HEIGHT - 50)))
+
+    # 在畫面底部顯示倒帶狀態 (倒帶中顯示還能倒帶的秒數，遊戲結束時提示可以倒帶)
+    def draw_rewind_hint(self):
+        """繪製倒帶提示"""
+        if self.rewinding:
+            text = f"<< 倒帶中  還可倒帶 {self.rewind.seconds():.1f} 秒"
+        elif not self.game.game_active and self.rewind.seconds() > 0:
+            text = f"按住 {pygame.key.name(REWIND_KEY)} 倒帶"
+        else:
+            return
+        hint_surface = self.game.score_font.render(text, False, HIGHLIGHT_COLOR)
+        self.game_surface.blit(hint_surface, hint_surface.get_rect(center=(GAME_WIDTH // 2, GAME_HEIGHT - 30)))
+
     # 根據當前遊戲狀態調用相應的繪製方法，並將最終畫面更新到螢幕
     def draw(self):
         """繪製遊戲畫面"""
@@ -456,28 +747,135 @@ class SnakeGame:
             self.draw_menu() # 繪製主選單
         elif self.state == "countdown":
             self.draw_countdown() # 繪製倒數畫面
+        elif self.state == "history":
+            self.draw_history() # 繪製歷史紀錄
         elif self.state == "game":
-            self.game.draw() # 調用 Game 物件的 draw 方法繪製遊戲內容
+            if self.pipeline is not None:
+                self.view.draw() # 管線模式：繪製最新的快照
+            else:
+                self.game.draw() # 調用 Game 物件的 draw 方法繪製遊戲內容
+                if self.rewind_available():
+                    self.draw_rewind_hint()
+                if self.save_message_time is not None and pygame.time.get_ticks() - self.save_message_time < SAVE_MESSAGE_DURATION:
+                    saved_surface = self.game.score_font.render("已存檔", False, HIGHLIGHT_COLOR)
+                    self.game_surface.blit(saved_surface, saved_surface.get_rect(center=(GAME_WIDTH // 2, GAME_HEIGHT - 70)))
+        elif self.state == "online":
+            if self.rollback and self.rollback.has_state:
+                self.game.draw() # 繪製伺服器同步過來的遊戲狀態
+            else:
+                self.draw_waiting() # 尚未開始，顯示等待畫面
+        elif self.state == "watch":
+            if self.spectator and self.spectator.has_state:
+                self.game.draw() # 繪製串流同步過來的對戰畫面
+            else:
+                self.draw_waiting()
         # 將 game_surface 的內容縮放並繪製到主視窗 screen 上
         self.draw_scaled_surface()
         pygame.display.flip() # 更新整個螢幕顯示
+        self.redraw_needed = False
+        self.drawn_screen = self.screen_state()
+        if not self.first_frame_drawn:
+            self.first_frame_drawn = True
+            startup_timer.mark("第一幀")
+            if self.startup_report:
+                print(startup_timer.report())
+        elif self.startup_report and self.sound_loader.ready.is_set():
+            # 音效在背景載入完成後補印一次報告
+            self.startup_report = False
+            startup_timer.mark("音效載入完成")
+            print(startup_timer.report())
+            print(f"  (背景音效載入耗時 {self.sound_loader.elapsed * 1000:.1f} 毫秒)")
 
     # 清理 Pygame 資源並退出程式
     def quit_game(self):
         """關閉並退出遊戲"""
+        self.stop_pipeline() # 停止模擬執行緒
+        if self.state == "game" and self.game.game_active:
+            self.save_game() # 離開時保存進行中的遊戲，下次可以從主選單接續 (disconnect 會切回主選單，必須先存檔)
+        elif self.state == "game":
+            self.finish_match() # 在結束畫面離開，比賽結果確定
+        self.disconnect() # 關閉與伺服器的連線
+        self.saver.close() # 寫完尚未寫入的存檔
+        self.history.close() # 寫完尚未寫入的比賽紀錄
         pygame.quit() # 卸載 Pygame 模組
         sys.exit() # 退出 Python 程式
 
+    # 目前畫面上的遊戲 (管線模式下 self.game 由模擬執行緒更新，主執行緒只讀取套用快照的 self.view)
+    def shown_game(self):
+        """畫面上的遊戲"""
+        return self.view if self.pipeline is not None else self.game
+
+    # 決定畫面內容的狀態 (靜止畫面只有在這些值改變或收到事件時才重繪)
+    def screen_state(self):
+        """畫面狀態"""
+        game = self.shown_game()
+        return (self.state, game.game_paused, game.game_active, self.save_message_remaining() > 0)
+
+    # "已存檔" 提示還要顯示的毫秒數 (沒有提示時為 0)
+    def save_message_remaining(self):
+        """存檔提示的剩餘時間"""
+        if self.save_message_time is None or self.state != "game":
+            return 0
+        return max(0, SAVE_MESSAGE_DURATION - (pygame.time.get_ticks() - self.save_message_time))
+
+    # 判斷目前是否閒置：None 表示正常更新，"animated" 表示只有小動畫 (主選單的標題、暫停提示的閃爍)，"static" 表示畫面靜止
+    # 連線、觀戰與倒數需要持續更新，等待退出音效時也要持續檢查
+    def idle_mode(self):
+        """判斷閒置狀態"""
+        if self.exit_sound_playing or self.rewinding or pygame.time.get_ticks() - self.last_input_time < IDLE_DELAY:
+            return None
+        game = self.shown_game()
+        if self.state == "menu" or (self.state == "game" and game.game_active and game.game_paused):
+            return "animated"
+        if self.state == "history" or (self.state == "game" and not game.game_active):
+            return "static"
+        return None
+
+    # 閒置時以 pygame.event.wait 等待輸入 (行程在等待期間休眠，不佔用 CPU)，收到事件立即返回
+    # 靜止畫面上的 "已存檔" 提示到期時也要醒來，重繪後提示才會消失
+    def wait_for_input(self, idle):
+        """閒置等待"""
+        timeout = 1000 // IDLE_ANIMATION_FPS if idle == "animated" else IDLE_STATIC_TIMEOUT
+        remaining = self.save_message_remaining()
+        if remaining:
+            timeout = min(timeout, remaining)
+        event = pygame.event.wait(timeout)
+        if event.type != pygame.NOEVENT:
+            self.pending_events.append(event)
+        self.clock.tick() # 重設幀率計時的起點，恢復正常幀率時不會誤判為落後
+
     # 遊戲的主迴圈
+    # 閒置時降低重繪頻率：主選單與暫停畫面只以 IDLE_ANIMATION_FPS 重繪動畫，靜止畫面在沒有變化時完全不重繪
+    # 管線模式下遊戲由模擬執行緒更新，主迴圈以 PIPELINE_RENDER_FPS 檢查，只在有新快照時重繪
     def run(self):
         """遊戲主迴圈"""
         while True:
             self.handle_events() # 處理事件
             self.update() # 更新遊戲狀態
-            self.draw() # 繪製畫面
-            self.clock.tick(SNAKE_SPEED) # 控制遊戲迴圈的幀率
+            idle = self.idle_mode()
+            if self.pipeline is not None and self.state == "game":
+                if self.pipeline.present(self.view) or self.redraw_needed or self.view.game_paused: # 暫停時沒有新快照，提示仍要閃爍
+                    self.draw()
+            elif idle != "static" or self.redraw_needed or self.screen_state() != self.drawn_screen:
+                self.draw() # 繪製畫面
+            if idle is None:
+                self.clock.tick(PIPELINE_RENDER_FPS if self.pipeline is not None else SNAKE_SPEED) # 控制遊戲迴圈的幀率
+            else:
+                self.wait_for_input(idle)
 
 # 程式執行入口
 if __name__ == "__main__":
-    game = SnakeGame() # 創建 SnakeGame 實例
+    parser = argparse.ArgumentParser(description="貪吃蛇")
+    parser.add_argument("--connect", metavar="HOST:PORT", help="以連線模式加入伺服器")
+    parser.add_argument("--delay", type=int, default=0, metavar="MS", help="測試用：收發各加上的人為延遲 (毫秒)")
+    parser.add_argument("--jitter", type=int, default=0, metavar="MS", help="測試用：收發各加上的人為抖動上限 (毫秒)")
+    parser.add_argument("--watch", metavar="HOST:PORT[#ROOM]", help="以觀眾身分觀看伺服器上的對戰")
+    parser.add_argument("--startup-report", action="store_true", help="印出啟動各階段的耗時")
+    parser.add_argument("--policy", metavar="FILE", help="電腦對戰使用的神經網路策略權重檔 (.npz)")
+    parser.add_argument("--ai-weights", metavar="FILE", help="電腦對戰使用的啟發式權重檔 (.json，由 train_ai.py 產生)")
+    parser.add_argument("--autopilot", action="store_true", help="玩家 1 改由哈密頓迴路自動駕駛操作 (單人模式永遠不會死亡)")
+    parser.add_argument("--renderer", choices=["sprites", "numpy"], default="sprites", help="棋盤繪圖方式 (numpy 以 NumPy 一次產生整個棋盤)")
+    parser.add_argument("--pipelined", action="store_true", help="本機遊戲的模擬與繪圖分在兩個執行緒 (結束時印出丟棄與延遲的幀數)")
+    args = parser.parse_args()
+    game = SnakeGame(connect_address=args.connect, delay_ms=args.delay, jitter_ms=args.jitter, watch_address=args.watch, startup_report=args.startup_report, renderer=args.renderer, policy_path=args.policy, ai_weights_path=args.ai_weights, autopilot=args.autopilot, pipelined=args.pipelined) # 創建 SnakeGame 實例
     game.run() # 開始遊戲主迴圈
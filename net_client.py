@@ -0,0 +1,161 @@
+import socket
+import threading
+import queue
+import collections
+import random
+import time
+from settings import *
+from protocol import encode_message, decode_message, apply_keyframe, apply_delta
+
+# 連線客戶端：在背景執行緒接收伺服器訊息，主迴圈每幀再把訊息套用到本地 Game
+# delay_ms / jitter_ms 可以為收發兩個方向各加上人為的延遲與抖動，用於測試回滾
+class NetClient:
+    def __init__(self, host=SERVER_HOST, port=SERVER_PORT, room=None, delay_ms=0, jitter_ms=0):
+        self.sock = socket.create_connection((host, port)) # 連線到伺服器
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1) # 輸入訊息很小，關閉 Nagle 避免延遲
+        self.delay = delay_ms / 1000 # 單向人為延遲 (秒)
+        self.jitter = jitter_ms / 1000 # 單向人為抖動上限 (秒)
+        self.messages = queue.Queue() # 背景執行緒收到的 (可取出時間, 訊息)
+        self.held = [] # 尚未到達人為延遲時間的訊息
+        self.last_release = 0.0 # 上一則收到訊息的可取出時間 (TCP 不會亂序，抖動也不能讓訊息亂序)
+        self.slot = None # 伺服器分配的玩家編號
+        self.connected = True # 標記連線是否仍然有效
+        self.has_state = False # 是否已收到關鍵幀 (收到前不能套用差量)
+        self.rtt = 0.0 # 平滑後的往返延遲 (秒)
+        self.last_ping = 0.0 # 上次送出 ping 的時間
+        self.outgoing = None # 有人為延遲時，待送出的 (送出時間, 資料) 佇列
+        if self.delay or self.jitter:
+            self.outgoing = collections.deque()
+            self.outgoing_lock = threading.Condition()
+            threading.Thread(target=self._send_loop, daemon=True).start()
+        self.send({'t': 'join', 'room': room})
+        self.thread = threading.Thread(target=self._receive_loop, daemon=True)
+        self.thread.start()
+
+    # 計算一則訊息經過人為延遲後的到達時間
+    def _delayed(self, now):
+        """人為延遲時間"""
+        return now + self.delay + random.uniform(0, self.jitter)
+
+    # 送出訊息給伺服器
+    def send(self, message):
+        """送出訊息"""
+        if not self.connected:
+            return
+        data = encode_message(message)
+        if self.outgoing is not None:
+            # 有人為延遲時交給送出執行緒，在指定時間才真正寫入
+            with self.outgoing_lock:
+                # 送出時間不早於前一則，保持 TCP 的順序
+                send_at = max(self._delayed(time.perf_counter()), self.outgoing[-1][0] if self.outgoing else 0.0)
+                self.outgoing.append((send_at, data))
+                self.outgoing_lock.notify()
+            return
+        self._write(data)
+
+    # 直接寫入 socket
+    def _write(self, data):
+        """寫入資料"""
+        try:
+            self.sock.sendall(data)
+        except OSError:
+            self.connected = False
+
+    # 送出執行緒：等到每則訊息的送出時間才寫入 socket
+    def _send_loop(self):
+        """送出迴圈"""
+        with self.outgoing_lock:
+            while self.connected:
+                if not self.outgoing:
+                    self.outgoing_lock.wait(0.1)
+                    continue
+                wait = self.outgoing[0][0] - time.perf_counter()
+                if wait > 0:
+                    self.outgoing_lock.wait(wait)
+                    continue
+                _, data = self.outgoing.popleft()
+                self._write(data)
+
+    # 送出轉向輸入，tick 為客戶端預測該輸入要套用的 tick
+    def send_turn(self, direction, tick=None):
+        """送出轉向"""
+        message = {'t': 'in', 'd': list(direction)}
+        if tick is not None:
+            message['k'] = tick
+        self.send(message)
+
+    # 定期送出 ping 以測量往返延遲
+    def ping(self):
+        """測量延遲"""
+        now = time.perf_counter()
+        if now - self.last_ping >= PING_INTERVAL / 1000:
+            self.last_ping = now
+            self.send({'t': 'ping', 'c': now})
+
+    # 背景執行緒：逐行讀取伺服器訊息並放入佇列
+    def _receive_loop(self):
+        """接收迴圈"""
+        try:
+            with self.sock.makefile('rb') as stream:
+                for line in stream:
+                    release = time.perf_counter()
+                    if self.delay or self.jitter:
+                        release = max(self._delayed(release), self.last_release)
+                        self.last_release = release
+                    self.messages.put((release, decode_message(line)))
+        except (OSError, ValueError):
+            pass
+        self.connected = False
+
+    # 取出所有已經「到達」的訊息；連線控制訊息在這裡處理，只回傳關鍵幀與差量
+    def poll(self):
+        """取出狀態訊息"""
+        now = time.perf_counter()
+        while True:
+            try:
+                self.held.append(self.messages.get_nowait())
+            except queue.Empty:
+                break
+        ready = 0
+        while ready < len(self.held) and self.held[ready][0] <= now:
+            ready += 1
+        arrived = [message for _, message in self.held[:ready]]
+        del self.held[:ready]
+        states = []
+        for message in arrived:
+            kind = message.get('t')
+            if kind == 'welcome':
+                self.slot = message['slot']
+            elif kind == 'pong':
+                sample = now - message['c']
+                self.rtt = sample if self.rtt == 0.0 else self.rtt * 0.8 + sample * 0.2 # 指數平滑
+            elif kind == 'key':
+                self.has_state = True
+                states.append(message)
+            elif kind == 'd' and self.has_state:
+                states.append(message)
+            elif kind == 'error':
+                print(f"伺服器拒絕連線: {message.get('reason')}")
+                self.connected = False
+        return states
+
+    # 把目前收到的所有訊息依序套用到本地 Game，回傳是否有更新
+    def sync(self, game):
+        """同步狀態"""
+        states = self.poll()
+        for message in states:
+            if message['t'] == 'key':
+                apply_keyframe(game, message)
+            else:
+                apply_delta(game, message)
+        return bool(states)
+
+    # 關閉連線
+    def close(self):
+        """關閉連線"""
+        self.connected = False
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR) # 讓背景執行緒的讀取立即結束
+            self.sock.close()
+        except OSError:
+            pass
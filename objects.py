@@ -1,23 +1,112 @@
 import pygame
 import random
-import os
 import math                
+import collections
+from array import array
 from settings import *
+from assets import asset_exists, load_image as load_asset_image
+from sprites import get_snake_sprites, get_dead_segment
+from distance_field import UNREACHABLE
+
+CELL_COUNT = GRID_WIDTH * GRID_HEIGHT # 棋盤的格子數
+BODY_MIN_CAPACITY = 16 # 蛇身環狀緩衝區的最小容量 (不足時加倍)
+
+# 座標轉成格子編號 (y * GRID_WIDTH + x)；蛇身、食物與佔用集合都以編號儲存，只有繪製與對外介面使用座標
+def to_cell(position):
+    """座標轉編號"""
+    return position[1] * GRID_WIDTH + position[0]
+
+# 格子編號轉成座標
+def to_position(cell):
+    """編號轉座標"""
+    return (cell % GRID_WIDTH, cell // GRID_WIDTH)
 
 # 代表遊戲中蛇的類別
+# 身體以 array('H') 環狀緩衝區儲存格子編號：從 head_index 開始往後 size 格依序是頭部到尾巴，
+# 移動時只在頭部前面寫入一格、從尾巴移除一格，不需要搬移整條身體；occupied 記錄每格被佔據的節數，自身碰撞檢查為 O(1)
 class Snake:
+    __slots__ = ('player_id', 'length', 'body', 'head_index', 'size', 'occupied', 'direction', 'score',
+                 'body_color', 'head_color', 'is_dead', 'death_time')
+
     # 初始化蛇的屬性
     def __init__(self, player_id, start_pos, start_dir, color_config):
         self.player_id = player_id # 玩家 ID (用於區分玩家或 AI)
         self.length = 1 # 初始長度
-        self.positions = [start_pos] # 蛇身體佔據的格子座標列表，第一個元素是頭部
+        self.body = array('H', bytes(2 * BODY_MIN_CAPACITY)) # 身體格子編號的環狀緩衝區
+        self.head_index = 0 # 頭部在緩衝區中的索引
+        self.size = 0 # 目前身體的節數
+        self.occupied = bytearray(CELL_COUNT) # 每個格子被身體佔據的節數
+        self.push_head(to_cell(start_pos))
         self.direction = start_dir # 初始移動方向 (x, y)
         self.score = 0 # 初始分數
         self.body_color, self.head_color = color_config # 蛇身體和頭部的顏色配置
         self.is_dead = False # 標記蛇是否死亡
         self.death_time = None # 記錄蛇死亡的時間戳 (用於多人模式平局判斷)
+
+    # 頭部的格子編號
+    @property
+    def head_cell(self):
+        return self.body[self.head_index]
+
+    # 尾巴的格子編號
+    @property
+    def tail_cell(self):
+        return self.body[(self.head_index + self.size - 1) % len(self.body)]
+
+    # 從頭部到尾巴的格子編號列表
+    def cells(self):
+        """身體格子編號"""
+        body = self.body
+        end = self.head_index + self.size
+        if end <= len(body):
+            return body[self.head_index:end].tolist()
+        return body[self.head_index:].tolist() + body[:end - len(body)].tolist()
+
+    # 以格子編號列表 (頭部在前) 取代整條身體
+    def set_cells(self, cells):
+        """設定身體格子"""
+        occupied = self.occupied
+        for cell in self.cells():
+            occupied[cell] = 0
+        self.body = array('H', cells)
+        self.body.frombytes(bytes(2 * max(len(cells), BODY_MIN_CAPACITY))) # 預留空間，之後變長時不需要馬上擴充
+        self.head_index = 0
+        self.size = len(cells)
+        for cell in cells:
+            occupied[cell] += 1
+
+    # 在頭部前面加入一格 (緩衝區已滿時加倍)
+    def push_head(self, cell):
+        """加入頭部"""
+        if self.size == len(self.body):
+            cells = self.cells()
+            self.body = array('H', cells)
+            self.body.frombytes(bytes(2 * len(cells)))
+            self.head_index = 0
+        self.head_index = (self.head_index - 1) % len(self.body)
+        self.body[self.head_index] = cell
+        self.size += 1
+        self.occupied[cell] += 1
+
+    # 移除尾巴的一格，回傳被移除的格子編號
+    def pop_tail(self):
+        """移除尾巴"""
+        self.size -= 1
+        cell = self.body[(self.head_index + self.size) % len(self.body)]
+        self.occupied[cell] -= 1
+        return cell
+
+    # 身體的座標列表 (第一個元素是頭部)，供繪製與對外介面使用
+    @property
+    def positions(self):
+        return [(cell % GRID_WIDTH, cell // GRID_WIDTH) for cell in self.cells()]
+
+    @positions.setter
+    def positions(self, positions):
+        self.set_cells([to_cell(position) for position in positions])
+
     def get_head_position(self):
-        return self.positions[0]
+        return to_position(self.body[self.head_index])
     def turn(self, point):
         # 防止蛇直接掉頭 (長度大於 1 且新方向與當前方向相反)
         if self.length > 1 and (point[0] * -1, point[1] * -1) == self.direction:
@@ -28,20 +117,20 @@ class Snake:
         # 如果蛇已死亡，不能移動
         if self.is_dead:           
             return False # 移動失敗
-        cur = self.get_head_position()
+        cur = self.body[self.head_index]
         x, y = self.direction
-        new_head_x = cur[0] + x
-        new_head_y = cur[1] + y
+        new_head_x = cur % GRID_WIDTH + x
+        new_head_y = cur // GRID_WIDTH + y
         if not (0 <= new_head_x < GRID_WIDTH and 0 <= new_head_y < GRID_HEIGHT):
              return False       
-        new_head = (new_head_x, new_head_y)
-        if len(self.positions) > 1 and new_head in self.positions:
+        new_head = new_head_y * GRID_WIDTH + new_head_x
+        if self.size > 1 and self.occupied[new_head]:
              # 只有當新頭部不是最後一節身體 (尾巴)，或者蛇長度小於等於 2 時才算碰撞
-             if new_head != self.positions[-1] or len(self.positions) <= 2:
+             if new_head != self.tail_cell or self.size <= 2:
                  return False       
-        self.positions.insert(0, new_head)
-        if len(self.positions) > self.length:
-            self.positions.pop()
+        self.push_head(new_head)
+        if self.size > self.length:
+            self.pop_tail()
         return True       
     def grow(self, points=1):
         # 如果蛇已死亡，不能增長
@@ -58,112 +147,104 @@ class Snake:
             actual_reduction = min(reduction, self.length - 1)
             self.length -= actual_reduction
             self.length = max(1, self.length)            
-            while len(self.positions) > self.length:
-                 if self.positions:
-                     self.positions.pop()
+            while self.size > self.length:
+                 self.pop_tail()
     def die(self):
         if not self.is_dead:               
             self.is_dead = True
             self.death_time = pygame.time.get_ticks()          
     def draw(self, surface):
-        """繪製蛇，使用漸變顏色和圓角矩形效果"""
+        """繪製蛇，使用預先繪製的漸變圓角格子，整條蛇以一次 blits 批次繪製"""
+        # 從尾巴畫到頭部，頭部疊在最上層 (格子編號在這裡才轉成像素座標)
+        corners = [(cell % GRID_WIDTH * GRID_SIZE, cell // GRID_WIDTH * GRID_SIZE) for cell in reversed(self.cells())]
         if self.is_dead:
-            pass 
-        for i, p in enumerate(self.positions[::-1]):
-            segment_length = len(self.positions)
-            # 計算顏色漸變強度 (從 0 到約 1.2)，使得靠近頭部的顏色更接近 head_color
-            gradient_intensity = min(1.0, i / max(1, segment_length - 1) * 1.2)
-            base_color = self.head_color # 漸變的起始顏色 (頭部)
-            target_color = self.body_color # 漸變的目標顏色 (身體)
-            # 使用線性插值計算當前節點的顏色
-            r = int(base_color[0] + (target_color[0] - base_color[0]) * gradient_intensity)
-            g = int(base_color[1] + (target_color[1] - base_color[1]) * gradient_intensity)
-            b = int(base_color[2] + (target_color[2] - base_color[2]) * gradient_intensity)
-            segment_color = (r, g, b)
-            rect = pygame.Rect(
-                int(p[0] * GRID_SIZE), 
-                int(p[1] * GRID_SIZE), 
-                GRID_SIZE, GRID_SIZE
-            )
-            inner_rect = pygame.Rect(
-                rect.x + 1, rect.y + 1, 
-                rect.width - 2, rect.height - 2
-            )
-            # 如果蛇死亡，使用灰色；否則使用計算出的漸變色
-            final_color = segment_color if not self.is_dead else (100, 100, 100)       
-            pygame.draw.rect(surface, final_color, inner_rect, border_radius=min(8, GRID_SIZE // 6))
-            if not self.is_dead and i == segment_length - 1:
-                eye_size = max(4, GRID_SIZE // 10)
-                eye_offset = GRID_SIZE // 4
-                dx, dy = self.direction
-                if dx == 0:
-                    if dy == -1:
-                        left_eye = (rect.x + eye_offset, rect.y + eye_offset)
-                        right_eye = (rect.x + GRID_SIZE - eye_offset - eye_size, rect.y + eye_offset)
-                    else:
-                        left_eye = (rect.x + eye_offset, rect.y + GRID_SIZE - eye_offset - eye_size)
-                        right_eye = (rect.x + GRID_SIZE - eye_offset - eye_size, rect.y + GRID_SIZE - eye_offset - eye_size)
-                else:
-                    if dx == -1:
-                        left_eye = (rect.x + eye_offset, rect.y + eye_offset)
-                        right_eye = (rect.x + eye_offset, rect.y + GRID_SIZE - eye_offset - eye_size)
-                    else:
-                        left_eye = (rect.x + GRID_SIZE - eye_offset - eye_size, rect.y + eye_offset)
-                        right_eye = (rect.x + GRID_SIZE - eye_offset - eye_size, rect.y + GRID_SIZE - eye_offset - eye_size)
-                pygame.draw.rect(surface, BLACK, (*left_eye, eye_size, eye_size))
-                pygame.draw.rect(surface, BLACK, (*right_eye, eye_size, eye_size))
+            # 死亡的蛇全部使用灰色且不畫眼睛
+            dead_segment = get_dead_segment()
+            surface.blits([(dead_segment, corner) for corner in corners], False)
+            return
+        count = len(corners)
+        sprites = get_snake_sprites(self.head_color, self.body_color)
+        palette = sprites.palette(count) # 第 i 節使用的漸變圖塊
+        batch = list(zip(palette, corners))
+        # 最後一節 (頭部) 換成有眼睛的圖塊
+        batch[-1] = (sprites.head(sprites.color(count - 1, count), self.direction), batch[-1][1])
+        surface.blits(batch, False)
+
+_food_images = {} # 食物圖片快取：(圖片路徑, 邊長) -> Surface (載入失敗時為 None)，所有食物共用
+
+# 取得縮放成 size x size 的食物圖片，第一次使用時才載入 (無畫面的伺服器不需要載入)
+def get_food_image(path, size=GRID_SIZE):
+    """取得食物圖片"""
+    key = (path, size)
+    base = (path, GRID_SIZE) # 原始大小的圖片
+    if key not in _food_images:
+        if base not in _food_images:
+            try:
+                if not asset_exists(path):
+                    raise FileNotFoundError(f"找不到食物圖片: {path}")
+                loaded_image = load_asset_image(path).convert_alpha()
+                _food_images[base] = pygame.transform.scale(loaded_image, (GRID_SIZE, GRID_SIZE))
+            except Exception as e:
+                print(f"無法載入食物圖片 {path}: {e}")
+                print("將使用純色矩形替代")
+                _food_images[base] = None
+        image = _food_images[base]
+        if key != base:
+            _food_images[key] = None if image is None else pygame.transform.scale(image, (size, size))
+    return _food_images[key]
 
 class Food:
-    def __init__(self, occupied_positions, food_type_data):
+    __slots__ = ('type', 'score', 'color', 'image_path', 'cell', 'expire_tick')
+
+    def __init__(self, occupied_cells, food_type_data, cell=None):
         self.type = food_type_data['type']
         self.score = food_type_data['score']
         self.color = food_type_data['color']
-        self.image_path = food_type_data['image']
-        self.image = None
-        self.use_image = False
-        self.position = (0, 0)
-        self.created_time = pygame.time.get_ticks()
-        self.load_image()
-        self.randomize_position(occupied_positions)
-    def load_image(self):
-        """載入食物圖片"""
-        try:
-            if not os.path.exists(self.image_path):
-                raise FileNotFoundError(f"找不到食物圖片: {self.image_path}")
-            loaded_image = pygame.image.load(self.image_path).convert_alpha()
-            self.image = pygame.transform.scale(loaded_image, (GRID_SIZE, GRID_SIZE))
-            self.use_image = True
-        except Exception as e:
-            print(f"無法載入食物圖片 {self.image_path}: {e}")
-            print("將使用純色矩形替代")
-            self.use_image = False
-    def randomize_position(self, occupied_positions):
-        """確保食物生成在有效且未被佔用的位置"""
-        while True:
-            new_pos = (random.randint(0, GRID_WIDTH - 1),
-                       random.randint(0, GRID_HEIGHT - 1))
-            if new_pos not in occupied_positions:
-                self.position = new_pos
-                break
-        self.created_time = pygame.time.get_ticks()
-    def is_timed_out(self):
-        current_time = pygame.time.get_ticks()
-        if current_time - self.created_time >= FOOD_TIMEOUT:
-            return True
-        return False
+        self.image_path = food_type_data['image'] # 圖片由 get_food_image 共用快取，食物本身不保存 Surface
+        self.cell = 0 # 所在的格子編號
+        self.expire_tick = None # 超時消失的 tick (由 Game 的計時器登記)，None 表示不會超時
+        if cell is None:
+            self.randomize_position(occupied_cells)
+        else:
+            self.cell = cell # 由外部 (例如連線狀態) 指定位置
+
+    # 所在的座標，供繪製與對外介面使用
+    @property
+    def position(self):
+        return to_position(self.cell)
+
+    @position.setter
+    def position(self, position):
+        self.cell = to_cell(position)
+
+    def randomize_position(self, occupied_cells):
+        """確保食物生成在有效且未被佔用的位置 (occupied_cells 是格子編號的集合)"""
+        # 先隨機嘗試幾次；棋盤快滿時改從剩下的空格中挑選，避免一直抽到被佔用的格子
+        for _ in range(FOOD_SPAWN_ATTEMPTS):
+            new_cell = random.randint(0, GRID_WIDTH - 1) + random.randint(0, GRID_HEIGHT - 1) * GRID_WIDTH
+            if new_cell not in occupied_cells:
+                self.cell = new_cell
+                return
+        free_cells = [cell for cell in range(GRID_WIDTH * GRID_HEIGHT) if cell not in occupied_cells]
+        if not free_cells:
+            raise ValueError("棋盤已滿，無法生成食物")
+        self.cell = random.choice(free_cells)
+    def is_timed_out(self, tick):
+        """在遊戲的第 tick 個 tick 時是否已經超時"""
+        return self.expire_tick is not None and tick >= self.expire_tick
     def draw(self, surface):
         """繪製食物，如果沒有圖片則繪製精緻的圓形食物"""
         rect = pygame.Rect(
-            int(self.position[0] * GRID_SIZE),
-            int(self.position[1] * GRID_SIZE),
+            self.cell % GRID_WIDTH * GRID_SIZE,
+            self.cell // GRID_WIDTH * GRID_SIZE,
             GRID_SIZE, GRID_SIZE
         )
         current_time = pygame.time.get_ticks()
         pulse = 0.05 * math.sin(current_time * 0.003) + 0.95                    
-        if self.use_image and self.image:
-            scaled_size = int(GRID_SIZE * pulse)
+        scaled_size = int(GRID_SIZE * pulse)
+        scaled_image = get_food_image(self.image_path, scaled_size) # 脈動只有少數幾種大小，縮放結果也一併快取
+        if scaled_image is not None:
             offset = (GRID_SIZE - scaled_size) // 2
-            scaled_image = pygame.transform.scale(self.image, (scaled_size, scaled_size))
             draw_rect = pygame.Rect(
                 rect.x + offset, 
                 rect.y + offset, 
@@ -262,31 +343,28 @@ class Button:
         return False
 
 class AISnake(Snake):
+    __slots__ = ('target_food',)
+
     def __init__(self, player_id, start_pos, start_dir, color_config):
         super().__init__(player_id, start_pos, start_dir, color_config)
         self.target_food = None          
-    def decide_direction(self, foods, other_snakes):
-        """簡單的 AI 決策：追蹤最近的食物，避開障礙物"""
+    def decide_direction(self, foods, other_snakes, fields=None):
+        """簡單的 AI 決策：追蹤最近的食物，避開障礙物 (有共用的距離場時直接以距離場的佔據格子判斷障礙物)"""
         non_poison_foods = [f for f in foods if f.type != 'poison']
         target_foods = non_poison_foods if non_poison_foods else foods
         if not target_foods:
              return
         head = self.get_head_position()
-        target_foods.sort(key=lambda f: abs(f.position[0] - head[0]) + abs(f.position[1] - head[1]))
+        target_foods.sort(key=lambda f: abs(f.cell % GRID_WIDTH - head[0]) + abs(f.cell // GRID_WIDTH - head[1]))
         self.target_food = target_foods[0]
         target_pos = self.target_food.position
-        obstacles = set()
-        for x in range(-1, GRID_WIDTH + 1):
-            obstacles.add((x, -1))
-            obstacles.add((x, GRID_HEIGHT))
-        for y in range(-1, GRID_HEIGHT + 1):
-            obstacles.add((-1, y))
-            obstacles.add((GRID_WIDTH, y))
-        for snake in other_snakes:
-            if snake == self:
-                obstacles.update(self.positions[1:])
-            else:
-                 obstacles.update(snake.positions)
+        if fields is not None:
+            obstacles = fields.blocked # 被活著的蛇佔據的格子 (以格子編號索引，不需要每條蛇各自建立集合)
+        else:
+            obstacles = bytearray(GRID_WIDTH * GRID_HEIGHT) # 被佔據的格子 (棋盤外的格子以邊界檢查排除)
+            for snake in other_snakes:
+                for cell in (self.cells()[1:] if snake == self else snake.cells()):
+                    obstacles[cell] = 1
         possible_moves = [(0, -1), (0, 1), (-1, 0), (1, 0)]
         current_dx, current_dy = self.direction
         reverse_direction = (-current_dx, -current_dy)
@@ -300,8 +378,7 @@ class AISnake(Snake):
         for move in possible_moves:
             next_head_x = head[0] + move[0]
             next_head_y = head[1] + move[1]
-            next_pos = (next_head_x, next_head_y)
-            if next_pos not in obstacles:
+            if 0 <= next_head_x < GRID_WIDTH and 0 <= next_head_y < GRID_HEIGHT and not obstacles[next_head_y * GRID_WIDTH + next_head_x]:
                 best_direction = move
                 break 
         if best_direction is None:
@@ -310,12 +387,112 @@ class AISnake(Snake):
              for move in safe_moves:
                  next_head_x = head[0] + move[0]
                  next_head_y = head[1] + move[1]
-                 next_pos = (next_head_x, next_head_y)
-                 if next_pos not in obstacles:
+                 if 0 <= next_head_x < GRID_WIDTH and 0 <= next_head_y < GRID_HEIGHT and not obstacles[next_head_y * GRID_WIDTH + next_head_x]:
                      best_direction = move
                      break
         if best_direction is None:
             best_direction = self.direction
         self.direction = best_direction
     def move(self):
-        return super().move()
\ No newline at end of file
+        return super().move()
+
+# 參數化的電腦蛇：對每個安全的移動計算加權分數 (食物距離、可到達空間、毒藥、其他蛇頭)，選出分數最高的方向
+# 權重可以由 train_ai.py 演化訓練得到，沒有指定的權重使用 AI_HEURISTIC_WEIGHTS 的預設值
+class HeuristicAISnake(AISnake):
+    __slots__ = ('weights',)
+
+    def __init__(self, player_id, start_pos, start_dir, color_config, weights=None):
+        super().__init__(player_id, start_pos, start_dir, color_config)
+        self.weights = dict(AI_HEURISTIC_WEIGHTS, **(weights or {})) # 啟發式權重
+
+    # 從格子 start 開始以廣度優先搜尋計算可到達的格子數 (最多搜尋 limit 格，obstacles 是格子編號的集合)
+    @staticmethod
+    def free_space(start, obstacles, limit=AI_SPACE_LIMIT):
+        """計算可到達空間"""
+        seen = {start} # 已到達的格子
+        queue = collections.deque([start]) # 待展開的格子
+        while queue and len(seen) < limit:
+            y, x = divmod(queue.popleft(), GRID_WIDTH)
+            for dx, dy in ((0, -1), (0, 1), (-1, 0), (1, 0)):
+                if not (0 <= x + dx < GRID_WIDTH and 0 <= y + dy < GRID_HEIGHT):
+                    continue
+                cell = (y + dy) * GRID_WIDTH + x + dx
+                if cell not in seen and cell not in obstacles:
+                    seen.add(cell)
+                    queue.append(cell)
+        return min(len(seen), limit)
+
+    # 依加權分數決定方向：每一項都正規化到大約 0 到 1 之間，權重直接表示各項的相對重要性
+    def decide_direction(self, foods, other_snakes, fields=None):
+        """依加權分數決定方向"""
+        if fields is not None:
+            self.decide_from_fields(fields, other_snakes.index(self))
+            return
+        head = self.get_head_position()
+        obstacles = set(self.cells()[1:]) # 自己的身體 (不含頭部) 與其他蛇的身體 (格子編號)
+        opponents = [] # 其他活著的蛇的頭部
+        for snake in other_snakes:
+            if snake is not self:
+                obstacles.update(snake.cells())
+                if not snake.is_dead and snake.size:
+                    opponents.append(snake.get_head_position())
+        targets = [food.position for food in foods if food.type != 'poison'] # 想吃的食物
+        poisons = [food.position for food in foods if food.type == 'poison'] # 要避開的毒藥
+        weights = self.weights
+        reverse_direction = (-self.direction[0], -self.direction[1])
+        best_direction = None
+        best_score = None
+        for move in ((0, -1), (0, 1), (-1, 0), (1, 0)):
+            if self.length > 1 and move == reverse_direction:
+                continue
+            x, y = head[0] + move[0], head[1] + move[1]
+            if not (0 <= x < GRID_WIDTH and 0 <= y < GRID_HEIGHT) or y * GRID_WIDTH + x in obstacles:
+                continue
+            score = weights['space'] * self.free_space(y * GRID_WIDTH + x, obstacles) / AI_SPACE_LIMIT
+            if targets:
+                distance = min(abs(x - fx) + abs(y - fy) for fx, fy in targets)
+                score -= weights['distance'] * distance / (GRID_WIDTH + GRID_HEIGHT)
+            for px, py in poisons:
+                score -= weights['poison'] / (1 + abs(x - px) + abs(y - py))
+            for ox, oy in opponents:
+                score -= weights['opponent'] / (1 + abs(x - ox) + abs(y - oy))
+            if best_score is None or score > best_score:
+                best_direction = move
+                best_score = score
+        if best_direction is not None:
+            self.direction = best_direction # 沒有安全的移動時維持原方向
+
+    # 從共用的距離場計算同樣的四項分數：食物距離與毒藥距離是實際的步數，可到達空間是所在連通區域的大小，
+    # 接近其他蛇頭與 decide_direction 相同，以到每個其他蛇頭的曼哈頓距離計算 (演化訓練的權重在兩種方式下意義相同)
+    def decide_from_fields(self, fields, index):
+        """從距離場依加權分數決定方向"""
+        head = self.get_head_position()
+        weights = self.weights
+        reverse_direction = (-self.direction[0], -self.direction[1])
+        best_direction = None
+        best_score = None
+        for move in ((0, -1), (0, 1), (-1, 0), (1, 0)):
+            if self.length > 1 and move == reverse_direction:
+                continue
+            x, y = head[0] + move[0], head[1] + move[1]
+            if not (0 <= x < fields.width and 0 <= y < fields.height):
+                continue
+            cell = y * fields.width + x
+            if fields.blocked[cell]:
+                continue
+            score = weights['space'] * min(fields.region[cell], AI_SPACE_LIMIT) / AI_SPACE_LIMIT
+            distance = fields.food_distance[cell]
+            if distance != UNREACHABLE:
+                score -= weights['distance'] * distance / (fields.width + fields.height)
+            distance = fields.poison_distance[cell]
+            if distance != UNREACHABLE:
+                score -= weights['poison'] / (1 + distance)
+            for other, head_cell in fields.heads:
+                if other != index:
+                    oy, ox = divmod(head_cell, fields.width)
+                    score -= weights['opponent'] / (1 + abs(x - ox) + abs(y - oy))
+            if best_score is None or score > best_score:
+                best_direction = move
+                best_score = score
+        if best_direction is not None:
+            self.direction = best_direction # 沒有安全的移動時維持原方向
@@ -0,0 +1,174 @@
+import collections
+import numpy as np
+from settings import *
+
+# 以 NumPy 陣列表示的棋盤觀測：每條蛇各有一組通道，隨遊戲進行就地更新
+# 回傳的是唯讀的視圖 (不複製)，供機器學習與分析使用
+
+OBS_OWN_BODY = 0 # 自己的身體 (含頭部)
+OBS_OTHER_BODY = 1 # 其他活著的蛇的身體 (含頭部)
+OBS_OWN_HEAD = 2 # 自己的頭部
+OBS_OTHER_HEAD = 3 # 其他活著的蛇的頭部
+OBS_FOOD = 4 # 食物，每種類型一個通道 (依 FOOD_TYPES 的順序)
+OBS_WALL = OBS_FOOD + len(FOOD_TYPES) # 牆壁 (棋盤外的區域，只出現在裁切視窗中)
+OBS_CHANNELS = OBS_WALL + 1 # 裁切視窗的通道數量
+BOARD_CHANNELS = OBS_WALL # 完整棋盤的通道數量 (棋盤內沒有牆壁，不含牆壁通道)
+FOOD_CHANNELS = {item['type']: OBS_FOOD + i for i, item in enumerate(FOOD_TYPES)} # 食物類型對應的通道
+
+# 棋盤觀測：陣列四周保留 radius 格的牆壁，讓以蛇頭為中心的裁切視窗也只是一個視圖
+# 蛇的身體只在頭部前進與尾巴縮短時更新，每個 tick 的成本與蛇的長度無關
+class BoardObserver:
+    def __init__(self, radius=OBSERVATION_RADIUS, width=GRID_WIDTH, height=GRID_HEIGHT):
+        self.radius = radius # 裁切視窗的半徑 (也是四周牆壁的厚度)
+        self.width = width # 棋盤寬度 (格)
+        self.height = height # 棋盤高度 (格)
+        self.snakes = [] # 目前追蹤的蛇 (與 Game.snakes 相同的物件)
+        self.marked = [] # 每條蛇已寫入陣列的格子編號 (與 Snake.cells() 同順序)，死亡的蛇為空
+        self.heads = [] # 每條蛇已寫入陣列的頭部格子編號，沒有時為 None
+        self.foods = {} # 已寫入陣列的食物 {格子編號: 通道}
+        self.planes = None # 觀測陣列 [蛇, 通道, y, x]，包含四周的牆壁
+
+    # 遊戲狀態被整個替換 (例如回滾還原) 時呼叫，下次同步會重新建立陣列
+    def invalidate(self):
+        """標記需要重建"""
+        self.snakes = []
+
+    # 依照目前的蛇數量重新建立陣列，並寫入所有蛇與食物
+    def _rebuild(self, game):
+        """重建陣列"""
+        r = self.radius
+        self.snakes = list(game.snakes)
+        shape = (len(self.snakes), OBS_CHANNELS, self.height + 2 * r, self.width + 2 * r)
+        if self.planes is not None and self.planes.shape == shape:
+            self.planes.fill(0) # 蛇的數量不變時沿用同一個陣列，先前取得的視圖仍然有效
+        else:
+            self.planes = np.zeros(shape, dtype=np.uint8)
+        self.planes[:, OBS_WALL] = 1
+        self.planes[:, OBS_WALL, r:r + self.height, r:r + self.width] = 0
+        self.marked = [collections.deque() for _ in self.snakes]
+        self.heads = [None] * len(self.snakes)
+        self.foods = {}
+        for index, snake in enumerate(self.snakes):
+            self._mark_all(index, snake)
+        self._sync_foods(game)
+
+    # 加入或移除一個身體格子：自己的身體通道與其他蛇的「其他身體」通道同時更新
+    # 以計數表示，頭部移進另一條蛇身體的那一個 tick 也能正確還原
+    def _add_body(self, index, cell, amount):
+        """更新身體格子"""
+        self._update(index, OBS_OWN_BODY, OBS_OTHER_BODY, cell, amount)
+
+    # 更新一個格子 (格子編號 y * 寬度 + x)：第 index 條蛇的 own 通道，以及其他蛇的 other 通道 (amount 為 1 或 -1)
+    def _update(self, index, own, other, cell, amount):
+        """更新格子計數"""
+        y, x = divmod(cell, self.width)
+        x += self.radius
+        y += self.radius
+        planes = self.planes
+        if amount > 0:
+            planes[:, other, y, x] += 1
+            planes[index, other, y, x] -= 1
+            planes[index, own, y, x] += 1
+        else:
+            planes[index, other, y, x] += 1 # 先加再減，自己的 other 通道不會低於 0
+            planes[:, other, y, x] -= 1
+            planes[index, own, y, x] -= 1
+
+    # 移動頭部標記 (cell 為 None 表示移除)
+    def _set_head(self, index, cell):
+        """更新頭部"""
+        old = self.heads[index]
+        if old is not None:
+            self._update(index, OBS_OWN_HEAD, OBS_OTHER_HEAD, old, -1)
+        if cell is not None:
+            self._update(index, OBS_OWN_HEAD, OBS_OTHER_HEAD, cell, 1)
+        self.heads[index] = cell
+
+    # 清除一條蛇所有的標記
+    def _clear(self, index):
+        """清除蛇"""
+        marked = self.marked[index]
+        while marked:
+            self._add_body(index, marked.pop(), -1)
+        self._set_head(index, None)
+
+    # 寫入一條蛇的所有格子 (死亡的蛇不是障礙物，不寫入)
+    def _mark_all(self, index, snake):
+        """寫入整條蛇"""
+        if snake.is_dead or not snake.size:
+            return
+        cells = snake.cells()
+        self.marked[index].extend(cells)
+        for cell in cells:
+            self._add_body(index, cell, 1)
+        self._set_head(index, cells[0])
+
+    # 同步一條蛇：只處理新的頭部與縮短的尾巴，對不上時才整條重寫
+    def _sync_snake(self, index, snake):
+        """同步蛇"""
+        marked = self.marked[index]
+        if snake.is_dead:
+            if marked:
+                self._clear(index)
+            return
+        if not marked or not snake.size:
+            self._clear(index)
+            self._mark_all(index, snake)
+            return
+        head = snake.head_cell
+        if head != marked[0]:
+            marked.appendleft(head)
+            self._add_body(index, head, 1)
+            self._set_head(index, head)
+        while len(marked) > snake.size:
+            self._add_body(index, marked.pop(), -1)
+        if len(marked) != snake.size or marked[-1] != snake.tail_cell:
+            self._clear(index) # 狀態被直接改寫 (例如一次前進多格)，整條重寫
+            self._mark_all(index, snake)
+
+    # 同步食物：食物很少，直接比對目前的食物與已寫入的食物
+    def _sync_foods(self, game):
+        """同步食物"""
+        r = self.radius
+        current = {food.cell: FOOD_CHANNELS[food.type] for food in game.foods}
+        for cell, channel in list(self.foods.items()):
+            if current.get(cell) != channel:
+                y, x = divmod(cell, self.width)
+                self.planes[:, channel, y + r, x + r] = 0
+                del self.foods[cell]
+        for cell, channel in current.items():
+            if cell not in self.foods:
+                y, x = divmod(cell, self.width)
+                self.planes[:, channel, y + r, x + r] = 1
+                self.foods[cell] = channel
+
+    # 將陣列同步到遊戲目前的狀態 (每個 tick 呼叫一次)
+    def sync(self, game):
+        """同步遊戲狀態"""
+        if len(self.snakes) != len(game.snakes) or any(a is not b for a, b in zip(self.snakes, game.snakes)):
+            self._rebuild(game) # 新的一局或蛇的組成改變
+            return
+        for index, snake in enumerate(self.snakes):
+            self._sync_snake(index, snake)
+        self._sync_foods(game)
+
+    # 取得第 index 條蛇的完整棋盤觀測 [通道, y, x] (唯讀視圖)
+    # 牆壁只存在於棋盤外的區域，完整棋盤中這個通道永遠是 0，因此只回傳前 BOARD_CHANNELS 個通道
+    def board(self, index):
+        """完整棋盤觀測"""
+        r = self.radius
+        view = self.planes[index, :BOARD_CHANNELS, r:r + self.height, r:r + self.width]
+        view.flags.writeable = False
+        return view
+
+    # 取得以第 index 條蛇頭部為中心的裁切視窗 [通道, 2r+1, 2r+1] (唯讀視圖)，棋盤外的區域是牆壁
+    def local(self, index):
+        """蛇頭周圍的觀測"""
+        head = self.heads[index]
+        if head is None:
+            head = self.snakes[index].head_cell # 死亡的蛇仍以最後的頭部位置為中心
+        y, x = divmod(head, self.width)
+        size = 2 * self.radius + 1
+        view = self.planes[index, :, y:y + size, x:x + size]
+        view.flags.writeable = False
+        return view
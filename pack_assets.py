@@ -0,0 +1,56 @@
+import os
+import argparse
+from settings import *
+from assets import ARCHIVE_MAGIC, ARCHIVE_VERSION, ARCHIVE_ALIGNMENT, ARCHIVE_HEADER, ARCHIVE_ENTRY_NAME, ARCHIVE_ENTRY_RANGE
+
+# 建置步驟：把 assets 目錄下的字體、圖片與音效打包成單一的索引封存檔 (格式見 assets.py)
+
+EXCLUDED_EXTENSIONS = ('.ico', '.icns') # 只在建置時使用的檔案 (執行檔圖示)，不需要打包
+
+# 列出要打包的檔案 (以 / 分隔的相對路徑, 完整路徑)，依名稱排序讓輸出穩定
+def collect_files(assets_dir=ASSETS_DIR):
+    """列出資源檔案"""
+    files = []
+    for root, _, names in os.walk(assets_dir):
+        for name in names:
+            if name.lower().endswith(EXCLUDED_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            files.append((os.path.relpath(path, assets_dir).replace(os.sep, '/'), path))
+    return sorted(files)
+
+# 將資源打包成封存檔，回傳打包的檔案數
+def pack(output=ASSET_ARCHIVE_PATH, assets_dir=ASSETS_DIR):
+    """打包資源"""
+    files = collect_files(assets_dir)
+    index_size = sum(ARCHIVE_ENTRY_NAME.size + len(name.encode('utf-8')) + ARCHIVE_ENTRY_RANGE.size for name, _ in files)
+    offset = ARCHIVE_HEADER.size + index_size
+    entries = []
+    for name, path in files:
+        offset += -offset % ARCHIVE_ALIGNMENT # 對齊
+        size = os.path.getsize(path)
+        entries.append((name, path, offset, size))
+        offset += size
+    with open(output, 'wb') as f:
+        f.write(ARCHIVE_HEADER.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION, len(entries), index_size))
+        for name, _, start, size in entries:
+            encoded = name.encode('utf-8')
+            f.write(ARCHIVE_ENTRY_NAME.pack(len(encoded)) + encoded + ARCHIVE_ENTRY_RANGE.pack(start, size))
+        for _, path, start, _ in entries:
+            f.write(b'\0' * (start - f.tell()))
+            with open(path, 'rb') as source:
+                f.write(source.read())
+    return len(entries)
+
+# 以命令列執行打包
+def main():
+    parser = argparse.ArgumentParser(description="將遊戲資源打包成單一封存檔")
+    parser.add_argument("--output", default=ASSET_ARCHIVE_PATH, help="輸出的封存檔路徑")
+    parser.add_argument("--assets", default=ASSETS_DIR, help="資源目錄")
+    args = parser.parse_args()
+    count = pack(args.output, args.assets)
+    print(f"已打包 {count} 個檔案到 {args.output} ({os.path.getsize(args.output) / 1024:.1f} KB)")
+
+# 程式執行入口
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+import collections
+import queue
+import threading
+import time
+from settings import *
+from objects import Snake, AISnake, Food
+from protocol import FOOD_TYPE_IDS, unpack_cell
+
+# 管線模式：遊戲邏輯在模擬執行緒中以固定的 tick 間隔執行，每個 tick 結束後產生一份不可變的畫面快照放進雙緩衝區；
+# 主執行緒 (SDL 的事件與視窗只能在主執行緒使用) 負責繪製，只取最新的快照套用到另一個只用來繪圖的 Game。
+# 繪圖時的 transform.scale、blit 與 display.flip 會釋放 GIL，模擬執行緒可以同時計算下一個 tick，
+# 繪圖偶爾太慢時模擬不會被拖慢 (多出來的快照直接被略過)，模擬太慢時繪圖也不會卡住 (繼續處理輸入)
+# 音效也只在主執行緒播放：模擬用的 Game 在管線執行期間沒有音效，快照帶著累計的吃食物次數與是否進行中，
+# 主執行緒比較前後兩份快照決定要播放的音效 (中間被略過的快照也不會漏掉音效)
+#
+# 統計：
+#   late_ticks  : 模擬超過 tick 間隔的次數 (之後從現在重新計時，不追趕)
+#   dropped     : 產生後還沒被繪製就被更新的快照取代的數量
+#   late_frames : 從產生到繪製超過一個 tick 間隔的快照數量
+
+# 一條蛇的快照 (computer 表示電腦蛇，繪製分數時使用不同的標籤)
+SnakeSnapshot = collections.namedtuple('SnakeSnapshot', ('player_id', 'cells', 'direction', 'score', 'is_dead', 'colors', 'computer'))
+# 一個 tick 的畫面快照 (foods 為 (格子, 食物類型編號) 的 tuple，eaten 為本局累計吃到的食物數)
+FrameSnapshot = collections.namedtuple('FrameSnapshot', ('sequence', 'tick', 'mode', 'snakes', 'foods', 'active', 'paused', 'winner_message', 'eaten', 'produced_at'))
+
+# 由遊戲狀態產生不可變的快照 (只複製繪製需要的欄位)
+def take_snapshot(game, sequence):
+    """產生畫面快照"""
+    snakes = tuple(
+        SnakeSnapshot(s.player_id, tuple(s.cells()), s.direction, s.score, s.is_dead, (s.body_color, s.head_color), isinstance(s, AISnake))
+        for s in game.snakes
+    )
+    foods = tuple((f.cell, FOOD_TYPE_IDS[f.type]) for f in game.foods)
+    eaten = sum(game.stats.eaten.values())
+    return FrameSnapshot(sequence, game.scheduler.tick, game.mode, snakes, foods, game.game_active, game.game_paused, game.winner_message, eaten, time.perf_counter())
+
+# 把快照套用到只用來繪圖的 Game (同一條蛇重複使用原本的物件，食物與 previous 相同時不重建)
+def apply_snapshot(view, snapshot, previous=None):
+    """套用畫面快照"""
+    view.mode = snapshot.mode
+    snakes = []
+    for i, data in enumerate(snapshot.snakes):
+        snake = view.snakes[i] if i < len(view.snakes) else None
+        if snake is None or snake.player_id != data.player_id or isinstance(snake, AISnake) != data.computer:
+            cls = AISnake if data.computer else Snake
+            snake = cls(data.player_id, unpack_cell(data.cells[0]), data.direction, data.colors)
+        snake.set_cells(data.cells)
+        snake.direction = data.direction
+        snake.score = data.score
+        snake.is_dead = data.is_dead
+        snake.body_color, snake.head_color = data.colors
+        snakes.append(snake)
+    view.snakes = snakes
+    if previous is None or snapshot.foods != previous.foods:
+        view.foods = [Food(None, FOOD_TYPES[type_id], cell=cell) for cell, type_id in snapshot.foods]
+    view.game_active = snapshot.active
+    view.game_paused = snapshot.paused
+    view.winner_message = snapshot.winner_message
+
+# 模擬執行緒與繪圖端之間的管線
+class FramePipeline:
+    def __init__(self, game, tick_rate=SNAKE_SPEED):
+        self.game = game # 由模擬執行緒更新的 Game (啟動後主執行緒不再直接讀寫)
+        self.sounds = None # 模擬用的 Game 原本的音效 (管線執行期間由主執行緒依快照播放，停止後還原)
+        self.interval = 1.0 / tick_rate # tick 間隔 (秒)
+        self.slots = [None, None] # 雙緩衝區：模擬執行緒寫入後方的格子後交換
+        self.front = 0 # 目前前方 (最新完成) 的格子
+        self.lock = threading.Lock() # 保護格子的交換
+        self.inputs = queue.SimpleQueue() # 主執行緒收到、尚未交給模擬的事件
+        self.thread = None # 模擬執行緒
+        self.running = False # 模擬執行緒是否應繼續執行
+        self.sequence = 0 # 已產生的快照數
+        self.published_state = None # 上一份快照的 (tick, 暫停, 進行中)，沒有變化時不產生新快照
+        self.game_over = False # 遊戲結束後的最後一份快照是否已產生 (此時比賽統計已更新完畢)
+        self.ticks = 0 # 模擬執行的 tick 數
+        self.late_ticks = 0 # 模擬超過 tick 間隔的次數
+        self.presented = 0 # 最近繪製的快照序號
+        self.last_snapshot = None # 最近繪製的快照
+        self.frames = 0 # 繪製的快照數
+        self.dropped = 0 # 沒被繪製就被取代的快照數
+        self.late_frames = 0 # 從產生到繪製超過一個 tick 間隔的快照數
+        self.latency = 0.0 # 所有繪製快照的延遲總和 (秒)
+
+    # 產生目前狀態的快照並交換雙緩衝區
+    def _publish(self):
+        """發佈快照"""
+        self.sequence += 1
+        snapshot = take_snapshot(self.game, self.sequence)
+        with self.lock:
+            self.slots[self.front ^ 1] = snapshot
+            self.front ^= 1
+        self.published_state = (snapshot.tick, snapshot.paused, snapshot.active)
+
+    # 啟動模擬執行緒 (先產生第一份快照，讓第一幀立即有畫面)
+    def start(self):
+        """啟動管線"""
+        self.sounds, self.game.sounds = self.game.sounds, None # 模擬執行緒不播放音效
+        self._publish()
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="simulation", daemon=True)
+        self.thread.start()
+
+    # 停止模擬執行緒並等待它結束
+    def stop(self):
+        """停止管線"""
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+            self.game.sounds = self.sounds
+
+    # 把主執行緒收到的事件交給模擬執行緒 (在下一個 tick 開始時處理)
+    def submit(self, events):
+        """送出輸入事件"""
+        if events:
+            self.inputs.put(events)
+
+    # 模擬執行緒：處理輸入、更新遊戲、產生快照，依固定間隔重複
+    def _run(self):
+        """模擬迴圈"""
+        next_tick = time.perf_counter() + self.interval
+        while self.running:
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            while True:
+                try:
+                    self.game.handle_events(self.inputs.get_nowait())
+                except queue.Empty:
+                    break
+            self.game.update()
+            if (self.game.scheduler.tick, self.game.game_paused, self.game.game_active) != self.published_state:
+                self._publish()
+            if not self.game.game_active:
+                self.game_over = True
+            self.ticks += 1
+            next_tick += self.interval
+            finished = time.perf_counter()
+            if finished > next_tick:
+                self.late_ticks += 1 # 這個 tick 超過了間隔，從現在重新計時
+                next_tick = finished
+
+    # 取出最新的快照套用到繪圖用的 Game 並播放這段期間的音效，沒有新快照時回傳 False (不需要重繪)
+    def present(self, view):
+        """套用最新快照"""
+        with self.lock:
+            snapshot = self.slots[self.front]
+        if snapshot is None or snapshot.sequence == self.presented:
+            return False
+        self.dropped += max(0, snapshot.sequence - self.presented - 1)
+        latency = time.perf_counter() - snapshot.produced_at
+        self.latency += latency
+        if latency > self.interval:
+            self.late_frames += 1
+        self.presented = snapshot.sequence
+        self.frames += 1
+        apply_snapshot(view, snapshot, self.last_snapshot)
+        previous = self.last_snapshot
+        if previous is not None:
+            if snapshot.eaten > previous.eaten:
+                view.play_sound('eating') # 播放吃東西的音效
+            if previous.active and not snapshot.active:
+                view.play_sound('gameover') # 播放遊戲結束音效
+        self.last_snapshot = snapshot
+        return True
+
+    # 統計摘要
+    def report(self):
+        """管線統計"""
+        average = self.latency / self.frames * 1000 if self.frames else 0.0
+        return (f"管線模式: 模擬 {self.ticks} tick (逾時 {self.late_ticks})，"
+                f"繪製 {self.frames}/{self.sequence} 份快照 (略過 {self.dropped}，延遲 {self.late_frames})，平均延遲 {average:.1f} 毫秒")
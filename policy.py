@@ -0,0 +1,156 @@
+import argparse
+import numpy as np
+from settings import *
+from objects import AISnake
+from observation import BoardObserver, OBS_CHANNELS, BOARD_CHANNELS
+from snake_env import DIRECTIONS
+
+# 神經網路策略：每個 tick 收集所有 AI 蛇的觀測，以一次批次的 NumPy 前向運算決定所有 AI 蛇的方向
+# Python 的呼叫成本每個 tick 只付一次，AI 蛇越多平均每條蛇的成本越低
+#
+# 權重檔 (.npz) 的內容：
+#   kind      : 'mlp' 或 'cnn'
+#   radius    : 觀測視窗半徑 (以蛇頭為中心裁切)，-1 表示使用完整棋盤 (完整棋盤沒有牆壁通道，輸入為 BOARD_CHANNELS 個通道)
+#   conv{i}_w : 第 i 層 3x3 卷積的權重 [輸出通道, 輸入通道, 3, 3] (只有 cnn)
+#   conv{i}_b : 第 i 層卷積的偏差 [輸出通道]
+#   dense{i}_w: 第 i 層全連接的權重 [輸入, 輸出]，最後一層的輸出是四個動作的分數
+#   dense{i}_b: 第 i 層全連接的偏差 [輸出]
+# 隱藏層使用 ReLU；動作編號與 snake_env 相同 (上、下、左、右)
+
+# 3x3 卷積 (邊緣補 0，輸出大小不變)，x 為 [批次, 通道, y, x]
+def _conv3x3(x, weight, bias):
+    """卷積層"""
+    batch, channels, height, width = x.shape
+    padded = np.pad(x, ((0, 0), (0, 0), (1, 1), (1, 1)))
+    windows = np.lib.stride_tricks.sliding_window_view(padded, (3, 3), axis=(2, 3)) # [批次, 通道, y, x, 3, 3]
+    columns = windows.transpose(0, 2, 3, 1, 4, 5).reshape(batch * height * width, channels * 9)
+    out = columns @ weight.reshape(weight.shape[0], -1).T + bias
+    return out.reshape(batch, height, width, -1).transpose(0, 3, 1, 2)
+
+# 從權重檔載入的策略網路
+class NeuralPolicy:
+    def __init__(self, kind, radius, convs, denses):
+        self.kind = kind # 網路種類 ('mlp' 或 'cnn')
+        self.radius = radius # 觀測視窗半徑，None 表示完整棋盤
+        self.convs = convs # 卷積層 [(權重, 偏差), ...]
+        self.denses = denses # 全連接層 [(權重, 偏差), ...]
+
+    # 從 .npz 權重檔載入
+    @classmethod
+    def load(cls, path):
+        """載入權重"""
+        with np.load(path) as data:
+            kind = str(data['kind'])
+            radius = int(data['radius'])
+            convs = cls._layers(data, 'conv')
+            denses = cls._layers(data, 'dense')
+        if kind not in ('mlp', 'cnn') or not denses or (kind == 'mlp' and convs):
+            raise ValueError(f"不支援的策略權重檔: {path}")
+        if radius < 0:
+            cls._drop_wall_channel(convs, denses)
+        return cls(kind, radius if radius >= 0 else None, convs, denses)
+
+    # 舊的完整棋盤權重檔的輸入包含永遠是 0 的牆壁通道 (最後一個通道)：移除對應的權重，輸出與原本完全相同
+    @staticmethod
+    def _drop_wall_channel(convs, denses):
+        """移除牆壁通道的權重"""
+        if convs:
+            weight, bias = convs[0]
+            if weight.shape[1] == OBS_CHANNELS:
+                convs[0] = (np.ascontiguousarray(weight[:, :BOARD_CHANNELS]), bias)
+        else:
+            weight, bias = denses[0]
+            if weight.shape[0] == OBS_CHANNELS * GRID_HEIGHT * GRID_WIDTH:
+                denses[0] = (np.ascontiguousarray(weight[:BOARD_CHANNELS * GRID_HEIGHT * GRID_WIDTH]), bias)
+
+    # 依序讀取 {prefix}{i}_w / {prefix}{i}_b 的層
+    @staticmethod
+    def _layers(data, prefix):
+        """讀取網路層"""
+        layers = []
+        while f"{prefix}{len(layers)}_w" in data:
+            i = len(layers)
+            layers.append((data[f"{prefix}{i}_w"].astype(np.float32), data[f"{prefix}{i}_b"].astype(np.float32)))
+        return layers
+
+    # 以隨機權重建立新的策略 (作為訓練的起點)
+    @classmethod
+    def create(cls, kind="mlp", radius=OBSERVATION_RADIUS, hidden=(64,), conv_channels=(16,), seed=None):
+        """建立隨機策略"""
+        rng = np.random.default_rng(seed)
+        size = 2 * radius + 1 if radius is not None else None
+        height, width = (size, size) if size else (GRID_HEIGHT, GRID_WIDTH)
+        convs = []
+        channels = OBS_CHANNELS if radius is not None else BOARD_CHANNELS
+        if kind == "cnn":
+            for out_channels in conv_channels:
+                scale = np.sqrt(2.0 / (channels * 9))
+                convs.append(((rng.standard_normal((out_channels, channels, 3, 3)) * scale).astype(np.float32), np.zeros(out_channels, np.float32)))
+                channels = out_channels
+        denses = []
+        inputs = channels * height * width
+        for outputs in list(hidden) + [len(DIRECTIONS)]:
+            scale = np.sqrt(2.0 / inputs)
+            denses.append(((rng.standard_normal((inputs, outputs)) * scale).astype(np.float32), np.zeros(outputs, np.float32)))
+            inputs = outputs
+        return cls(kind, radius, convs, denses)
+
+    # 儲存成 .npz 權重檔
+    def save(self, path):
+        """儲存權重"""
+        arrays = {'kind': np.array(self.kind), 'radius': np.array(-1 if self.radius is None else self.radius)}
+        for prefix, layers in (('conv', self.convs), ('dense', self.denses)):
+            for i, (weight, bias) in enumerate(layers):
+                arrays[f"{prefix}{i}_w"] = weight
+                arrays[f"{prefix}{i}_b"] = bias
+        np.savez(path, **arrays)
+
+    # 批次前向運算：observations 為 [批次, 通道, y, x]，回傳每個動作的分數 [批次, 4]
+    def forward(self, observations):
+        """前向運算"""
+        x = observations.astype(np.float32)
+        for weight, bias in self.convs:
+            x = np.maximum(_conv3x3(x, weight, bias), 0)
+        x = x.reshape(len(x), -1)
+        for i, (weight, bias) in enumerate(self.denses):
+            x = x @ weight + bias
+            if i < len(self.denses) - 1:
+                x = np.maximum(x, 0)
+        return x
+
+    # 選出每個觀測分數最高的動作
+    def act(self, observations):
+        """選擇動作"""
+        return np.argmax(self.forward(observations), axis=1)
+
+    # 一次決定遊戲中所有活著的 AI 蛇的方向 (取代逐條呼叫 decide_direction)
+    def decide(self, game):
+        """決定 AI 蛇的方向"""
+        indices = [i for i, snake in enumerate(game.snakes) if isinstance(snake, AISnake) and not snake.is_dead]
+        if not indices:
+            return
+        local = self.radius is not None
+        if game.observer is None or (local and game.observer.radius != self.radius):
+            game.observer = BoardObserver(radius=self.radius if local else OBSERVATION_RADIUS) # 視窗大小需要與網路輸入相同
+        game.sync_observer()
+        observer = game.observer
+        batch = np.stack([observer.local(i) if local else observer.board(i) for i in indices])
+        for i, action in zip(indices, self.act(batch)):
+            game.snakes[i].turn(DIRECTIONS[action]) # 與玩家相同，不能直接掉頭
+
+# 以命令列建立隨機權重檔
+def main():
+    parser = argparse.ArgumentParser(description="建立隨機初始化的 AI 策略權重檔")
+    parser.add_argument("output", help="輸出的 .npz 權重檔")
+    parser.add_argument("--kind", choices=["mlp", "cnn"], default="mlp", help="網路種類")
+    parser.add_argument("--radius", type=int, default=OBSERVATION_RADIUS, help="觀測視窗半徑 (-1 表示完整棋盤)")
+    parser.add_argument("--hidden", type=int, nargs="*", default=[64], help="全連接隱藏層的大小")
+    parser.add_argument("--seed", type=int, default=None, help="亂數種子")
+    args = parser.parse_args()
+    policy = NeuralPolicy.create(args.kind, args.radius if args.radius >= 0 else None, args.hidden, seed=args.seed)
+    policy.save(args.output)
+    print(f"已建立 {args.kind} 策略: {args.output}")
+
+# 程式執行入口
+if __name__ == "__main__":
+    main()
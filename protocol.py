@@ -0,0 +1,148 @@
+import json
+from settings import *
+from objects import Snake, Food
+
+# 連線協定：每則訊息為一行精簡 JSON，格子座標壓縮為單一整數 (y * GRID_WIDTH + x，與蛇身和食物內部的格子編號相同，可以直接傳送)
+# 伺服器在遊戲開始時送出完整的關鍵幀 ("key")，之後每個 tick 只送出差量 ("d")
+
+# 食物類型名稱與編號的對照表，傳輸時只送編號
+FOOD_TYPE_IDS = {item['type']: i for i, item in enumerate(FOOD_TYPES)}
+
+# 將格子座標壓縮成單一整數
+def pack_cell(pos):
+    """座標轉整數"""
+    return pos[1] * GRID_WIDTH + pos[0]
+
+# 將單一整數還原成格子座標
+def unpack_cell(cell):
+    """整數轉座標"""
+    return (cell % GRID_WIDTH, cell // GRID_WIDTH)
+
+# 將訊息字典編碼成一行 UTF-8 位元組
+def encode_message(message):
+    """編碼訊息"""
+    return (json.dumps(message, separators=(',', ':'), ensure_ascii=False) + "\n").encode('utf-8')
+
+# 將收到的一行位元組解碼成訊息字典
+def decode_message(line):
+    """解碼訊息"""
+    return json.loads(line)
+
+# 追蹤上一個 tick 送出的狀態，用來產生關鍵幀與差量
+class StateTracker:
+    def __init__(self):
+        self.tick = 0 # 目前的 tick 編號
+        self.snake_state = [] # 每條蛇上次送出的 (頭部, 身體格數, 目標長度, 分數, 是否死亡)
+        self.food_cells = {} # 上次送出的食物 {格子整數: 類型編號}
+        self.winner_message = "" # 上次送出的結束訊息
+
+    # 產生完整狀態的關鍵幀，並以此作為之後差量的基準
+    def keyframe(self, game):
+        """產生關鍵幀"""
+        snakes = []
+        self.snake_state = []
+        for snake in game.snakes:
+            snakes.append([
+                snake.player_id,
+                snake.cells(),
+                list(snake.direction),
+                snake.score,
+                1 if snake.is_dead else 0,
+                snake.length,
+                PLAYER_COLORS.index((snake.body_color, snake.head_color)) if (snake.body_color, snake.head_color) in PLAYER_COLORS else 0
+            ])
+            self.snake_state.append(self._snake_key(snake))
+        self.food_cells = {f.cell: FOOD_TYPE_IDS[f.type] for f in game.foods}
+        self.winner_message = game.winner_message
+        return {
+            't': 'key',
+            'k': self.tick,
+            'm': game.mode,
+            's': snakes,
+            'f': [[cell, type_id] for cell, type_id in self.food_cells.items()],
+            'a': 1 if game.game_active else 0,
+            'w': game.winner_message
+        }
+
+    # 產生自上次送出後的差量；沒有任何變化時只送出 tick 編號
+    def delta(self, game):
+        """產生差量"""
+        self.tick += 1
+        message = {'t': 'd', 'k': self.tick}
+        changes = []
+        for i, snake in enumerate(game.snakes):
+            old_head, old_length = self.snake_state[i][:2]
+            new_key = self._snake_key(snake)
+            if new_key == self.snake_state[i]:
+                continue # 這條蛇沒有變化
+            head = snake.head_cell
+            moved = head != old_head
+            # 每個 tick 蛇最多前進一格，因此新增的頭部最多一格，其餘長度差就是移除的尾巴數
+            removed = old_length + (1 if moved else 0) - snake.size
+            changes.append([i, head if moved else -1, removed, snake.score, 1 if snake.is_dead else 0, snake.length])
+            self.snake_state[i] = new_key
+        if changes:
+            message['s'] = changes
+        food_cells = {f.cell: FOOD_TYPE_IDS[f.type] for f in game.foods}
+        added = [[cell, type_id] for cell, type_id in food_cells.items() if self.food_cells.get(cell) != type_id]
+        removed = [cell for cell in self.food_cells if cell not in food_cells]
+        if added:
+            message['f+'] = added
+        if removed:
+            message['f-'] = removed
+        self.food_cells = food_cells
+        if game.winner_message != self.winner_message:
+            message['w'] = game.winner_message
+            message['a'] = 1 if game.game_active else 0
+            self.winner_message = game.winner_message
+        return message
+
+    # 取得用來判斷蛇是否有變化的狀態
+    def _snake_key(self, snake):
+        """蛇的比較鍵"""
+        return (snake.head_cell, snake.size, snake.length, snake.score, snake.is_dead)
+
+# 將關鍵幀套用到本地的 Game 物件，重建所有蛇和食物 (客戶端使用)
+def apply_keyframe(game, message):
+    """套用關鍵幀"""
+    game.mode = message['m']
+    game.snakes = []
+    for player_id, cells, direction, score, dead, length, color_index in message['s']:
+        snake = Snake(player_id, unpack_cell(cells[0]), tuple(direction), PLAYER_COLORS[color_index % len(PLAYER_COLORS)])
+        snake.set_cells(cells)
+        snake.length = length # 目標長度 (吃到食物後身體會在之後幾個 tick 才長出來)
+        snake.score = score
+        snake.is_dead = bool(dead)
+        game.snakes.append(snake)
+    game.foods = [Food(None, FOOD_TYPES[type_id], cell=cell) for cell, type_id in message['f']]
+    game.game_active = bool(message['a'])
+    game.game_paused = False
+    game.winner_message = message['w']
+
+# 將差量套用到本地的 Game 物件 (客戶端使用)
+def apply_delta(game, message):
+    """套用差量"""
+    # 先套用伺服器在這個 tick 實際採用的輸入，再套用結果 (死亡的蛇不會移動，仍需要正確的方向)
+    for index, dx, dy in message.get('i', ()):
+        game.snakes[index].turn((dx, dy))
+    for index, head_cell, removed, score, dead, length in message.get('s', ()):
+        snake = game.snakes[index]
+        if head_cell >= 0:
+            head = unpack_cell(head_cell)
+            old_head = snake.get_head_position()
+            snake.direction = (head[0] - old_head[0], head[1] - old_head[1]) # 由頭部位移推得方向，用於繪製眼睛
+            snake.push_head(head_cell)
+        for _ in range(min(removed, snake.size)):
+            snake.pop_tail()
+        snake.length = length
+        snake.score = score
+        snake.is_dead = bool(dead)
+    if 'f-' in message:
+        removed_cells = set(message['f-'])
+        game.foods = [f for f in game.foods if f.cell not in removed_cells]
+    for cell, type_id in message.get('f+', ()):
+        game.foods = [f for f in game.foods if f.cell != cell] # 同一格被換成別種食物
+        game.foods.append(Food(None, FOOD_TYPES[type_id], cell=cell))
+    if 'w' in message:
+        game.winner_message = message['w']
+        game.game_active = bool(message['a'])
@@ -0,0 +1,122 @@
+import argparse
+import bisect
+import mmap
+import os
+import random
+from settings import *
+from protocol import StateTracker
+from spectator import SpectatorStream, SpectatorDecoder, LENGTH, is_keyframe, unpack_frame
+
+# 重播檔：直接把觀戰串流的二進位幀依序寫入檔案 (每幀前面有 2 位元組長度，與網路上的格式相同)
+# 一局從關鍵幀開始，之後每個 tick 一幀，每隔 SPECTATOR_KEYFRAME_INTERVAL 個 tick 插入新的關鍵幀，
+# 因此讀取時可以直接跳到任何一幀之前最近的關鍵幀，只需要套用少量的差量
+
+# 把收到的幀寫入重播檔的觀眾 (可以加入 SpectatorStream，與網路觀眾共用同一份編碼)
+class ReplayWriter:
+    def __init__(self, path):
+        self.path = path # 重播檔路徑
+        self.file = open(path, 'wb')
+        self.frames = 0 # 已寫入的幀數
+
+    # 接收一個已編碼的幀 (加入觀眾時收到的關鍵幀與差量會一次傳入)
+    def deliver(self, frame, keyframe):
+        """寫入幀"""
+        if self.file is not None:
+            self.file.write(frame)
+            self.frames += 1
+
+    # 關閉檔案
+    def close(self):
+        """關閉重播檔"""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+# 讀取重播檔：以 mmap 開啟，第一次掃描時只記錄每一幀的位置與關鍵幀的編號，幀的內容在需要時才解碼
+# start 與 end 可以只讀取檔案中的一段位元組 (例如重播庫資料檔中的一局)
+class ReplayReader:
+    def __init__(self, path, start=0, end=None):
+        self.path = path # 重播檔路徑
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(path) else b''
+        self.offsets = [] # 每一幀內容 (不含長度前綴) 的起點
+        self.lengths = [] # 每一幀內容的長度
+        self.keyframes = [] # 關鍵幀的幀編號 (遞增)
+        end = len(self.data) if end is None else min(end, len(self.data))
+        offset = start
+        while offset + LENGTH.size <= end:
+            (length,) = LENGTH.unpack_from(self.data, offset)
+            if offset + LENGTH.size + length > end:
+                break # 寫到一半的最後一幀
+            if is_keyframe(self.data[offset:offset + LENGTH.size + 1]):
+                self.keyframes.append(len(self.offsets))
+            self.offsets.append(offset + LENGTH.size)
+            self.lengths.append(length)
+            offset += LENGTH.size + length
+
+    # 幀數
+    def __len__(self):
+        return len(self.offsets)
+
+    # 解碼第 index 幀
+    def message(self, index):
+        """解碼一幀"""
+        offset = self.offsets[index]
+        return unpack_frame(bytes(self.data[offset:offset + self.lengths[index]]))
+
+    # 第 index 幀之前 (含) 最近的關鍵幀編號，沒有時回傳 None
+    def keyframe_before(self, index):
+        """最近的關鍵幀"""
+        position = bisect.bisect_right(self.keyframes, index)
+        return self.keyframes[position - 1] if position else None
+
+    # 把 game 的狀態設定成第 index 幀之後的狀態 (從最近的關鍵幀開始套用)，回傳套用用的解碼器
+    def seek(self, game, index):
+        """跳到指定的幀"""
+        decoder = SpectatorDecoder(game)
+        start = self.keyframe_before(index)
+        for i in range(0 if start is None else start, index + 1):
+            decoder.apply(self.message(i))
+        return decoder
+
+    # 關閉檔案
+    def close(self):
+        """關閉重播檔"""
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+# 以無畫面的電腦競技場錄製一局重播 (用於測試與產生範例)，回傳寫入的幀數
+def record_arena(path, snakes=ARENA_SNAKES, max_ticks=ENV_MAX_STEPS, seed=None):
+    """錄製電腦競技場"""
+    from game import Game
+    random.seed(seed)
+    game = Game(None, None, None)
+    game.reset_game(mode="arena", player_count=snakes)
+    game.game_active = True
+    tracker = StateTracker()
+    stream = SpectatorStream()
+    writer = ReplayWriter(path)
+    stream.add_viewer(writer)
+    stream.publish(tracker.keyframe(game))
+    try:
+        while game.game_active and tracker.tick < max_ticks:
+            game.update()
+            stream.publish_tick(game, tracker, tracker.delta(game))
+    finally:
+        writer.close()
+    return writer.frames
+
+# 以命令列錄製重播
+def main():
+    parser = argparse.ArgumentParser(description="錄製無畫面的電腦競技場重播")
+    parser.add_argument("output", help="輸出的重播檔")
+    parser.add_argument("--snakes", type=int, default=ARENA_SNAKES, help="AI 蛇的數量")
+    parser.add_argument("--ticks", type=int, default=ENV_MAX_STEPS, help="最多錄製的 tick 數")
+    parser.add_argument("--seed", type=int, default=None, help="亂數種子")
+    args = parser.parse_args()
+    frames = record_arena(args.output, args.snakes, args.ticks, args.seed)
+    print(f"已錄製 {frames} 幀: {args.output}")
+
+# 程式執行入口
+if __name__ == "__main__":
+    main()
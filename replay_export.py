@@ -0,0 +1,213 @@
+import argparse
+import multiprocessing
+import os
+import struct
+import time
+from settings import *
+
+# 把重播檔匯出成 PNG 序列或 GIF 動畫 (無畫面執行，使用 SDL 的 dummy 視訊驅動)
+# 重播依關鍵幀切成多段，每段交給行程池中的一個工作行程：從該段的關鍵幀開始套用差量並繪製每一幀，
+# 各段互不相依，可以平行處理。PNG 由工作行程直接寫入檔案；GIF 的每一幀也在工作行程中量化與壓縮，
+# 主行程只依序把壓縮好的幀寫進檔案，不需要把整部動畫留在記憶體中
+
+GIF_LEVELS = (6, 7, 6) # GIF 固定調色盤的紅、綠、藍階數 (6 * 7 * 6 = 252 色)
+GIF_MAX_CODE = 4096 # GIF 的 LZW 編碼表上限 (12 位元)，與 giflib 相同保留最後一個編碼不使用
+
+# 工作行程初始化：使用 dummy 驅動建立 1x1 的視窗 (convert_alpha 需要顯示模式)
+def _init_worker():
+    """初始化工作行程"""
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    import pygame
+    pygame.display.init()
+    pygame.font.init()
+    pygame.display.set_mode((1, 1))
+
+# GIF 使用的固定調色盤 (每個顏色 3 位元組，補足 256 色)
+def gif_palette():
+    """GIF 調色盤"""
+    red, green, blue = GIF_LEVELS
+    colors = bytearray()
+    for r in range(red):
+        for g in range(green):
+            for b in range(blue):
+                colors += bytes((r * 255 // (red - 1), g * 255 // (green - 1), b * 255 // (blue - 1)))
+    return bytes(colors) + bytes(256 * 3 - len(colors))
+
+# 以 NumPy 把 Surface 的像素量化成固定調色盤的索引 (依列排列的位元組)
+def _quantize(surface):
+    """量化像素"""
+    import numpy as np
+    import pygame
+    pixels = pygame.surfarray.array3d(surface).transpose(1, 0, 2).astype(np.uint16) # [y, x, 通道]
+    red, green, blue = GIF_LEVELS
+    r = (pixels[..., 0] * (red - 1) + 127) // 255 # 四捨五入到最近的階數
+    g = (pixels[..., 1] * (green - 1) + 127) // 255
+    b = (pixels[..., 2] * (blue - 1) + 127) // 255
+    return (r * (green * blue) + g * blue + b).astype(np.uint8).tobytes()
+
+# GIF 的 LZW 壓縮 (可變長度編碼，編碼表滿時送出清除碼重新開始)，回傳包含子區塊的影像資料
+def _lzw_encode(data, min_code_size=8):
+    """LZW 壓縮"""
+    clear = 1 << min_code_size
+    end = clear + 1
+    codes = {} # (前綴編碼 << 8 | 位元組) -> 編碼
+    next_code = end + 1
+    size = min_code_size + 1
+    out = bytearray()
+    buffer = clear # 尚未輸出的位元 (先送出清除碼)
+    bits = size
+    prefix = data[0]
+    for byte in data[1:]:
+        key = (prefix << 8) | byte
+        code = codes.get(key)
+        if code is not None:
+            prefix = code
+            continue
+        buffer |= prefix << bits
+        bits += size
+        while bits >= 8:
+            out.append(buffer & 0xFF)
+            buffer >>= 8
+            bits -= 8
+        if next_code < GIF_MAX_CODE - 1:
+            codes[key] = next_code
+            next_code += 1
+            if next_code > (1 << size) and size < 12:
+                size += 1
+        else:
+            buffer |= clear << bits # 編碼表已滿，重新開始
+            bits += size
+            codes.clear()
+            next_code = end + 1
+            size = min_code_size + 1
+        prefix = byte
+    buffer |= prefix << bits
+    bits += size
+    if next_code >= (1 << size) and size < 12:
+        size += 1 # 與一般的編碼相同，下一個編碼超出目前的位元數時加長
+    buffer |= end << bits
+    bits += size
+    while bits > 0:
+        out.append(buffer & 0xFF)
+        buffer >>= 8
+        bits -= 8
+    blocks = bytearray((min_code_size,))
+    for start in range(0, len(out), 255):
+        chunk = out[start:start + 255]
+        blocks.append(len(chunk))
+        blocks += chunk
+    blocks.append(0)
+    return bytes(blocks)
+
+# 編碼一個 GIF 幀 (圖形控制延伸 + 影像描述 + 壓縮後的影像資料)，delay 的單位是百分之一秒
+def gif_frame(surface, delay):
+    """編碼 GIF 幀"""
+    width, height = surface.get_size()
+    control = b'\x21\xf9\x04' + struct.pack('<BHBB', 0x04, delay, 0, 0) # 保留上一幀，不使用透明色
+    descriptor = b'\x2c' + struct.pack('<HHHHB', 0, 0, width, height, 0)
+    return control + descriptor + _lzw_encode(_quantize(surface))
+
+# GIF 檔案開頭：標頭、邏輯畫面、全域調色盤，以及無限循環播放的延伸區塊
+def gif_header(width, height):
+    """GIF 檔頭"""
+    screen = struct.pack('<HHBBB', width, height, 0xF7, 0, 0) # 使用 256 色的全域調色盤
+    loop = b'\x21\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00'
+    return b'GIF89a' + screen + gif_palette() + loop
+
+# 工作行程：繪製重播中 [first, last) 範圍內每隔 step 幀的畫面
+# 從 first 之前最近的關鍵幀開始套用，PNG 直接寫入 output 資料夾，GIF 回傳壓縮好的幀
+def render_range(task):
+    """繪製一段重播"""
+    import pygame
+    from game import Game
+    from replay import ReplayReader
+    path, first, last, step, origin, fmt, output, scale, renderer = task
+    reader = ReplayReader(path)
+    game = Game(None, pygame.Surface((GAME_WIDTH, GAME_HEIGHT)), None)
+    if renderer == "numpy":
+        from bulk_render import BulkRenderer
+        game.renderer = BulkRenderer()
+    size = (max(1, int(GAME_WIDTH * scale)), max(1, int(GAME_HEIGHT * scale)))
+    delay = max(1, round(100 * step / SNAKE_SPEED)) # 每幀顯示的時間 (百分之一秒)
+    decoder = reader.seek(game, first)
+    results = []
+    for index in range(first, last):
+        if index > first:
+            decoder.apply(reader.message(index))
+        if (index - origin) % step or not decoder.has_state:
+            continue
+        game.draw()
+        surface = game.game_surface if size == (GAME_WIDTH, GAME_HEIGHT) else pygame.transform.smoothscale(game.game_surface, size)
+        if fmt == "png":
+            pygame.image.save(surface, os.path.join(output, f"frame_{index:06d}.png"))
+            results.append(None)
+        else:
+            results.append(gif_frame(surface, delay))
+    reader.close()
+    return results
+
+# 把重播範圍依關鍵幀切成工作 (每段從一個關鍵幀開始，長度不超過 chunk 幀)
+def _split(reader, start, end, chunk):
+    """切分工作"""
+    bounds = sorted({start, end} | {k for k in reader.keyframes if start < k < end})
+    ranges = []
+    for first, last in zip(bounds, bounds[1:]):
+        for begin in range(first, last, chunk):
+            ranges.append((begin, min(begin + chunk, last)))
+    return ranges
+
+# 匯出重播：fmt 為 "png" (output 是資料夾) 或 "gif" (output 是檔案)，回傳匯出的幀數
+def export_replay(path, output, fmt="gif", start=0, end=None, step=1, scale=1.0, workers=None, chunk=SPECTATOR_KEYFRAME_INTERVAL, renderer="sprites"):
+    """匯出重播"""
+    from replay import ReplayReader
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy") # 工作行程繼承環境變數
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    reader = ReplayReader(path)
+    end = len(reader) if end is None else min(end, len(reader))
+    ranges = _split(reader, start, end, chunk)
+    reader.close()
+    tasks = [(path, first, last, step, start, fmt, output, scale, renderer) for first, last in ranges]
+    frames = 0
+    # SDL 會接管工作行程的 SIGTERM，結束時以 close/join 讓工作行程自行離開，不使用 terminate
+    pool = multiprocessing.Pool(workers, initializer=_init_worker)
+    try:
+        if fmt == "png":
+            os.makedirs(output, exist_ok=True)
+            for results in pool.imap(render_range, tasks):
+                frames += len(results)
+        else:
+            width, height = max(1, int(GAME_WIDTH * scale)), max(1, int(GAME_HEIGHT * scale))
+            with open(output, 'wb') as f:
+                f.write(gif_header(width, height))
+                for results in pool.imap(render_range, tasks): # 依順序取得結果，邊完成邊寫入
+                    f.write(b''.join(results))
+                    frames += len(results)
+                f.write(b'\x3b')
+    finally:
+        pool.close()
+        pool.join()
+    return frames
+
+# 以命令列匯出重播
+def main():
+    parser = argparse.ArgumentParser(description="把重播檔匯出成 PNG 序列或 GIF 動畫")
+    parser.add_argument("replay", help="重播檔")
+    parser.add_argument("output", help="輸出的 GIF 檔或 PNG 資料夾")
+    parser.add_argument("--format", choices=["gif", "png"], default=None, help="輸出格式 (預設依輸出檔名判斷)")
+    parser.add_argument("--start", type=int, default=0, help="第一個匯出的幀")
+    parser.add_argument("--end", type=int, default=None, help="匯出到這一幀之前")
+    parser.add_argument("--step", type=int, default=1, help="每隔幾幀匯出一幀")
+    parser.add_argument("--scale", type=float, default=1.0, help="輸出畫面的縮放比例")
+    parser.add_argument("--workers", type=int, default=None, help="平行繪製的行程數 (預設為 CPU 核心數)")
+    parser.add_argument("--renderer", choices=["sprites", "numpy"], default="sprites", help="棋盤繪圖方式")
+    args = parser.parse_args()
+    fmt = args.format or ("gif" if args.output.lower().endswith(".gif") else "png")
+    start = time.perf_counter()
+    frames = export_replay(args.replay, args.output, fmt, args.start, args.end, max(1, args.step), args.scale, args.workers, renderer=args.renderer)
+    elapsed = time.perf_counter() - start
+    print(f"已匯出 {frames} 幀到 {args.output} ({elapsed:.1f} 秒，{frames / max(elapsed, 1e-9):.1f} 幀/秒)")
+
+# 程式執行入口
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,384 @@
+import argparse
+import mmap
+import os
+import random
+import struct
+import sys
+import time
+from array import array
+import numpy as np
+from settings import *
+from events import CAUSE_WALL, CAUSE_SELF, CAUSE_BODY, CAUSE_HEAD, CAUSE_NAMES
+from protocol import StateTracker
+from spectator import SpectatorStream, SpectatorDecoder, LENGTH, MODES, unpack_frame
+from replay import ReplayReader
+
+# 重播庫：把大量的重播存進同一個只會附加的資料檔，另外以固定大小的索引紀錄保存每一局的摘要
+# 資料檔中每一局依序是重播的二進位幀 (與 .replay 檔內容相同) 和蛇頭軌跡 (每次蛇頭移動的格子編號，uint16)
+# 索引檔以 NumPy 的 memmap 開啟，篩選 (模式、分數、長度、死因、AI 設定) 只是對整個索引做向量運算，不需要開啟任何重播；
+# 死亡熱圖只讀索引，位置熱圖把選出的每一局的軌跡直接從映射的資料檔取出，一次 bincount 完成
+# 先寫入資料再寫入索引，寫到一半中斷時只會在資料檔尾端留下沒有索引的位元組，不影響已存在的紀錄
+
+LIBRARY_MAGIC = b'SNKL' # 索引檔開頭的識別碼
+LIBRARY_VERSION = 1 # 索引格式版本
+LIBRARY_HEADER = struct.Struct('<4sHH8x') # 識別碼, 版本, 每筆紀錄的位元組數 (補到 16 位元組)
+
+AI_CONFIGS = ('none', 'builtin', 'heuristic', 'policy', 'autopilot') # AI 設定名稱與編號的對照
+
+# 索引紀錄 (每局一筆)，蛇的欄位依 Game.snakes 的順序，沒有的蛇或沒死的蛇填 -1
+INDEX_DTYPE = np.dtype([
+    ('offset', '<u8'), # 這一局在資料檔中的起點
+    ('size', '<u4'), # 重播幀的位元組數 (蛇頭軌跡緊接在後)
+    ('frames', '<u4'), # 幀數
+    ('track', '<u4'), # 蛇頭軌跡的格子數
+    ('recorded_at', '<f8'), # 加入重播庫的時間 (Unix 秒)
+    ('ticks', '<u4'), # 最後一幀的 tick (遊戲長度)
+    ('best_score', '<i4'), # 最高分
+    ('mode', 'u1'), # 模式編號 (MODES 的索引)
+    ('ai', 'u1'), # AI 設定編號 (AI_CONFIGS 的索引)
+    ('snakes', 'u1'), # 蛇的數量
+    ('winner', 'i1'), # 勝利的蛇的索引 (平局或沒有勝利者為 -1)
+    ('scores', '<i4', (LIBRARY_MAX_SNAKES,)), # 每條蛇的最終分數
+    ('causes', 'i1', (LIBRARY_MAX_SNAKES,)), # 每條蛇的死因 (CAUSE_*)
+    ('death_cells', '<i2', (LIBRARY_MAX_SNAKES,)), # 每條蛇死亡時頭部的格子編號
+])
+
+# 收集觀戰串流幀的觀眾 (錄製到記憶體，之後一次寫入重播庫)
+class _FrameBuffer:
+    def __init__(self):
+        self.data = bytearray() # 已收到的幀
+
+    # 接收一個已編碼的幀
+    def deliver(self, frame, keyframe):
+        """收集幀"""
+        self.data += frame
+
+# 從蛇頭位移推測死因 (匯入沒有事件紀錄的重播時使用)
+# 頭部在死亡的 tick 有前進表示撞到其他蛇；沒有前進表示撞牆或撞到自己，AI 在同一個 tick 的轉向不在串流中，只能依位置推測
+def _infer_cause(game, index, moved):
+    """推測死因"""
+    snake = game.snakes[index]
+    if moved[index]:
+        for j, other in enumerate(game.snakes):
+            if j != index and moved[j] and other.head_cell == snake.head_cell:
+                return CAUSE_HEAD
+        return CAUSE_BODY
+    x, y = snake.get_head_position()
+    nx, ny = x + snake.direction[0], y + snake.direction[1]
+    if not (0 <= nx < GRID_WIDTH and 0 <= ny < GRID_HEIGHT):
+        return CAUSE_WALL
+    if snake.occupied[ny * GRID_WIDTH + nx]:
+        return CAUSE_SELF
+    return CAUSE_WALL if x in (0, GRID_WIDTH - 1) or y in (0, GRID_HEIGHT - 1) else CAUSE_SELF
+
+# 掃描一局重播的幀 (套用到無畫面的 Game)，回傳摘要字典與蛇頭軌跡
+# causes 與 winner 由錄製時的比賽統計提供時直接採用，否則由最後的狀態推測
+def summarize(data, causes=None, winner=None):
+    """產生重播摘要"""
+    from game import Game
+    game = Game(None, None, None)
+    decoder = SpectatorDecoder(game)
+    track = array('H') # 每次蛇頭移動到的格子 (第一個關鍵幀的蛇頭也算一次)
+    heads = [] # 上一幀每條蛇的頭部
+    dead = [] # 上一幀每條蛇是否死亡
+    death_causes = {} # 推測的死因 {蛇的索引: CAUSE_*}
+    death_cells = {} # 死亡時頭部的格子 {蛇的索引: 格子編號}
+    frames = 0
+    offset = 0
+    while offset + LENGTH.size <= len(data):
+        (length,) = LENGTH.unpack_from(data, offset)
+        if offset + LENGTH.size + length > len(data):
+            break # 寫到一半的最後一幀
+        started = decoder.has_state
+        decoder.apply(unpack_frame(bytes(data[offset + LENGTH.size:offset + LENGTH.size + length])))
+        offset += LENGTH.size + length
+        frames += 1
+        if not decoder.has_state:
+            continue
+        snakes = game.snakes
+        if not started or len(snakes) != len(heads):
+            track.extend(s.head_cell for s in snakes if not s.is_dead)
+        else:
+            moved = [s.head_cell != heads[i] for i, s in enumerate(snakes)]
+            for i, snake in enumerate(snakes):
+                if moved[i]:
+                    track.append(snake.head_cell)
+                if snake.is_dead and not dead[i]:
+                    death_cells[i] = snake.head_cell
+                    death_causes[i] = _infer_cause(game, i, moved)
+        heads = [s.head_cell for s in snakes]
+        dead = [s.is_dead for s in snakes]
+    scores = [s.score for s in game.snakes]
+    if winner is None:
+        # 沒有統計時：還活著的蛇 (都死了則所有蛇) 中分數最高且唯一的一條
+        candidates = [i for i, s in enumerate(game.snakes) if not s.is_dead] or list(range(len(scores)))
+        best = max((scores[i] for i in candidates), default=0)
+        leaders = [i for i in candidates if scores[i] == best]
+        winner = leaders[0] if len(leaders) == 1 and len(scores) > 1 else -1
+    if causes is not None:
+        death_causes = {i: causes[i] for i in death_cells if i in causes} # 以錄製時的事件為準
+    summary = {
+        'mode': game.mode, 'snakes': len(scores), 'frames': frames, 'ticks': decoder.tick,
+        'scores': scores, 'causes': death_causes, 'death_cells': death_cells, 'winner': winner, 'size': offset,
+    }
+    return summary, track
+
+# 重播庫：一個資料檔 (library.dat) 與一個索引檔 (library.idx)
+class ReplayLibrary:
+    def __init__(self, directory=REPLAY_LIBRARY_DIR):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory # 重播庫資料夾
+        self.data_path = os.path.join(directory, "library.dat") # 重播資料檔
+        self.index_path = os.path.join(directory, "library.idx") # 索引檔
+        if not os.path.exists(self.index_path) or os.path.getsize(self.index_path) < LIBRARY_HEADER.size:
+            with open(self.index_path, 'wb') as f:
+                f.write(LIBRARY_HEADER.pack(LIBRARY_MAGIC, LIBRARY_VERSION, INDEX_DTYPE.itemsize))
+        with open(self.index_path, 'rb') as f:
+            magic, version, itemsize = LIBRARY_HEADER.unpack(f.read(LIBRARY_HEADER.size))
+        if magic != LIBRARY_MAGIC or version != LIBRARY_VERSION or itemsize != INDEX_DTYPE.itemsize:
+            raise ValueError(f"不支援的重播庫索引: {self.index_path}")
+        self._index = np.zeros(0, INDEX_DTYPE) # 目前映射的索引 (紀錄數改變時重新映射)
+        self._data = None # 映射的資料檔
+        self._data_size = 0 # 映射時資料檔的大小
+
+    # 索引中的局數 (結尾寫到一半的紀錄不算)
+    def __len__(self):
+        return (os.path.getsize(self.index_path) - LIBRARY_HEADER.size) // INDEX_DTYPE.itemsize
+
+    # 以 memmap 映射的索引 (唯讀的結構化陣列)
+    @property
+    def index(self):
+        count = len(self)
+        if count != len(self._index):
+            self._index = np.memmap(self.index_path, INDEX_DTYPE, mode='r', offset=LIBRARY_HEADER.size, shape=(count,))
+        return self._index
+
+    # 映射的資料檔 (附加新資料後重新映射)
+    def _mapped_data(self):
+        """映射資料檔"""
+        size = os.path.getsize(self.data_path) if os.path.exists(self.data_path) else 0
+        if self._data is None or size != self._data_size:
+            self._release_data()
+            with open(self.data_path, 'rb') as f:
+                self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._data_size = size
+        return self._data
+
+    # 加入一局重播 (二進位幀)，回傳這一局的編號
+    # causes 與 winner 為錄製時的比賽統計 (Game.stats.deaths 與 Game.stats.winner)，沒有時由重播內容推測
+    def append(self, data, ai=None, causes=None, winner=None):
+        """加入一局重播"""
+        summary, track = summarize(data, causes, winner)
+        if summary['frames'] == 0:
+            raise ValueError("重播沒有任何完整的幀")
+        if ai is None:
+            ai = 'builtin' if summary['mode'] in ('ai', 'arena') else 'none'
+        record = np.zeros(1, INDEX_DTYPE) # 一筆紀錄 (以長度 1 的陣列組合各欄位)
+        for field in ('scores', 'causes', 'death_cells'):
+            record[field] = -1
+        scores = summary['scores'][:LIBRARY_MAX_SNAKES]
+        record['scores'][0, :len(scores)] = scores
+        for i, cause in summary['causes'].items():
+            if i < LIBRARY_MAX_SNAKES:
+                record['causes'][0, i] = cause
+                record['death_cells'][0, i] = summary['death_cells'][i]
+        record['size'] = summary['size']
+        record['frames'] = summary['frames']
+        record['track'] = len(track)
+        record['recorded_at'] = time.time()
+        record['ticks'] = summary['ticks']
+        record['best_score'] = max(summary['scores'], default=0)
+        record['mode'] = MODES.index(summary['mode'])
+        record['ai'] = AI_CONFIGS.index(ai)
+        record['snakes'] = summary['snakes']
+        record['winner'] = summary['winner'] if summary['winner'] < LIBRARY_MAX_SNAKES else -1
+        if sys.byteorder != 'little':
+            track.byteswap() # 軌跡在檔案中一律以小端序保存
+        with open(self.data_path, 'ab') as f:
+            record['offset'] = f.tell() # 附加模式下 tell 就是目前的檔案大小
+            f.write(data[:summary['size']])
+            f.write(track.tobytes())
+        with open(self.index_path, 'ab') as f:
+            f.write(record.tobytes())
+        return len(self) - 1
+
+    # 匯入一個重播檔
+    def add_file(self, path, ai=None):
+        """匯入重播檔"""
+        with open(path, 'rb') as f:
+            return self.append(f.read(), ai)
+
+    # 篩選符合條件的局，回傳編號陣列 (只讀取索引)
+    # cause 表示至少有一條蛇以該死因死亡；未指定 (None) 的條件不篩選
+    def query(self, mode=None, ai=None, min_score=None, max_score=None, min_ticks=None, max_ticks=None, cause=None, snakes=None):
+        """篩選重播"""
+        index = self.index
+        mask = np.ones(len(index), dtype=bool)
+        if mode is not None:
+            mask &= index['mode'] == MODES.index(mode)
+        if ai is not None:
+            mask &= index['ai'] == AI_CONFIGS.index(ai)
+        if min_score is not None:
+            mask &= index['best_score'] >= min_score
+        if max_score is not None:
+            mask &= index['best_score'] <= max_score
+        if min_ticks is not None:
+            mask &= index['ticks'] >= min_ticks
+        if max_ticks is not None:
+            mask &= index['ticks'] <= max_ticks
+        if cause is not None:
+            mask &= (index['causes'] == CAUSE_NAMES.index(cause)).any(axis=1)
+        if snakes is not None:
+            mask &= index['snakes'] == snakes
+        return np.flatnonzero(mask)
+
+    # 開啟第 number 局的重播 (直接讀取資料檔中的那一段，不需要複製)
+    def reader(self, number):
+        """開啟一局重播"""
+        record = self.index[number]
+        return ReplayReader(self.data_path, int(record['offset']), int(record['offset'] + record['size']))
+
+    # 第 number 局的蛇頭軌跡 (映射資料檔的唯讀視圖)
+    def track(self, number):
+        """蛇頭軌跡"""
+        record = self.index[number]
+        return np.frombuffer(self._mapped_data(), '<u2', int(record['track']), int(record['offset'] + record['size']))
+
+    # 位置熱圖：選出的局中蛇頭停留在每一格的次數 ([y, x] 陣列，games 為 None 時使用全部)
+    def position_heatmap(self, games=None):
+        """位置熱圖"""
+        index = self.index
+        rows = index if games is None else index[np.asarray(games)]
+        rows = rows[rows['track'] > 0]
+        if not len(rows):
+            return np.zeros((GRID_HEIGHT, GRID_WIDTH), dtype=np.int64)
+        data = self._mapped_data()
+        starts = (rows['offset'] + rows['size']).tolist()
+        tracks = [np.frombuffer(data, '<u2', count, start) for count, start in zip(rows['track'].tolist(), starts)]
+        return np.bincount(np.concatenate(tracks), minlength=GRID_WIDTH * GRID_HEIGHT).reshape(GRID_HEIGHT, GRID_WIDTH)
+
+    # 死亡熱圖：選出的局中蛇死亡時頭部所在格子的次數 (只讀索引)，cause 可以只計算某一種死因
+    def death_heatmap(self, games=None, cause=None):
+        """死亡熱圖"""
+        rows = self.index if games is None else self.index[np.asarray(games)]
+        cells = rows['death_cells']
+        if cause is not None:
+            cells = cells[rows['causes'] == CAUSE_NAMES.index(cause)]
+        cells = cells[cells >= 0]
+        return np.bincount(cells, minlength=GRID_WIDTH * GRID_HEIGHT).reshape(GRID_HEIGHT, GRID_WIDTH)
+
+    # 釋放映射的資料檔 (還有軌跡視圖在使用時無法立即關閉，交給垃圾回收)
+    def _release_data(self):
+        """釋放資料檔映射"""
+        if self._data is not None:
+            try:
+                self._data.close()
+            except BufferError:
+                pass
+            self._data = None
+
+    # 關閉映射的檔案
+    def close(self):
+        """關閉重播庫"""
+        self._index = np.zeros(0, INDEX_DTYPE)
+        self._release_data()
+
+# 以無畫面的電腦競技場連續錄製多局並加入重播庫 (死因與勝利者採用比賽統計)，回傳加入的局數
+def record_games(library, count, snakes=ARENA_SNAKES, max_ticks=ENV_MAX_STEPS, seed=None, policy=None):
+    """錄製多局到重播庫"""
+    from game import Game
+    random.seed(seed)
+    game = Game(None, None, None)
+    game.policy = policy
+    ai = 'builtin' if policy is None else 'policy'
+    for _ in range(count):
+        game.reset_game(mode="arena", player_count=snakes)
+        game.game_active = True
+        tracker = StateTracker()
+        stream = SpectatorStream()
+        buffer = _FrameBuffer()
+        stream.add_viewer(buffer)
+        stream.publish(tracker.keyframe(game))
+        while game.game_active and tracker.tick < max_ticks:
+            game.update()
+            stream.publish_tick(game, tracker, tracker.delta(game))
+        winner = game.stats.winner if game.stats.winner is not None else -1
+        library.append(bytes(buffer.data), ai, game.stats.deaths, winner)
+    return count
+
+# 以文字印出熱圖 (每格一個字元，依最大值分成十級)
+def print_heatmap(heatmap):
+    """印出熱圖"""
+    shades = " .:-=+*#%@"
+    peak = max(int(heatmap.max()), 1)
+    levels = (heatmap * (len(shades) - 1) + peak - 1) // peak # 非 0 的格子至少顯示第一級
+    for row in levels:
+        print("".join(shades[level] * 2 for level in row))
+
+# 把熱圖存成 PNG (每格放大成 GRID_SIZE 像素，由黑經紅到黃)
+def save_heatmap(heatmap, path):
+    """儲存熱圖"""
+    import pygame
+    ratio = heatmap.T / max(int(heatmap.max()), 1) # surfarray 為 [x, y] 排列
+    pixels = np.zeros(ratio.shape + (3,), dtype=np.uint8)
+    pixels[..., 0] = np.clip(ratio * 2, 0, 1) * 255
+    pixels[..., 1] = np.clip(ratio * 2 - 1, 0, 1) * 255
+    surface = pygame.surfarray.make_surface(pixels)
+    pygame.image.save(pygame.transform.scale(surface, (GRID_WIDTH * GRID_SIZE, GRID_HEIGHT * GRID_SIZE)), path)
+
+# 以命令列匯入、錄製、篩選重播並產生熱圖
+def main():
+    parser = argparse.ArgumentParser(description="重播庫：匯入與篩選重播，產生位置與死亡熱圖")
+    parser.add_argument("--library", default=REPLAY_LIBRARY_DIR, help="重播庫資料夾")
+    parser.add_argument("--import", dest="files", nargs="+", default=[], metavar="FILE", help="匯入重播檔 (例如伺服器 --record 的輸出)")
+    parser.add_argument("--ai", choices=AI_CONFIGS, default=None, help="匯入或篩選的 AI 設定")
+    parser.add_argument("--record", type=int, default=0, metavar="N", help="以無畫面的電腦競技場錄製 N 局加入重播庫")
+    parser.add_argument("--snakes", type=int, default=ARENA_SNAKES, help="錄製時的 AI 蛇數量")
+    parser.add_argument("--seed", type=int, default=None, help="錄製時的亂數種子")
+    parser.add_argument("--policy", metavar="FILE", help="錄製時使用的神經網路策略權重檔 (.npz)")
+    parser.add_argument("--mode", choices=MODES, default=None, help="篩選模式")
+    parser.add_argument("--min-score", type=int, default=None, help="篩選最高分下限")
+    parser.add_argument("--max-score", type=int, default=None, help="篩選最高分上限")
+    parser.add_argument("--min-ticks", type=int, default=None, help="篩選遊戲長度下限 (tick)")
+    parser.add_argument("--max-ticks", type=int, default=None, help="篩選遊戲長度上限 (tick)")
+    parser.add_argument("--cause", choices=CAUSE_NAMES, default=None, help="篩選有蛇以此死因死亡的局")
+    parser.add_argument("--heatmap", choices=["position", "death"], default=None, help="對篩選出的局產生熱圖")
+    parser.add_argument("--png", metavar="FILE", help="把熱圖存成 PNG")
+    parser.add_argument("--list", type=int, default=10, metavar="N", help="列出前 N 筆符合的局")
+    args = parser.parse_args()
+    library = ReplayLibrary(args.library)
+    for path in args.files:
+        number = library.add_file(path, args.ai)
+        print(f"已匯入 {path} (第 {number} 局)")
+    if args.record:
+        policy = None
+        if args.policy:
+            from policy import NeuralPolicy
+            policy = NeuralPolicy.load(args.policy)
+        start = time.perf_counter()
+        record_games(library, args.record, args.snakes, seed=args.seed, policy=policy)
+        print(f"已錄製 {args.record} 局 ({time.perf_counter() - start:.1f} 秒)")
+    start = time.perf_counter()
+    games = library.query(args.mode, None if args.files else args.ai, args.min_score, args.max_score, args.min_ticks, args.max_ticks, args.cause)
+    elapsed = time.perf_counter() - start
+    print(f"重播庫共 {len(library)} 局，符合條件 {len(games)} 局 (查詢耗時 {elapsed * 1000:.2f} 毫秒)")
+    index = library.index
+    for number in games[:args.list]:
+        record = index[number]
+        count = int(record['snakes'])
+        causes = ",".join(CAUSE_NAMES[c] if c >= 0 else "-" for c in record['causes'][:count])
+        scores = ",".join(str(s) for s in record['scores'][:count])
+        print(f"#{number:<6d} {MODES[record['mode']]:<7} {AI_CONFIGS[record['ai']]:<9} {int(record['ticks']):5d} tick  分數 {scores:<16} 死因 {causes}")
+    if args.heatmap:
+        start = time.perf_counter()
+        heatmap = library.position_heatmap(games) if args.heatmap == "position" else library.death_heatmap(games, args.cause)
+        elapsed = time.perf_counter() - start
+        print_heatmap(heatmap)
+        print(f"{len(games)} 局的{'位置' if args.heatmap == 'position' else '死亡'}熱圖 (共 {int(heatmap.sum())} 次，耗時 {elapsed * 1000:.2f} 毫秒)")
+        if args.png:
+            save_heatmap(heatmap, args.png)
+    library.close()
+
+# 程式執行入口
+if __name__ == "__main__":
+    main()
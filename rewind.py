@@ -0,0 +1,363 @@
+import argparse
+import collections
+import random
+import struct
+import time
+from array import array
+from settings import *
+from objects import Food, AISnake
+from protocol import FOOD_TYPE_IDS
+
+# 倒帶緩衝區：練習 (單人) 模式中按住倒帶鍵，讓遊戲一個 tick 一個 tick 往回退
+# 每個 tick 結束後只記錄這個 tick 的差量 (新的頭部、移除的尾巴數、分數與長度、增減的食物)，
+# 每隔 REWIND_KEYFRAME_INTERVAL 個 tick 記錄一次完整的關鍵幀；紀錄以精簡的二進位格式寫進預先配置的環狀緩衝區，
+# 空間不足時覆蓋最舊的紀錄，因此記憶體用量固定 (預設 4 MB 約可保留十幾分鐘)
+# 倒帶到某個 tick 時還原它之前最近的關鍵幀，再依序套用之後的差量 (最多 REWIND_KEYFRAME_INTERVAL - 1 個)，
+# 成本與倒帶的距離無關；倒帶之後的紀錄會被捨棄，放開按鍵後從倒帶到的位置繼續記錄
+#
+# 紀錄格式 (小端序)：
+#   關鍵幀 : KEY_GAME，結束訊息 (UTF-8)，每條蛇的 KEY_SNAKE 與身體格子 (頭到尾，每格 2 位元組)，每個食物的 FOOD
+#   差量   : DELTA_COUNTS，有變化的蛇的 DELTA_SNAKE，新增食物的 FOOD，移除食物的格子，結束時的 KEY_GAME 與結束訊息
+# 每筆紀錄的位置、長度與是否為關鍵幀另外記在索引陣列中 (同樣是固定大小的環狀緩衝區)，第 n 筆紀錄的 tick 為 origin + n
+
+KEY_GAME = struct.Struct('<BBBH') # 是否進行中、蛇的數量、食物的數量、結束訊息的位元組數
+KEY_SNAKE = struct.Struct('<BbbiHH') # 是否死亡、方向 x、方向 y、分數、目標長度、身體格數
+FOOD = struct.Struct('<HBI') # 格子、食物類型編號、超時消失的 tick
+DELTA_COUNTS = struct.Struct('<BBBB') # 有變化的蛇數、新增的食物數、移除的食物數、是否有結束訊息
+DELTA_SNAKE = struct.Struct('<BHBiBHbb') # 蛇的索引、新的頭部 (沒有移動時為 NO_HEAD)、移除的尾巴數、分數、是否死亡、目標長度、方向 x、方向 y
+CELL = struct.Struct('<H') # 一個格子編號
+NO_HEAD = 0xFFFF # 差量中表示蛇頭沒有移動
+NO_EXPIRE = 0xFFFFFFFF # 不會超時的食物
+
+# 蛇的比較狀態 (與上個 tick 不同時寫入差量)
+def snake_key(snake):
+    """蛇的狀態"""
+    return (snake.head_cell, snake.size, snake.length, snake.score, snake.is_dead, snake.direction)
+
+# 預先配置的倒帶環狀緩衝區
+class RewindBuffer:
+    def __init__(self, capacity=REWIND_BUFFER_BYTES, max_ticks=REWIND_MAX_TICKS, keyframe_interval=REWIND_KEYFRAME_INTERVAL):
+        if max_ticks & (max_ticks - 1):
+            raise ValueError(f"倒帶索引大小必須是 2 的次方: {max_ticks}")
+        self.data = bytearray(capacity) # 紀錄內容
+        self.mask = max_ticks - 1 # 索引以位元遮罩取代取餘數
+        self.starts = array('L', bytes(array('L').itemsize * max_ticks)) # 每筆紀錄在 data 中的起點
+        self.sizes = array('L', bytes(array('L').itemsize * max_ticks)) # 每筆紀錄的位元組數
+        self.keyframes = bytearray(max_ticks) # 每筆紀錄是否為關鍵幀
+        self.keyframe_interval = keyframe_interval # 關鍵幀的間隔 (tick)
+        self.clear()
+
+    # 清除所有紀錄 (新的一局)
+    def clear(self):
+        """清除紀錄"""
+        self.first = 0 # 最舊的紀錄序號
+        self.written = 0 # 已寫入的紀錄數 (也是下一筆紀錄的序號)
+        self.origin = 0 # 序號 0 對應的 tick
+        self.head = 0 # 下一筆紀錄在 data 中的寫入位置
+        self.since_keyframe = 0 # 上一個關鍵幀之後的差量數
+        self.key_serials = collections.deque() # 保留中的關鍵幀序號 (由舊到新，寫入與捨棄紀錄時一併維護)
+        self.snake_state = [] # 上次記錄時每條蛇的狀態
+        self.foods = [] # 上次記錄時場上的食物物件
+        self.result = (False, "") # 上次記錄時的 (是否進行中, 結束訊息)
+
+    # 目前保留的紀錄數
+    def __len__(self):
+        return self.written - self.first
+
+    # 可以倒帶回去的最早 tick (最舊的關鍵幀)，沒有時為 None
+    def earliest(self):
+        """最早的 tick"""
+        index = self._first_keyframe()
+        return None if index is None else self.origin + index
+
+    # 目前可以倒帶的秒數
+    def seconds(self):
+        """可倒帶的秒數"""
+        index = self._first_keyframe()
+        return 0.0 if index is None else (self.written - 1 - index) / SNAKE_SPEED
+
+    # 目前保留的紀錄佔用的位元組數
+    def bytes_used(self):
+        """紀錄的位元組數"""
+        return sum(self.sizes[n & self.mask] for n in range(self.first, self.written))
+
+    # 記錄 tick 結束後的狀態 (同一個 tick 只記錄一次；tick 不連續或蛇的數量改變時重新開始)
+    def record(self, game):
+        """記錄這個 tick"""
+        tick = game.scheduler.tick
+        if self.written > self.first and tick == self.origin + self.written - 1:
+            return # 這個 tick 已經記錄過 (暫停或遊戲結束)
+        if self.written == self.first or tick != self.origin + self.written or len(game.snakes) != len(self.snake_state):
+            self.clear()
+            self.origin = tick
+        if self.written == self.first or self.since_keyframe >= self.keyframe_interval:
+            body = self._encode_keyframe(game)
+            self._write(body, True)
+            self.since_keyframe = 0
+        else:
+            body = self._encode_delta(game)
+            self._write(body, False)
+            self.since_keyframe += 1
+        self._remember(game)
+
+    # 倒帶 steps 個 tick (不超過最早的關鍵幀)，把遊戲還原到該 tick 結束時的狀態，回傳實際倒帶的 tick 數
+    def rewind(self, game, steps=1):
+        """倒帶"""
+        first = self._first_keyframe()
+        if first is None:
+            return 0
+        latest = self.written - 1
+        target = max(first, latest - steps)
+        if target == latest:
+            return 0
+        key = target
+        while not self.keyframes[key & self.mask]:
+            key -= 1
+        self.written = target + 1 # 捨棄倒帶位置之後的紀錄
+        while self.key_serials[-1] > target:
+            self.key_serials.pop()
+        self._restore_keyframe(game, key)
+        for n in range(key + 1, target + 1):
+            self._apply_delta(game, n)
+        self._finish_restore(game, self.origin + target)
+        self.head = self.starts[target & self.mask] + self.sizes[target & self.mask]
+        self.since_keyframe = target - key
+        self._remember(game)
+        return latest - target
+
+    # 最舊的關鍵幀的序號 (更早的差量沒有基準，無法還原)
+    def _first_keyframe(self):
+        """最舊的關鍵幀"""
+        return self.key_serials[0] if self.key_serials else None
+
+    # 保存這次記錄的狀態，作為下一個差量的基準
+    def _remember(self, game):
+        """保存比較基準"""
+        self.snake_state = [snake_key(snake) for snake in game.snakes]
+        self.foods = game.foods[:]
+        self.result = (game.game_active, game.winner_message)
+
+    # 把一筆紀錄寫進環狀緩衝區，覆蓋與它重疊的最舊紀錄
+    def _write(self, body, keyframe):
+        """寫入紀錄"""
+        size = len(body)
+        if size > len(self.data):
+            raise ValueError(f"倒帶紀錄 ({size} 位元組) 超過緩衝區大小")
+        if self.written - self.first > self.mask:
+            self.first += 1 # 索引已滿
+        start = self.head
+        if start + size > len(self.data):
+            # 尾端放不下，從頭開始寫；尾端剩下的紀錄是上一圈最舊的部分，一併捨棄
+            while self.first < self.written and self.starts[self.first & self.mask] >= start:
+                self.first += 1
+            start = 0
+        end = start + size
+        while self.first < self.written and self.starts[self.first & self.mask] < end and self.starts[self.first & self.mask] >= start:
+            self.first += 1
+        while self.key_serials and self.key_serials[0] < self.first:
+            self.key_serials.popleft() # 被覆蓋的關鍵幀
+        if keyframe:
+            self.key_serials.append(self.written)
+        index = self.written & self.mask
+        self.data[start:end] = body
+        self.starts[index] = start
+        self.sizes[index] = size
+        self.keyframes[index] = keyframe
+        self.head = end
+        self.written += 1
+
+    # 完整狀態的關鍵幀
+    def _encode_keyframe(self, game):
+        """編碼關鍵幀"""
+        message = game.winner_message.encode('utf-8')
+        parts = [KEY_GAME.pack(game.game_active, len(game.snakes), len(game.foods), len(message)), message]
+        for snake in game.snakes:
+            cells = snake.cells()
+            parts.append(KEY_SNAKE.pack(snake.is_dead, snake.direction[0], snake.direction[1], snake.score, snake.length, len(cells)))
+            parts.append(struct.pack(f'<{len(cells)}H', *cells))
+        for food in game.foods:
+            parts.append(FOOD.pack(food.cell, FOOD_TYPE_IDS[food.type], NO_EXPIRE if food.expire_tick is None else food.expire_tick))
+        return b''.join(parts)
+
+    # 與上次記錄相比的差量
+    def _encode_delta(self, game):
+        """編碼差量"""
+        snakes = []
+        for i, snake in enumerate(game.snakes):
+            key = snake_key(snake)
+            previous = self.snake_state[i]
+            if key == previous:
+                continue
+            moved = key[0] != previous[0]
+            removed = previous[1] + moved - key[1] # 原本的格數加上新的頭部，減去現在的格數
+            snakes.append(DELTA_SNAKE.pack(i, key[0] if moved else NO_HEAD, removed, snake.score, snake.is_dead, snake.length, snake.direction[0], snake.direction[1]))
+        current = set(game.foods)
+        previous = set(self.foods)
+        added = [food for food in game.foods if food not in previous]
+        removed = [food.cell for food in self.foods if food not in current]
+        result = (game.game_active, game.winner_message)
+        parts = [DELTA_COUNTS.pack(len(snakes), len(added), len(removed), result != self.result)]
+        parts.extend(snakes)
+        for food in added:
+            parts.append(FOOD.pack(food.cell, FOOD_TYPE_IDS[food.type], NO_EXPIRE if food.expire_tick is None else food.expire_tick))
+        parts.extend(CELL.pack(cell) for cell in removed)
+        if result != self.result:
+            message = game.winner_message.encode('utf-8')
+            parts.append(KEY_GAME.pack(game.game_active, 0, 0, len(message)))
+            parts.append(message)
+        return b''.join(parts)
+
+    # 第 n 筆紀錄的內容
+    def _view(self, n):
+        """紀錄內容"""
+        start = self.starts[n & self.mask]
+        return memoryview(self.data)[start:start + self.sizes[n & self.mask]]
+
+    # 由第 n 筆紀錄 (關鍵幀) 還原完整狀態 (沿用原本的蛇物件)
+    def _restore_keyframe(self, game, n):
+        """還原關鍵幀"""
+        data = self._view(n)
+        active, snake_count, food_count, message_size = KEY_GAME.unpack_from(data, 0)
+        offset = KEY_GAME.size
+        game.game_active = bool(active)
+        game.winner_message = bytes(data[offset:offset + message_size]).decode('utf-8')
+        offset += message_size
+        for snake in game.snakes[:snake_count]:
+            dead, dx, dy, score, length, size = KEY_SNAKE.unpack_from(data, offset)
+            offset += KEY_SNAKE.size
+            snake.set_cells(struct.unpack_from(f'<{size}H', data, offset))
+            offset += 2 * size
+            snake.is_dead = bool(dead)
+            snake.direction = (dx, dy)
+            snake.score = score
+            snake.length = length
+        foods = []
+        for _ in range(food_count):
+            foods.append(self._food(data, offset))
+            offset += FOOD.size
+        game.foods = foods
+
+    # 套用第 n 筆紀錄 (差量)
+    def _apply_delta(self, game, n):
+        """套用差量"""
+        data = self._view(n)
+        snake_count, added, removed, finished = DELTA_COUNTS.unpack_from(data, 0)
+        offset = DELTA_COUNTS.size
+        for _ in range(snake_count):
+            index, head, tails, score, dead, length, dx, dy = DELTA_SNAKE.unpack_from(data, offset)
+            offset += DELTA_SNAKE.size
+            snake = game.snakes[index]
+            if head != NO_HEAD:
+                snake.push_head(head)
+            for _ in range(tails):
+                snake.pop_tail()
+            snake.score = score
+            snake.is_dead = bool(dead)
+            snake.length = length
+            snake.direction = (dx, dy)
+        new_foods = []
+        for _ in range(added):
+            new_foods.append(self._food(data, offset))
+            offset += FOOD.size
+        if removed:
+            cells = set(struct.unpack_from(f'<{removed}H', data, offset))
+            offset += 2 * removed
+            game.foods = [food for food in game.foods if food.cell not in cells]
+        game.foods.extend(new_foods)
+        if finished:
+            active, _, _, message_size = KEY_GAME.unpack_from(data, offset)
+            offset += KEY_GAME.size
+            game.game_active = bool(active)
+            game.winner_message = bytes(data[offset:offset + message_size]).decode('utf-8')
+
+    # 由紀錄中的 FOOD 建立食物
+    def _food(self, data, offset):
+        """還原食物"""
+        cell, type_id, expire = FOOD.unpack_from(data, offset)
+        food = Food(None, FOOD_TYPES[type_id], cell=cell)
+        food.expire_tick = None if expire == NO_EXPIRE else expire
+        return food
+
+    # 還原後讓計時器、轉向紀錄與觀測跟上新的狀態 (食物的超時事件依剩餘時間重新登記)
+    def _finish_restore(self, game, tick):
+        """還原後的整理"""
+        game.scheduler.clear()
+        game.scheduler.tick = tick
+        for food in game.foods:
+            if food.expire_tick is not None:
+                game.scheduler.schedule(food.expire_tick - tick, game.expire_food, food)
+        for snake in game.snakes:
+            if not snake.is_dead:
+                snake.death_time = None
+            if isinstance(snake, AISnake):
+                snake.target_food = None # 原本的目標食物物件已被替換
+        game.headings = [snake.direction for snake in game.snakes]
+        if game.game_active:
+            game.game_over_sound_played = False
+        if game.observer is not None:
+            game.observer.invalidate()
+
+# 比較用的完整狀態 (蛇的身體、方向、長度、分數、是否死亡，食物與超時時間，結束狀態)
+def fingerprint(game):
+    """狀態指紋"""
+    snakes = tuple((tuple(s.cells()), s.direction, s.length, s.score, s.is_dead) for s in game.snakes)
+    foods = tuple(sorted((f.cell, f.type, f.expire_tick) for f in game.foods))
+    return (game.scheduler.tick, snakes, foods, game.game_active, game.winner_message)
+
+# 測試用：以自動駕駛進行一局單人遊戲並記錄，再隨機倒帶並與當時保存的狀態比對
+# 回傳 (記錄後可倒帶的秒數, 佔用的位元組數, 比對次數, 不一致次數, 平均倒帶時間)
+def soak(game, buffer, ticks, rewinds, rng):
+    """倒帶驗證"""
+    expected = {}
+    buffer.record(game)
+    expected[game.scheduler.tick] = fingerprint(game)
+    for _ in range(ticks):
+        game.update()
+        buffer.record(game)
+        expected[game.scheduler.tick] = fingerprint(game)
+        if not game.game_active:
+            break
+    seconds, used = buffer.seconds(), buffer.bytes_used()
+    checks = mismatches = 0
+    elapsed = 0.0
+    for _ in range(rewinds):
+        start = time.perf_counter()
+        steps = buffer.rewind(game, rng.randint(1, 3 * REWIND_KEYFRAME_INTERVAL))
+        elapsed += time.perf_counter() - start
+        if not steps:
+            break
+        checks += 1
+        if fingerprint(game) != expected[game.scheduler.tick]:
+            mismatches += 1
+        # 倒帶後繼續玩幾個 tick，之後的狀態取代原本的紀錄
+        for _ in range(rng.randint(0, REWIND_KEYFRAME_INTERVAL)):
+            game.update()
+            buffer.record(game)
+            expected[game.scheduler.tick] = fingerprint(game)
+    return seconds, used, checks, mismatches, elapsed / max(1, checks)
+
+# 以命令列驗證倒帶的正確性並印出記憶體用量
+def main():
+    parser = argparse.ArgumentParser(description="驗證倒帶緩衝區")
+    parser.add_argument("--minutes", type=float, default=5.0, help="記錄的遊戲時間 (分鐘)")
+    parser.add_argument("--rewinds", type=int, default=200, help="隨機倒帶的次數")
+    parser.add_argument("--seed", type=int, default=0, help="亂數種子")
+    args = parser.parse_args()
+    from game import Game
+    from autopilot import Autopilot
+    random.seed(args.seed)
+    game = Game(None, None, None)
+    game.autopilot = Autopilot() # 單人模式由自動駕駛操作，永遠不會死亡
+    game.reset_game(mode="single")
+    game.game_active = True
+    buffer = RewindBuffer()
+    ticks = int(args.minutes * 60 * SNAKE_SPEED)
+    start = time.perf_counter()
+    seconds, used, checks, mismatches, average = soak(game, buffer, ticks, args.rewinds, random.Random(args.seed))
+    print(f"記錄 {ticks} tick ({time.perf_counter() - start:.1f} 秒)，可倒帶 {seconds:.0f} 秒，"
+          f"佔用 {used / 1024:.1f} KB / {len(buffer.data) / 1024 / 1024:.0f} MB")
+    print(f"倒帶 {checks} 次，不一致 {mismatches} 次，平均每次 {average * 1000:.3f} 毫秒")
+
+# 程式執行入口
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import math
+from settings import *
+from protocol import apply_keyframe, apply_delta
+
+# 具預測與回滾的連線客戶端：本地輸入立即套用並預測之後的 tick，
+# 遠端玩家預設維持目前方向；收到伺服器的權威結果後還原到已確認的快照，
+# 套用權威輸入與結果，再重新模擬尚未確認的 tick
+class RollbackClient:
+    def __init__(self, net_client, game):
+        self.net = net_client # 負責收發訊息的 NetClient
+        self.game = game # 本地顯示用的 Game (內容為預測狀態)
+        self.game.defer_game_over_sound = True # 預測的遊戲結束可能被回滾，等伺服器確認後才播放音效
+        self.confirmed_state = None # 最後一個伺服器確認的狀態快照
+        self.confirmed_tick = 0 # 已確認狀態的 tick
+        self.local_tick = 0 # 本地已預測到的 tick
+        self.local_inputs = {} # 本地輸入 {tick: [方向, ...]}，確認後即移除
+        self.rollbacks = 0 # 發生回滾 (重新模擬) 的次數
+        self.resimulated_ticks = 0 # 因回滾而重新模擬的 tick 總數
+        self.stalled_frames = 0 # 因領先太多而暫停預測的幀數
+
+    # 是否已經收到伺服器的初始狀態
+    @property
+    def has_state(self):
+        """是否已有狀態"""
+        return self.confirmed_state is not None
+
+    # 本地玩家轉向：立即排入下一個預測 tick，並附上 tick 編號送給伺服器
+    def local_input(self, direction):
+        """本地輸入"""
+        tick = self.local_tick + 1
+        self.local_inputs.setdefault(tick, []).append(direction)
+        self.net.send_turn(direction, tick)
+
+    # 計算希望領先已確認狀態多少個 tick：
+    # 確認狀態本身落後伺服器單程延遲，而輸入也需要單程延遲才能送達，因此需要領先一個往返時間
+    def target_lead(self):
+        """目標領先 tick 數"""
+        tick_seconds = 1.0 / SNAKE_SPEED
+        lead = math.ceil(self.net.rtt / tick_seconds) + INPUT_BUFFER_TICKS
+        return min(lead, MAX_ROLLBACK_TICKS)
+
+    # 每幀呼叫一次：處理伺服器訊息、必要時回滾，並推進本地預測
+    def advance(self):
+        """推進一幀"""
+        self.net.ping()
+        states = self.net.poll()
+        if states:
+            self._confirm(states)
+        if not self.has_state or not self.game.game_active:
+            return # 尚未開始或遊戲已結束，不需要預測
+        # 依照領先程度決定本幀要預測幾個 tick：落後時多走一步追上，超前太多時暫停
+        lead = self.local_tick - self.confirmed_tick
+        target = self.target_lead()
+        if lead < target:
+            steps = 2
+        elif lead > target + 1 or lead >= MAX_ROLLBACK_TICKS: # 留一個 tick 的緩衝，避免延遲抖動造成頻繁暫停
+            steps = 0
+            self.stalled_frames += 1
+        else:
+            steps = 1
+        for _ in range(steps):
+            self.local_tick += 1
+            self._simulate(self.local_tick)
+
+    # 套用伺服器的權威訊息並回滾重新模擬
+    def _confirm(self, states):
+        """確認權威狀態"""
+        if self.confirmed_state is not None:
+            self.game.restore_state(self.confirmed_state) # 回到上一個確認的狀態
+        for message in states:
+            if message['t'] == 'key':
+                apply_keyframe(self.game, message)
+                self.game.game_over_sound_played = not self.game.game_active # 新的一局重新播放結束音效 (加入時已經結束的一局不播放)
+                self.local_tick = message['k'] # 新的一局，從關鍵幀的 tick 重新開始預測
+                self.local_inputs.clear()
+            else:
+                apply_delta(self.game, message)
+            self.confirmed_tick = message['k']
+        if not self.game.game_active and self.game.winner_message and not self.game.game_over_sound_played:
+            self.game.play_sound('gameover') # 伺服器確認遊戲結束
+            self.game.game_over_sound_played = True
+        self.confirmed_state = self.game.save_state()
+        # 移除已經被伺服器處理過的本地輸入
+        for tick in [t for t in self.local_inputs if t <= self.confirmed_tick]:
+            del self.local_inputs[tick]
+        if self.local_tick < self.confirmed_tick:
+            self.local_tick = self.confirmed_tick # 預測落後於伺服器 (例如暫停過久)，直接跳到確認狀態
+            return
+        # 從確認的 tick 重新模擬到目前的本地 tick，重新模擬時不播放音效
+        if self.local_tick > self.confirmed_tick:
+            self.rollbacks += 1
+            sounds = self.game.sounds
+            self.game.sounds = None
+            for tick in range(self.confirmed_tick + 1, self.local_tick + 1):
+                self._simulate(tick)
+                self.resimulated_ticks += 1
+            self.game.sounds = sounds
+
+    # 模擬單一 tick：先套用該 tick 的本地輸入，遠端玩家沿用目前方向
+    def _simulate(self, tick):
+        """模擬一個 tick"""
+        slot = self.net.slot
+        for direction in self.local_inputs.get(tick, ()):
+            if slot is not None and slot < len(self.game.snakes):
+                self.game.snakes[slot].turn(direction)
+        self.game.update()
+
+    # 回傳回滾相關的統計資料
+    def stats(self):
+        """統計資料"""
+        return {
+            'rtt_ms': round(self.net.rtt * 1000, 1),
+            'lead_ticks': self.local_tick - self.confirmed_tick,
+            'rollbacks': self.rollbacks,
+            'resimulated_ticks': self.resimulated_ticks,
+            'stalled_frames': self.stalled_frames
+        }
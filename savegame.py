@@ -0,0 +1,242 @@
+import argparse
+import collections
+import os
+import queue
+import random
+import struct
+import threading
+import time
+from settings import *
+from objects import Food
+from protocol import FOOD_TYPE_IDS
+
+# 遊戲存檔：把進行中的本機遊戲完整保存成精簡的二進位檔，之後可以從主選單立即接續
+# 保存的內容：模式、tick、是否暫停、每條蛇的身體、方向、長度、分數與是否死亡、每個食物與剩餘的存在時間、亂數產生器的狀態
+# 繪圖執行緒只複製這些欄位 (capture)，編碼與寫入磁碟由背景執行緒處理，自動存檔不會讓畫面卡頓；
+# 寫入先寫到暫存檔並 fsync 後再取代原本的存檔，寫到一半關機也不會留下損壞的存檔
+#
+# 檔案格式 (小端序)：
+#   SAVE_HEADER : 檔頭 (識別碼、版本、模式、是否暫停、tick、蛇的數量、食物的數量)
+#   每條蛇      : SAVE_SNAKE 與身體格子 (頭到尾，每格 2 位元組)
+#   每個食物    : SAVE_FOOD (剩餘 tick 數為 NO_TIMEOUT 表示不會超時)
+#   SAVE_RANDOM : random 模組的 Mersenne Twister 狀態
+
+SAVE_MAGIC = b'SNKS' # 存檔識別碼
+SAVE_VERSION = 1 # 存檔格式版本
+SAVE_MODES = ('single', 'multi', 'ai') # 可以存檔的模式 (連線與觀戰的狀態由伺服器決定)
+SAVE_HEADER = struct.Struct('<4sHBBIBB') # 識別碼、版本、模式編號、是否暫停、tick、蛇的數量、食物的數量
+SAVE_SNAKE = struct.Struct('<BbbiHH') # 是否死亡、方向 x、方向 y、分數、目標長度、身體格數
+SAVE_FOOD = struct.Struct('<HBH') # 格子、食物類型編號、剩餘的 tick 數
+SAVE_RANDOM = struct.Struct('<B625IBd') # 狀態版本、624 個狀態字與位置、是否有暫存的常態分布值、暫存值
+NO_TIMEOUT = 0xFFFF # 不會超時的食物
+
+# 存檔的內容 (snakes 為 (身體格子, 方向, 長度, 分數, 是否死亡)，foods 為 (格子, 食物類型編號, 剩餘 tick 數或 None))
+SavedGame = collections.namedtuple('SavedGame', ('mode', 'tick', 'paused', 'snakes', 'foods', 'random_state'))
+
+# 複製目前遊戲的狀態 (在繪圖執行緒呼叫，只複製欄位，不做編碼)
+def capture(game):
+    """擷取遊戲狀態"""
+    if game.mode not in SAVE_MODES:
+        raise ValueError(f"無法保存的模式: {game.mode}")
+    tick = game.scheduler.tick
+    snakes = tuple((s.cells(), s.direction, s.length, s.score, s.is_dead) for s in game.snakes)
+    foods = tuple(
+        (f.cell, FOOD_TYPE_IDS[f.type], None if f.expire_tick is None else game.scheduler.remaining(f.expire_tick))
+        for f in game.foods
+    )
+    return SavedGame(game.mode, tick, game.game_paused, snakes, foods, random.getstate())
+
+# 把存檔內容編碼成位元組
+def encode(saved):
+    """編碼存檔"""
+    parts = [SAVE_HEADER.pack(SAVE_MAGIC, SAVE_VERSION, SAVE_MODES.index(saved.mode), saved.paused, saved.tick, len(saved.snakes), len(saved.foods))]
+    for cells, direction, length, score, dead in saved.snakes:
+        parts.append(SAVE_SNAKE.pack(dead, direction[0], direction[1], score, length, len(cells)))
+        parts.append(struct.pack(f'<{len(cells)}H', *cells))
+    for cell, type_id, remaining in saved.foods:
+        parts.append(SAVE_FOOD.pack(cell, type_id, NO_TIMEOUT if remaining is None else min(remaining, NO_TIMEOUT - 1)))
+    version, words, gauss = saved.random_state
+    parts.append(SAVE_RANDOM.pack(version, *words, gauss is not None, gauss or 0.0))
+    return b''.join(parts)
+
+# 由位元組解碼存檔內容 (格式不符時拋出 ValueError)
+def decode(data):
+    """解碼存檔"""
+    try:
+        magic, version, mode, paused, tick, snake_count, food_count = SAVE_HEADER.unpack_from(data, 0)
+        if magic != SAVE_MAGIC:
+            raise ValueError("不是貪吃蛇的存檔")
+        if version != SAVE_VERSION:
+            raise ValueError(f"不支援的存檔版本: {version}")
+        offset = SAVE_HEADER.size
+        snakes = []
+        for _ in range(snake_count):
+            dead, dx, dy, score, length, size = SAVE_SNAKE.unpack_from(data, offset)
+            offset += SAVE_SNAKE.size
+            cells = list(struct.unpack_from(f'<{size}H', data, offset))
+            offset += 2 * size
+            snakes.append((cells, (dx, dy), length, score, bool(dead)))
+        foods = []
+        for _ in range(food_count):
+            cell, type_id, remaining = SAVE_FOOD.unpack_from(data, offset)
+            offset += SAVE_FOOD.size
+            foods.append((cell, type_id, None if remaining == NO_TIMEOUT else remaining))
+        values = SAVE_RANDOM.unpack_from(data, offset)
+        random_state = (values[0], values[1:626], values[627] if values[626] else None)
+        return SavedGame(SAVE_MODES[mode], tick, bool(paused), tuple(snakes), tuple(foods), random_state)
+    except (struct.error, IndexError) as e:
+        raise ValueError(f"存檔已損壞: {e}") from e
+
+# 讀取存檔，沒有存檔時回傳 None
+def read_save(path=SAVE_PATH):
+    """讀取存檔"""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    return decode(data)
+
+# 把存檔內容還原到 Game (重置成同一個模式後覆蓋狀態，電腦蛇等物件由 reset_game 建立)
+def restore_save(game, saved):
+    """還原存檔"""
+    game.reset_game(mode=saved.mode)
+    if len(game.snakes) != len(saved.snakes):
+        raise ValueError(f"存檔的蛇數量 ({len(saved.snakes)}) 與模式 {saved.mode} 不符")
+    for snake, (cells, direction, length, score, dead) in zip(game.snakes, saved.snakes):
+        snake.set_cells(cells)
+        snake.direction = direction
+        snake.length = length
+        snake.score = score
+        snake.is_dead = dead
+    game.scheduler.clear()
+    game.scheduler.tick = saved.tick
+    game.foods = []
+    for cell, type_id, remaining in saved.foods:
+        food = Food(None, FOOD_TYPES[type_id], cell=cell)
+        if remaining is not None:
+            food.expire_tick = game.scheduler.schedule(remaining, game.expire_food, food)
+        game.foods.append(food)
+    random.setstate(saved.random_state)
+    game.headings = [snake.direction for snake in game.snakes]
+    game.stats.reset() # reset_game 產生的初始食物事件不計入統計
+    game.sound_cursor = game.events.cursor()
+    game.game_active = True
+    game.game_paused = saved.paused
+    if game.observer is not None:
+        game.observer.invalidate()
+
+# 背景存檔：save 只複製狀態放進佇列，執行緒編碼後寫入磁碟 (佇列中累積多份時只寫最新的一份)
+class GameSaver:
+    def __init__(self, path=SAVE_PATH):
+        self.path = path # 存檔路徑
+        self.queue = queue.Queue() # 等待處理的命令 (SavedGame 表示存檔，False 表示刪除存檔，None 表示結束)
+        self.saved = 0 # 已寫入的次數
+        self.error = None # 最近一次寫入失敗的原因
+        self.thread = threading.Thread(target=self._run, name="game-saver", daemon=True)
+        self.thread.start()
+
+    # 保存目前的遊戲狀態 (不會等待磁碟)
+    def save(self, game):
+        """存檔"""
+        self.queue.put(capture(game))
+
+    # 刪除存檔 (遊戲已經結束，不能再接續)
+    def delete(self):
+        """刪除存檔"""
+        self.queue.put(False)
+
+    # 是否有存檔
+    def exists(self):
+        """是否有存檔"""
+        return os.path.exists(self.path)
+
+    # 背景執行緒：取出佇列中所有的命令，只執行最後一個
+    def _run(self):
+        """存檔迴圈"""
+        running = True
+        while running:
+            commands = [self.queue.get()]
+            while True:
+                try:
+                    commands.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in commands:
+                running = False
+                commands = commands[:commands.index(None)]
+            if not commands:
+                continue
+            command = commands[-1]
+            try:
+                if command is False:
+                    if os.path.exists(self.path):
+                        os.remove(self.path)
+                else:
+                    self._write(encode(command))
+                    self.saved += 1
+            except OSError as e:
+                self.error = e
+                print(f"無法寫入存檔 {self.path}: {e}")
+
+    # 先寫入暫存檔再取代原本的存檔
+    def _write(self, data):
+        """寫入存檔"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = self.path + ".tmp"
+        with open(temporary, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.path)
+
+    # 處理完佇列中的命令後結束背景執行緒
+    def close(self, timeout=5.0):
+        """關閉存檔器"""
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join(timeout)
+
+# 以命令列檢查存檔內容，或測量存檔在繪圖執行緒與背景執行緒的耗時
+def main():
+    parser = argparse.ArgumentParser(description="檢查遊戲存檔")
+    parser.add_argument("--path", default=SAVE_PATH, help="存檔路徑")
+    parser.add_argument("--bench", type=int, default=0, metavar="N", help="測試用：以一局電腦對戰存檔與讀檔 N 次並測量耗時")
+    args = parser.parse_args()
+    if args.bench:
+        from game import Game
+        from autopilot import Autopilot
+        game = Game(None, None, None)
+        game.autopilot = Autopilot() # 玩家 1 由自動駕駛操作，讓這一局持續進行
+        game.reset_game(mode="ai")
+        game.game_active = True
+        for _ in range(200):
+            game.update()
+        saver = GameSaver(args.path)
+        start = time.perf_counter()
+        for _ in range(args.bench):
+            saver.save(game)
+        captured = time.perf_counter() - start
+        saver.close(timeout=None)
+        written = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(args.bench):
+            restored = Game(None, None, None)
+            restore_save(restored, read_save(args.path))
+        loaded = time.perf_counter() - start
+        print(f"繪圖執行緒每次擷取 {captured / args.bench * 1000:.3f} 毫秒，背景寫入 {saver.saved} 次共 {written * 1000:.1f} 毫秒，"
+              f"每次讀檔並還原 {loaded / args.bench * 1000:.3f} 毫秒")
+    saved = read_save(args.path)
+    if saved is None:
+        print(f"沒有存檔: {args.path}")
+        return
+    print(f"{args.path}: {os.path.getsize(args.path)} 位元組，模式 {saved.mode}，第 {saved.tick} tick{' (暫停中)' if saved.paused else ''}")
+    for i, (cells, direction, length, score, dead) in enumerate(saved.snakes, 1):
+        print(f"  蛇 {i}: 長度 {len(cells)}/{length}，分數 {score}{'，已死亡' if dead else ''}")
+    print(f"  食物: {len(saved.foods)} 個")
+
+# 程式執行入口
+if __name__ == "__main__":
+    main()
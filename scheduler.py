@@ -0,0 +1,59 @@
+import heapq
+
+# 以 tick 計時的事件排程器 (最小堆積)：事件登記在未來的某個 tick，每個 tick 只取出已經到期的事件
+# 時間只在遊戲邏輯前進時增加，暫停或停在選單時所有計時都會凍結
+# 事件不會被取消，處理函式自行確認目標是否仍然存在 (例如已經被吃掉的食物)，過期的事件最多留到原本的到期時間
+
+# 遊戲計時器：堆積中的每一項為 (到期 tick, 登記順序, 處理函式, 參數)
+class TickScheduler:
+    def __init__(self):
+        self.tick = 0 # 目前的 tick (遊戲邏輯已前進的次數)
+        self.queue = [] # 尚未處理的事件 (最小堆積)
+        self.sequence = 0 # 登記順序，同一個 tick 到期的事件依登記順序處理
+
+    # 登記 delay 個 tick 之後執行的事件，回傳到期的 tick
+    def schedule(self, delay, action, argument=None):
+        """登記事件"""
+        due = self.tick + max(1, delay)
+        heapq.heappush(self.queue, (due, self.sequence, action, argument))
+        self.sequence += 1
+        return due
+
+    # 前進一個 tick
+    def advance(self):
+        """前進一個 tick"""
+        self.tick += 1
+
+    # 依序執行所有已經到期的事件，回傳執行的數量 (處理函式中新登記的事件若已到期也會在這次執行)
+    def run_due(self):
+        """執行到期的事件"""
+        queue = self.queue
+        count = 0
+        while queue and queue[0][0] <= self.tick:
+            _, _, action, argument = heapq.heappop(queue)
+            action(argument)
+            count += 1
+        return count
+
+    # 距離指定的到期 tick 還剩幾個 tick
+    def remaining(self, due):
+        """剩餘 tick 數"""
+        return max(0, due - self.tick)
+
+    # 清除所有事件並從 tick 0 重新開始 (新的一局)
+    def clear(self):
+        """重置計時器"""
+        self.tick = 0
+        self.queue = []
+        self.sequence = 0
+
+    # 儲存計時器狀態 (事件是不可變的 tuple，複製列表即可)
+    def save(self):
+        """儲存狀態"""
+        return (self.tick, self.queue[:], self.sequence)
+
+    # 還原 save 儲存的狀態
+    def restore(self, state):
+        """還原狀態"""
+        self.tick, queue, self.sequence = state
+        self.queue = queue[:] # 複製一份，讓同一個快照可以重複還原
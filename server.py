@@ -0,0 +1,429 @@
+import os
+# 伺服器不需要視窗和音效，使用 SDL 的 dummy 驅動以無畫面方式執行
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+import asyncio
+import argparse
+import itertools
+import time
+import pygame
+from settings import *
+from game import Game
+from protocol import StateTracker, encode_message, decode_message
+from spectator import SpectatorStream
+from replay import ReplayWriter
+from history import HistoryWriter, match_record
+
+# 檢查客戶端的轉向訊息，回傳 (方向, tick)；欄位缺少或型別不符時回傳 None (視為協定錯誤)，
+# 格式正確但不是四個方向的單位向量時方向為 None (忽略這個輸入)
+def parse_input(message):
+    """解析轉向訊息"""
+    direction = message.get('d')
+    tick = message.get('k')
+    if not isinstance(direction, list) or len(direction) != 2:
+        return None
+    if not all(type(value) is int for value in direction) or (tick is not None and type(tick) is not int):
+        return None
+    if abs(direction[0]) + abs(direction[1]) != 1:
+        return None, tick # 只接受四個方向的單位向量
+    return (direction[0], direction[1]), tick
+
+# 檢查客戶端指定的房間編號 (只接受 1 到 MAX_ROOM_ID 的整數)
+def valid_room_id(room_id):
+    """檢查房間編號"""
+    return type(room_id) is int and 1 <= room_id <= MAX_ROOM_ID
+
+# 伺服器上的一位連線玩家
+class ClientConnection:
+    def __init__(self, reader, writer):
+        self.reader = reader # asyncio 串流讀取端
+        self.writer = writer # asyncio 串流寫入端
+        self.room = None # 所在的房間
+        self.slot = None # 在房間中的玩家編號 (從 0 開始，對應 game.snakes 的索引)
+        self.closed = False # 標記連線是否已關閉
+
+    # 送出已編碼的位元組；寫入緩衝過大表示客戶端跟不上，直接斷線避免拖慢整個伺服器
+    def send(self, data):
+        """送出資料"""
+        if self.closed:
+            return
+        if self.writer.transport.get_write_buffer_size() > MAX_CLIENT_BUFFER:
+            self.close()
+            return
+        self.writer.write(data)
+
+    # 關閉連線
+    def close(self):
+        """關閉連線"""
+        if not self.closed:
+            self.closed = True
+            self.writer.close()
+
+# 觀戰的連線：接收二進位幀；跟不上時略過差量，等到下一個關鍵幀再重新同步
+class SpectatorConnection:
+    def __init__(self, writer, room):
+        self.writer = writer # asyncio 串流寫入端
+        self.room = room # 觀看中的房間
+        self.resync = False # 是否正在等待關鍵幀重新同步
+        self.closed = False # 標記連線是否已關閉
+        self.skipped = 0 # 因跟不上而略過的幀數
+
+    # 接收一個已編碼的幀 (所有觀眾共用同一份位元組)
+    def deliver(self, frame, keyframe):
+        """送出幀"""
+        if self.closed:
+            return
+        if self.writer.transport.get_write_buffer_size() > MAX_CLIENT_BUFFER:
+            self.resync = True
+        if self.resync and not keyframe:
+            self.skipped += 1
+            return
+        self.resync = False
+        self.writer.write(frame)
+
+    # 關閉連線
+    def close(self):
+        """關閉連線"""
+        if not self.closed:
+            self.closed = True
+            self.writer.close()
+
+# 一個房間負責一局權威遊戲，由伺服器統一推進
+class Room:
+    def __init__(self, room_id, capacity, arena_snakes=0, policy=None, record_dir=None, history=None):
+        self.room_id = room_id # 房間編號
+        self.arena_snakes = arena_snakes # 大於 0 時為電腦競技場房間 (只有 AI 蛇，供觀戰)
+        self.capacity = 0 if arena_snakes else capacity # 滿員人數 (競技場房間沒有玩家位置)
+        self.clients = [None] * self.capacity # 每個玩家位置上的連線 (None 表示空位)
+        self.game = Game(None, None, None) # 無畫面、無音效的遊戲邏輯
+        self.game.policy = policy # 競技場 AI 蛇使用的批次策略 (None 表示內建的 AI)
+        self.tracker = StateTracker() # 負責產生關鍵幀與差量
+        self.spectators = SpectatorStream() # 觀戰串流，每個 tick 只編碼一次再分送給所有觀眾
+        self.pending_inputs = [[] for _ in range(self.capacity)] # 每位玩家尚未套用的 (目標 tick, 方向) 輸入
+        self.state = "waiting" # 房間狀態：waiting (等待玩家) / playing (遊戲中) / over (結束等待重開)
+        self.over_time = 0 # 遊戲結束的時間，用於計算重新開始的延遲
+        self.record_dir = record_dir # 重播檔的資料夾 (None 表示不錄製)
+        self.recorder = None # 目前這一局的重播檔 (以觀眾的身分接收觀戰串流)
+        self.history = history # 比賽紀錄的背景寫入器 (None 表示不記錄)
+        self.games = 0 # 已開始的局數
+
+    # 房間是否還有空位
+    def has_free_slot(self):
+        """檢查空位"""
+        return None in self.clients
+
+    # 目前在線的玩家
+    def connected_clients(self):
+        """在線玩家列表"""
+        return [c for c in self.clients if c is not None and not c.closed]
+
+    # 將玩家加入第一個空位，滿員時開始遊戲
+    def add_client(self, client):
+        """加入玩家"""
+        slot = self.clients.index(None)
+        self.clients[slot] = client
+        client.room = self
+        client.slot = slot
+        client.send(encode_message({'t': 'welcome', 'room': self.room_id, 'slot': slot, 'capacity': self.capacity}))
+        if self.state == "waiting" and not self.has_free_slot():
+            self.start()
+        elif self.state != "waiting":
+            client.send(encode_message(self.tracker.keyframe(self.game))) # 中途加入的玩家先收到完整狀態
+
+    # 加入觀眾；目前沒有串流內容時立即補上一個關鍵幀
+    def add_spectator(self, spectator):
+        """加入觀眾"""
+        if self.state != "waiting" and self.spectators.keyframe is None:
+            self.spectators.publish(self.tracker.keyframe(self.game))
+        self.spectators.add_viewer(spectator)
+
+    # 移除觀眾；沒有觀眾時清空串流，不再為觀戰編碼
+    def remove_spectator(self, spectator):
+        """移除觀眾"""
+        self.spectators.remove_viewer(spectator)
+        if not self.spectators.viewers:
+            self.spectators = SpectatorStream()
+
+    # 移除玩家，空出的位置上的蛇會繼續直線前進直到死亡
+    def remove_client(self, client):
+        """移除玩家"""
+        if client.slot is not None and self.clients[client.slot] is client:
+            self.clients[client.slot] = None
+        client.room = None
+
+    # 開始新的一局，並向所有玩家送出關鍵幀
+    def start(self):
+        """開始遊戲"""
+        if self.arena_snakes:
+            self.game.reset_game(mode="arena", player_count=self.arena_snakes)
+        else:
+            self.game.reset_game(mode="online", player_count=self.capacity)
+        self.game.game_active = True
+        self.pending_inputs = [[] for _ in range(self.capacity)]
+        self.tracker = StateTracker()
+        self.state = "playing"
+        self.games += 1
+        keyframe = self.tracker.keyframe(self.game)
+        self.broadcast(encode_message(keyframe))
+        if self.record_dir is not None:
+            self.start_recording()
+        if self.spectators.viewers:
+            self.spectators.publish(keyframe)
+
+    # 開始把這一局的觀戰串流錄製成重播檔 (與觀眾共用同一份編碼)
+    def start_recording(self):
+        """開始錄製"""
+        self.stop_recording()
+        self.spectators.keyframe = None # 上一局的串流內容不寫入新的重播檔
+        self.spectators.backlog = []
+        name = f"room{self.room_id}-{time.strftime('%Y%m%d-%H%M%S')}-{self.games}.replay"
+        self.recorder = ReplayWriter(os.path.join(self.record_dir, name))
+        self.spectators.add_viewer(self.recorder)
+
+    # 結束錄製並關閉重播檔
+    def stop_recording(self):
+        """結束錄製"""
+        if self.recorder is not None:
+            self.remove_spectator(self.recorder)
+            self.recorder.close()
+            self.recorder = None
+
+    # 記錄玩家的轉向輸入；客戶端會預先標記要套用的 tick，太早或已過期的 tick 會被修正
+    def queue_input(self, slot, direction, tick=None):
+        """記錄輸入"""
+        if self.state != "playing":
+            return
+        next_tick = self.tracker.tick + 1
+        if tick is None or tick < next_tick:
+            tick = next_tick # 沒有標記或已經來不及，在下一個 tick 套用
+        tick = min(tick, next_tick + MAX_ROLLBACK_TICKS) # 避免客戶端把輸入排到太遠的未來
+        self.pending_inputs[slot].append((tick, direction))
+
+    # 推進一個 tick：套用輸入、更新遊戲、將差量編碼一次後廣播給房間內所有玩家
+    def step(self):
+        """推進遊戲"""
+        if self.state == "waiting":
+            return
+        if self.state == "over":
+            # 結束畫面停留一段時間後，若仍滿員則重新開始，否則回到等待狀態
+            if pygame.time.get_ticks() - self.over_time >= ROOM_RESTART_DELAY:
+                if self.has_free_slot() and not self.arena_snakes:
+                    self.state = "waiting"
+                else:
+                    self.start()
+            return
+        tick = self.tracker.tick + 1 # 即將模擬的 tick
+        applied = [] # 本 tick 實際套用的權威輸入，隨差量一起送出
+        for slot, inputs in enumerate(self.pending_inputs):
+            if not inputs:
+                continue
+            remaining = []
+            for input_tick, direction in inputs:
+                if input_tick <= tick:
+                    self.game.snakes[slot].turn(direction)
+                    applied.append([slot, direction[0], direction[1]])
+                else:
+                    remaining.append((input_tick, direction))
+            self.pending_inputs[slot] = remaining
+        self.game.update()
+        message = self.tracker.delta(self.game)
+        if applied:
+            message['i'] = applied
+        if self.capacity:
+            self.broadcast(encode_message(message))
+        if self.spectators.viewers:
+            self.spectators.publish_tick(self.game, self.tracker, message)
+        if not self.game.game_active:
+            self.state = "over"
+            self.over_time = pygame.time.get_ticks()
+            if self.history is not None:
+                self.history.submit(match_record(self.game, replay=self.recorder.path if self.recorder else None))
+            self.stop_recording()
+
+    # 將同一份已編碼的資料送給所有玩家 (每個 tick 只編碼一次)
+    def broadcast(self, data):
+        """廣播資料"""
+        for client in self.connected_clients():
+            client.send(data)
+
+# 權威遊戲伺服器：以單一 tick 迴圈推進所有房間，並接受多個 TCP 客戶端
+class GameServer:
+    def __init__(self, host=SERVER_HOST, port=SERVER_PORT, capacity=ROOM_CAPACITY, tick_rate=SNAKE_SPEED, arena_rooms=0, policy=None, record_dir=None, history=None):
+        self.host = host # 監聽位址
+        self.port = port # 監聽埠號
+        self.capacity = capacity # 每個房間的人數
+        self.tick_rate = tick_rate # 每秒 tick 數
+        self.rooms = {} # 所有房間 {房間編號: Room}
+        self.room_ids = itertools.count(1) # 房間編號產生器
+        self.server = None # asyncio 伺服器物件
+        self.tick_count = 0 # 已執行的 tick 數
+        self.late_ticks = 0 # 執行時間超過 tick 間隔的次數
+        self.client_tasks = set() # 正在處理中的客戶端連線工作
+        self.arena_rooms = arena_rooms # 常駐的電腦競技場房間數
+        self.policy = policy # 競技場房間共用的 AI 策略
+        self.record_dir = record_dir # 每一局錄製成重播檔的資料夾 (None 表示不錄製)
+        self.history = history # 比賽紀錄的背景寫入器 (None 表示不記錄)
+
+    # 開始監聽連線並啟動 tick 迴圈
+    async def start(self):
+        """啟動伺服器"""
+        pygame.init() # 初始化計時器等模組 (使用 dummy 驅動)
+        # 建立常駐的電腦競技場房間，供觀眾觀看 AI 對戰
+        for _ in range(self.arena_rooms):
+            room_id = next(self.room_ids)
+            room = self.rooms[room_id] = Room(room_id, self.capacity, arena_snakes=ARENA_SNAKES, policy=self.policy, record_dir=self.record_dir, history=self.history)
+            room.start()
+        self.server = await asyncio.start_server(self.handle_client, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1] # 埠號為 0 時取得實際分配的埠號
+        self.tick_task = asyncio.ensure_future(self.tick_loop())
+
+    # 停止伺服器並關閉所有連線
+    async def stop(self):
+        """停止伺服器"""
+        self.tick_task.cancel()
+        self.server.close()
+        for room in self.rooms.values():
+            room.stop_recording() # 寫完進行中的重播檔
+            for client in room.connected_clients():
+                client.close()
+        if self.client_tasks:
+            await asyncio.wait(self.client_tasks) # 等待所有連線處理完畢，避免結束時被強制取消
+        await self.server.wait_closed()
+        if self.history is not None:
+            self.history.close() # 寫完尚未寫入的比賽紀錄
+
+    # 找到第一個還在等待玩家的房間，沒有則建立新房間 (房間數已達 MAX_ROOMS 時不再建立，回傳 None)
+    def find_room(self, room_id=None):
+        """配對房間"""
+        if room_id is not None:
+            room = self.rooms.get(room_id)
+            if room is not None and room.arena_snakes:
+                return None # 競技場房間只能觀戰
+            if room is None:
+                if len(self.rooms) >= MAX_ROOMS:
+                    return None
+                room = self.rooms[room_id] = Room(room_id, self.capacity, record_dir=self.record_dir, history=self.history)
+            return room if room.has_free_slot() else None
+        for room in self.rooms.values():
+            if room.state == "waiting" and room.has_free_slot() and not room.arena_snakes:
+                return room
+        if len(self.rooms) >= MAX_ROOMS:
+            return None
+        room_id = next(self.room_ids)
+        while room_id in self.rooms:
+            room_id = next(self.room_ids)
+        room = self.rooms[room_id] = Room(room_id, self.capacity, record_dir=self.record_dir, history=self.history)
+        return room
+
+    # 處理單一客戶端連線：第一則訊息必須是 join，之後只接受轉向輸入
+    async def handle_client(self, reader, writer):
+        """處理客戶端"""
+        client = ClientConnection(reader, writer)
+        spectator = None # 觀戰連線 (收到 watch 後建立)
+        task = asyncio.current_task()
+        self.client_tasks.add(task)
+        try:
+            while not client.closed:
+                line = await reader.readline()
+                if not line:
+                    break # 客戶端已斷線
+                try:
+                    message = decode_message(line)
+                except ValueError:
+                    break # 無法解析的訊息，視為協定錯誤
+                if not isinstance(message, dict):
+                    break
+                if message.get('t') == 'watch' and client.room is None and spectator is None:
+                    # 觀戰：指定房間或第一個進行中的房間，之後只送二進位幀
+                    room = self.rooms.get(message.get('room')) or next((r for r in self.rooms.values() if r.state != "waiting"), None)
+                    if room is None:
+                        client.send(encode_message({'t': 'error', 'reason': 'no room'}))
+                        break
+                    spectator = SpectatorConnection(writer, room)
+                    room.add_spectator(spectator)
+                elif message.get('t') == 'join' and client.room is None and spectator is None:
+                    room_id = message.get('room')
+                    if room_id is not None and not valid_room_id(room_id):
+                        client.send(encode_message({'t': 'error', 'reason': 'bad room'}))
+                        break
+                    room = self.find_room(room_id)
+                    if room is None:
+                        # 指定的房間已滿，或房間數已達上限而無法建立新房間
+                        reason = 'room full' if room_id in self.rooms else 'bad room' if room_id is not None else 'server full'
+                        client.send(encode_message({'t': 'error', 'reason': reason}))
+                        break
+                    room.add_client(client)
+                elif message.get('t') == 'in' and client.room is not None:
+                    parsed = parse_input(message)
+                    if parsed is None:
+                        break # 欄位缺少或型別不符，視為協定錯誤並斷線
+                    direction, tick = parsed
+                    if direction is not None:
+                        client.room.queue_input(client.slot, direction, tick)
+                elif message.get('t') == 'ping':
+                    client.send(encode_message({'t': 'pong', 'c': message.get('c')})) # 原樣回傳客戶端的時間戳
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"客戶端送出格式不符的訊息，中斷連線: {e!r}") # 其他欄位格式不符，同樣視為協定錯誤
+        finally:
+            if spectator is not None:
+                spectator.closed = True
+                spectator.room.remove_spectator(spectator)
+            if client.room is not None:
+                room = client.room
+                room.remove_client(client)
+                # 沒有人的房間直接移除，避免閒置房間佔用 tick 時間 (常駐的競技場房間除外)
+                if not room.connected_clients() and not room.arena_snakes and room.room_id in self.rooms:
+                    room.stop_recording() # 寫完進行中的重播檔
+                    del self.rooms[room.room_id]
+            client.close()
+            self.client_tasks.discard(task)
+
+    # 以固定頻率推進所有房間；落後時不補 tick，避免雪崩
+    async def tick_loop(self):
+        """tick 迴圈"""
+        loop = asyncio.get_running_loop()
+        interval = 1.0 / self.tick_rate
+        next_tick = loop.time()
+        while True:
+            for room in list(self.rooms.values()):
+                room.step()
+            self.tick_count += 1
+            next_tick += interval
+            delay = next_tick - loop.time()
+            if delay < 0:
+                self.late_ticks += 1
+                next_tick = loop.time()
+                delay = 0
+            await asyncio.sleep(delay)
+
+# 以命令列啟動伺服器
+async def main():
+    parser = argparse.ArgumentParser(description="貪吃蛇權威伺服器")
+    parser.add_argument("--host", default=SERVER_HOST, help="監聽位址")
+    parser.add_argument("--port", type=int, default=SERVER_PORT, help="監聽埠號")
+    parser.add_argument("--capacity", type=int, default=ROOM_CAPACITY, help="每個房間的玩家數量")
+    parser.add_argument("--arena-rooms", type=int, default=0, help="常駐的電腦競技場房間數 (供觀戰)")
+    parser.add_argument("--policy", metavar="FILE", help="競技場 AI 蛇使用的神經網路策略權重檔 (.npz)")
+    parser.add_argument("--record", metavar="DIR", help="把每一局錄製成重播檔 (可用 replay_export.py 匯出成 GIF/PNG)")
+    parser.add_argument("--history", metavar="DB", help="把每一局的結果寫入比賽紀錄資料庫 (SQLite)")
+    args = parser.parse_args()
+    if args.record:
+        os.makedirs(args.record, exist_ok=True)
+    policy = None
+    if args.policy:
+        from policy import NeuralPolicy # 需要 NumPy，只在選用時才匯入
+        policy = NeuralPolicy.load(args.policy)
+    history = HistoryWriter(args.history) if args.history else None
+    server = GameServer(args.host, args.port, args.capacity, arena_rooms=args.arena_rooms, policy=policy, record_dir=args.record, history=history)
+    await server.start()
+    print(f"伺服器已啟動: {args.host}:{server.port}")
+    await server.server.serve_forever()
+
+# 程式執行入口
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -24,6 +24,10 @@ DARK_GREEN = (0, 150, 0) # 玩家 1 蛇頭顏色/漸變目標色
 BLUE = (0, 150, 255) # 玩家 2 / AI 蛇身體顏色
 DARK_BLUE = (0, 100, 200) # 玩家 2 / AI 蛇頭顏色/漸變目標色
 BRIGHT_GREEN = (50, 255, 50) # 可能用於高亮或其他效果 (目前未使用)
+ORANGE = (255, 150, 0) # 連線玩家 3 蛇身體顏色
+DARK_ORANGE = (200, 100, 0) # 連線玩家 3 蛇頭顏色
+PINK = (255, 100, 200) # 連線玩家 4 蛇身體顏色
+DARK_PINK = (200, 50, 150) # 連線玩家 4 蛇頭顏色
 CHECKERBOARD_COLOR_1 = (20, 20, 30) # 棋盤格背景顏色 1 (深)
 CHECKERBOARD_COLOR_2 = (25, 25, 35) # 棋盤格背景顏色 2 (稍淺)
 OVERLAY_COLOR = (0, 0, 20, 180) # 遊戲結束/暫停時的疊加層顏色 (深藍半透明)
@@ -40,6 +44,8 @@ FONTS_DIR = os.path.join(ASSETS_DIR, "fonts") # 字體目錄
 IMAGES_DIR = os.path.join(ASSETS_DIR, "images") # 圖片總目錄
 FOOD_IMAGE_DIR = os.path.join(IMAGES_DIR, "food") # 食物圖片目錄
 SOUNDS_DIR = os.path.join(ASSETS_DIR, "sounds") # 音效目錄
+ASSET_ARCHIVE_PATH = os.path.join(GAME_DIR, "assets.pak") # 建置時打包的資源封存檔 (存在時優先使用)
+ICON_PATH = os.path.join(IMAGES_DIR, "icon.png") # 視窗圖示
 
 # --- 字體設定 ---
 FONT_NAME = "Cubic_11.ttf" # 字體檔案名稱
@@ -48,6 +54,7 @@ SCORE_FONT_SIZE = 36 # 分數文字大小
 GAME_OVER_FONT_SIZE = 72 # 遊戲結束標題文字大小
 MENU_TITLE_FONT_SIZE = 80 # 主選單標題文字大小
 MENU_BUTTON_FONT_SIZE = 45 # 主選單按鈕文字大小
+COUNTDOWN_FONT_SIZE = 150 # 倒數計時數字大小
 
 # --- 食物設定 ---
 # 預設食物圖片路徑 (如果特定類型未指定)
@@ -65,15 +72,42 @@ FOOD_PROBABILITIES = [item['probability'] for item in FOOD_TYPES]
 FOOD_TIMEOUT = 10000 # 食物存在時間 (毫秒)，超時會消失
 MAX_FOOD_SINGLE = 2 # 單人模式下畫面上的最大食物數量
 MAX_FOOD_MULTI = 5 # 多人/AI 模式下畫面上的最大食物數量
+FOOD_SPAWN_ATTEMPTS = 32 # 隨機挑選食物位置的嘗試次數，都被佔用時改從剩下的空格中挑選 (棋盤快滿時仍然很快)
 
 # --- 音效路徑設定 ---
 EATING_SOUND_PATH = os.path.join(SOUNDS_DIR, "eating.mp3") # 吃食物音效
 GAMEOVER_SOUND_PATH = os.path.join(SOUNDS_DIR, "gameover.mp3") # 遊戲結束音效
 SELECT_SOUND_PATH = os.path.join(SOUNDS_DIR, "select.mp3") # 選單選擇音效
+# 解碼後的音效快取目錄 (放在使用者的快取目錄，打包後的執行檔目錄可能是唯讀或暫存的)
+SOUND_CACHE_DIR = os.path.join(os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "snake", "sounds")
+SOUND_CHANNELS = 8 # 混音器的聲道總數
+SOUND_RESERVED_CHANNELS = ['gameover', 'select'] # 擁有專用聲道的音效 (依序使用第 0, 1, ... 個聲道)
+SOUND_MAX_VOICES = 3 # 一般音效同時播放的數量上限
 
 # --- 遊戲機制設定 ---
 SNAKE_SPEED = 10 # 遊戲速度 (幀率，數值越高蛇移動越快)
 
+# --- 連線模式設定 ---
+SERVER_HOST = "127.0.0.1" # 伺服器預設監聽/連線位址
+SERVER_PORT = 8765 # 伺服器預設埠號
+ROOM_CAPACITY = 2 # 每個房間的玩家數量 (滿員後開始遊戲)
+ROOM_RESTART_DELAY = 3000 # 遊戲結束後房間重新開始前的等待時間 (毫秒)
+MAX_ROOM_ID = 9999 # 客戶端可以指定的最大房間編號 (1 到 MAX_ROOM_ID)
+MAX_ROOMS = 256 # 伺服器同時存在的房間數上限 (每個房間都有自己的 Game，需要佔用 tick 時間)
+MAX_CLIENT_BUFFER = 64 * 1024 # 客戶端寫入緩衝上限 (位元組)，超過視為過慢而斷線
+MAX_ROLLBACK_TICKS = 8 # 客戶端最多領先伺服器確認狀態的 tick 數 (超過時暫停預測)
+INPUT_BUFFER_TICKS = 1 # 客戶端額外領先的 tick 數，讓輸入在伺服器模擬該 tick 前送達
+PING_INTERVAL = 1000 # 客戶端測量往返延遲的間隔 (毫秒)
+SPECTATOR_KEYFRAME_INTERVAL = 100 # 觀戰串流每隔多少 tick 插入一個關鍵幀 (供中途加入的觀眾與落後的觀眾重新同步)
+ARENA_SNAKES = 4 # 觀戰用電腦競技場房間中的 AI 蛇數量
+# 連線模式下各玩家的顏色配置 (身體顏色, 頭部顏色)，依玩家順序循環使用
+PLAYER_COLORS = [
+    (GREEN, DARK_GREEN),
+    (BLUE, DARK_BLUE),
+    (ORANGE, DARK_ORANGE),
+    (PINK, DARK_PINK)
+]
+
 # --- 玩家控制設定 ---
 # 玩家 1 的按鍵映射 (方向鍵)
 PLAYER1_CONTROLS = {
@@ -88,4 +122,65 @@ PLAYER2_CONTROLS = {
     pygame.K_s: (0, 1), # 下 (S)
     pygame.K_a: (-1, 0), # 左 (A)
     pygame.K_d: (1, 0) # 右 (D)
-} 
\ No newline at end of file
+} 
+# --- 機器學習設定 ---
+OBSERVATION_RADIUS = 5 # 以蛇頭為中心的觀測視窗半徑 (視窗大小為 2 * 半徑 + 1)
+ENV_MAX_STEPS = 1000 # 訓練環境每回合的最大步數 (超過時截斷)
+ENV_DEATH_PENALTY = -1.0 # 訓練環境中死亡的獎勵
+FOOD_TIMEOUT_TICKS = FOOD_TIMEOUT * SNAKE_SPEED // 1000 # 食物存在時間換算成 tick 數
+# 參數化電腦蛇的啟發式權重 (可由 train_ai.py 演化訓練後以 --ai-weights 載入)
+AI_HEURISTIC_WEIGHTS = {
+    'distance': 1.0, # 與最近的非毒藥食物的距離 (越近越好)
+    'space': 4.0, # 移動後可到達的空間比例 (越大越好，避免鑽進死路)
+    'poison': 3.0, # 移動後接近毒藥的程度 (越遠越好)
+    'opponent': 1.0 # 移動後接近其他蛇頭部的程度 (越遠越好，避免頭對頭相撞)
+}
+AI_SPACE_LIMIT = 48 # 計算可到達空間時最多搜尋的格子數 (限制每個 tick 的成本)
+# --- 自動駕駛設定 ---
+CYCLE_CACHE_DIR = os.path.join(os.path.dirname(SOUND_CACHE_DIR), "cycles") # 各棋盤大小的哈密頓迴路快取資料夾
+AUTOPILOT_SHORTCUT_LIMIT = 0.5 # 蛇的長度 (含尚未長出的部分) 超過棋盤格子數的這個比例後不再抄捷徑
+AUTOPILOT_SAFETY_MARGIN = 20 # 抄捷徑後，頭部到尾巴之間的空格扣掉尚未長出的長度，至少要保留的格子數
+# --- 比賽紀錄設定 ---
+HISTORY_DB_PATH = os.path.join(os.path.dirname(SOUND_CACHE_DIR), "history.sqlite3") # 比賽紀錄的 SQLite 資料庫
+HISTORY_BATCH_SIZE = 1000 # 背景執行緒每個交易最多寫入的紀錄數
+HISTORY_PAGE_SIZE = 10 # 歷史紀錄畫面每頁顯示的筆數
+HISTORY_MODE_NAMES = { # 歷史紀錄畫面可以切換的模式與顯示名稱
+    'single': "單人遊戲",
+    'multi': "雙人對戰",
+    'ai': "電腦對戰",
+    'online': "連線對戰",
+    'arena': "電腦競技場"
+}
+
+# --- 重播庫設定 ---
+REPLAY_LIBRARY_DIR = os.path.join(os.path.dirname(SOUND_CACHE_DIR), "library") # 重播庫的資料夾 (資料檔與索引檔)
+LIBRARY_MAX_SNAKES = 8 # 索引中每局記錄的蛇數量上限 (分數、死因、死亡位置)
+
+# --- 閒置節流設定 ---
+IDLE_DELAY = 2000 # 最後一次輸入之後多久 (毫秒) 進入閒置，閒置前仍以正常幀率更新 (讓按鈕的滑鼠效果流暢)
+IDLE_ANIMATION_FPS = 5 # 閒置時只有小動畫的畫面 (主選單的標題、暫停畫面閃爍的提示) 的重繪頻率
+IDLE_STATIC_TIMEOUT = 1000 # 靜止畫面 (暫停、遊戲結束、歷史紀錄) 每次等待輸入的上限 (毫秒)，逾時只檢查狀態，畫面沒變就不重繪
+IDLE_WAKE_EVENTS = (pygame.KEYDOWN, pygame.KEYUP, pygame.MOUSEMOTION, pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP, pygame.MOUSEWHEEL, pygame.VIDEORESIZE, pygame.QUIT) # 視為輸入、讓迴圈恢復正常幀率的事件
+
+# --- 管線模式設定 ---
+PIPELINE_RENDER_FPS = 30 # 管線模式下主執行緒處理輸入與檢查新快照的頻率 (沒有新快照時不重繪)
+
+# --- 競技場牆設定 ---
+WALL_BOARDS = 64 # 競技場牆同時進行的對戰數量
+WALL_CELL_SIZE = 5 # 競技場牆中每個格子的像素大小
+WALL_GAP = 2 # 棋盤之間的間隔 (像素)
+WALL_FPS = 30 # 競技場牆的畫面更新頻率 (各棋盤的 tick 平均分散在不同幀)
+WALL_RESTART_DELAY = 20 # 對戰結束後停留多少 tick 才重新開始
+
+# --- 倒帶設定 ---
+REWIND_BUFFER_BYTES = 4 * 1024 * 1024 # 倒帶紀錄的環狀緩衝區大小 (位元組)，空間不足時覆蓋最舊的紀錄
+REWIND_MAX_TICKS = 8192 # 最多保留的 tick 數 (2 的次方，以每秒 10 個 tick 約 13 分鐘)
+REWIND_KEYFRAME_INTERVAL = 50 # 每隔多少 tick 記錄一次完整的關鍵幀 (倒帶時最多需要套用的差量數)
+REWIND_KEY = pygame.K_BACKSPACE # 練習模式中按住倒帶的按鍵
+REWIND_STEPS_PER_FRAME = 2 # 按住倒帶鍵時每一幀倒退的 tick 數 (2 表示以兩倍速倒帶)
+
+# --- 存檔設定 ---
+SAVE_PATH = os.path.join(os.path.dirname(SOUND_CACHE_DIR), "savegame.bin") # 進行中遊戲的存檔 (只保留一份)
+SAVE_INTERVAL = 5000 # 遊戲進行中自動存檔的間隔 (毫秒)
+SAVE_KEY = pygame.K_F5 # 遊戲中立即存檔的按鍵
+SAVE_MESSAGE_DURATION = 1000 # 存檔後提示文字顯示的時間 (毫秒)
@@ -0,0 +1,238 @@
+import random
+import numpy as np
+from settings import *
+from game import Game
+from observation import BOARD_CHANNELS, OBS_OWN_BODY, OBS_OWN_HEAD, OBS_FOOD
+
+try:
+    import gymnasium # 選用：安裝時提供 action_space 與 observation_space
+except ImportError:
+    gymnasium = None
+
+# Gymnasium 風格的貪吃蛇環境 (reset / step)，供訓練取代 AISnake 的代理人使用
+# 動作是四個絕對方向的編號，與 AISnake 考慮移動的順序相同；不能直接掉頭 (掉頭時維持原方向)
+# 觀測與 Game.observation 的完整棋盤相同 (沒有牆壁通道)，環境只有一條蛇，因此「其他蛇」的通道永遠是 0
+
+DIRECTIONS = [(0, -1), (0, 1), (-1, 0), (1, 0)] # 動作編號對應的方向：上、下、左、右
+OPPOSITE = np.array([1, 0, 3, 2]) # 每個動作的反方向
+DIRECTION_X = np.array([dx for dx, _ in DIRECTIONS])
+DIRECTION_Y = np.array([dy for _, dy in DIRECTIONS])
+FOOD_SCORES = np.array([item['score'] for item in FOOD_TYPES]) # 各食物類型的分數
+FOOD_CUMULATIVE = np.cumsum(FOOD_PROBABILITIES) / sum(FOOD_PROBABILITIES) # 抽選食物類型用的累積機率
+SPAWN_ATTEMPTS = 64 # 隨機挑選食物位置的嘗試次數，之後改用第一個空格子
+
+# 建立環境的動作與觀測空間 (沒有安裝 gymnasium 時為 None)
+def _spaces(shape):
+    """建立空間"""
+    if gymnasium is None:
+        return None, None
+    return gymnasium.spaces.Discrete(len(DIRECTIONS)), gymnasium.spaces.Box(0, 255, shape, dtype=np.uint8)
+
+# 單一環境：直接使用 Game 的單人模式邏輯
+class SnakeEnv:
+    def __init__(self, max_steps=ENV_MAX_STEPS):
+        self.game = Game(None, None, None) # 無畫面的遊戲邏輯
+        self.max_steps = max_steps # 每回合的最大步數 (超過時截斷)
+        self.steps = 0 # 本回合已走的步數
+        self.action_space, self.observation_space = _spaces((BOARD_CHANNELS, GRID_HEIGHT, GRID_WIDTH))
+
+    # 開始新的一回合，回傳 (觀測, 資訊)
+    def reset(self, seed=None, options=None):
+        """重置環境"""
+        if seed is not None:
+            random.seed(seed) # Game 使用 random 模組決定食物
+        self.game.reset_game("single")
+        self.game.game_active = True
+        self.steps = 0
+        return self.game.observation(0), {}
+
+    # 執行一個動作，回傳 (觀測, 獎勵, 是否結束, 是否截斷, 資訊)
+    def step(self, action):
+        """執行動作"""
+        snake = self.game.snakes[0]
+        score = snake.score
+        snake.turn(DIRECTIONS[action])
+        self.game.update()
+        self.steps += 1
+        terminated = not self.game.game_active
+        reward = ENV_DEATH_PENALTY if terminated else snake.score - score
+        truncated = not terminated and self.steps >= self.max_steps
+        return self.game.observation(0), float(reward), terminated, truncated, {'score': snake.score}
+
+# 向量化環境：以 NumPy 陣列同時推進 N 個獨立的單人遊戲，規則與 Game 的單人模式相同
+# 每個環境的蛇身存在環狀緩衝區中，每一步只寫入新的頭部與移除的尾巴，觀測陣列就地更新
+# 結束或截斷的環境會在同一步自動重置，回傳的觀測是新回合的第一個觀測
+# 每個環境有自己的亂數序列 (splitmix64)，結果與同時執行的環境數量無關
+class VectorSnakeEnv:
+    def __init__(self, num_envs, max_steps=ENV_MAX_STEPS, width=GRID_WIDTH, height=GRID_HEIGHT, food_count=MAX_FOOD_SINGLE):
+        self.num_envs = num_envs # 環境數量
+        self.max_steps = max_steps # 每回合的最大步數
+        self.width = width # 棋盤寬度
+        self.height = height # 棋盤高度
+        self.cells = width * height # 格子總數
+        self.capacity = self.cells + 1 # 蛇身環狀緩衝區的大小
+        self.food_count = food_count # 每個環境的食物數量
+        self.start_cell = (height // 2) * width + width // 4 # 起始位置 (與 Game 單人模式相同)
+        self.index = np.arange(num_envs) # 環境編號
+        self.planes = np.zeros((num_envs, BOARD_CHANNELS, height, width), dtype=np.uint8) # 觀測 [環境, 通道, y, x]
+        self.flat = self.planes.reshape(num_envs, BOARD_CHANNELS, self.cells) # 以格子編號存取的同一份陣列
+        self.observation = self.planes.view() # 回傳給呼叫端的唯讀視圖
+        self.observation.flags.writeable = False
+        self.body = np.zeros((num_envs, self.capacity), dtype=np.int64) # 蛇身環狀緩衝區 (格子編號)
+        self.head_index = np.zeros(num_envs, dtype=np.int64) # 頭部在環狀緩衝區中的位置 (只增不減)
+        self.head = np.zeros(num_envs, dtype=np.int64) # 頭部格子
+        self.count = np.zeros(num_envs, dtype=np.int64) # 蛇身目前的格數
+        self.length = np.zeros(num_envs, dtype=np.int64) # 蛇的目標長度
+        self.direction = np.zeros(num_envs, dtype=np.int64) # 目前方向 (動作編號)
+        self.score = np.zeros(num_envs, dtype=np.int64) # 分數
+        self.steps = np.zeros(num_envs, dtype=np.int64) # 本回合已走的步數
+        self.food_cell = np.full((num_envs, food_count), -1, dtype=np.int64) # 食物格子
+        self.food_type = np.zeros((num_envs, food_count), dtype=np.int64) # 食物類型
+        self.food_tick = np.zeros((num_envs, food_count), dtype=np.int64) # 食物出現時的步數
+        self.rng_state = np.zeros(num_envs, dtype=np.uint64) # 每個環境的亂數狀態
+        self.action_space, self.observation_space = _spaces((BOARD_CHANNELS, height, width))
+
+    # 產生指定環境的下一個 64 位元亂數 (splitmix64)
+    def _random(self, envs):
+        """產生亂數"""
+        state = self.rng_state[envs] + np.uint64(0x9E3779B97F4A7C15)
+        self.rng_state[envs] = state
+        state = (state ^ (state >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        state = (state ^ (state >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return state ^ (state >> np.uint64(31))
+
+    # 開始新的一回合；seed 可以是整數 (第 i 個環境使用 seed + i) 或每個環境各自的種子
+    def reset(self, seed=None, options=None):
+        """重置所有環境"""
+        if seed is None:
+            seeds = np.random.SeedSequence().generate_state(self.num_envs, dtype=np.uint64)
+        elif np.ndim(seed) == 0:
+            seeds = np.uint64(seed) + np.arange(self.num_envs, dtype=np.uint64)
+        else:
+            seeds = np.asarray(seed, dtype=np.uint64)
+        self.rng_state[:] = seeds
+        self._reset_envs(self.index)
+        return self.observation, {}
+
+    # 重置指定的環境
+    def _reset_envs(self, envs):
+        """重置環境"""
+        self.planes[envs] = 0
+        start = self.start_cell
+        self.body[envs, 0] = start
+        self.head_index[envs] = 0
+        self.head[envs] = start
+        self.count[envs] = 1
+        self.length[envs] = 1
+        self.direction[envs] = 3 # 向右
+        self.score[envs] = 0
+        self.steps[envs] = 0
+        self.flat[envs, OBS_OWN_BODY, start] = 1
+        self.flat[envs, OBS_OWN_HEAD, start] = 1
+        self.food_cell[envs] = -1
+        for slot in range(self.food_count):
+            self._spawn_food(envs, slot)
+
+    # 在隨機的空格子生成食物 (不在蛇身上，也不與其他食物重疊)
+    def _spawn_food(self, envs, slot):
+        """生成食物"""
+        pending = envs
+        for _ in range(SPAWN_ATTEMPTS):
+            if not len(pending):
+                break
+            cells = (self._random(pending) % np.uint64(self.cells)).astype(np.int64)
+            free = (self.flat[pending, OBS_OWN_BODY, cells] == 0) & ~(self.food_cell[pending] == cells[:, None]).any(axis=1)
+            self._place_food(pending[free], slot, cells[free])
+            pending = pending[~free]
+        for env in pending:
+            # 棋盤幾乎被佔滿時隨機嘗試可能一直失敗，改用第一個空格子
+            free = self.flat[env, OBS_OWN_BODY] == 0
+            free[self.food_cell[env][self.food_cell[env] >= 0]] = False
+            if free.any():
+                self._place_food(np.array([env]), slot, np.array([np.argmax(free)]))
+
+    # 把食物放到指定格子，類型依 FOOD_TYPES 的機率抽選
+    def _place_food(self, envs, slot, cells):
+        """放置食物"""
+        if not len(envs):
+            return
+        uniform = (self._random(envs) >> np.uint64(11)).astype(np.float64) * (1.0 / (1 << 53))
+        types = np.minimum(np.searchsorted(FOOD_CUMULATIVE, uniform, side='right'), len(FOOD_TYPES) - 1)
+        self.food_cell[envs, slot] = cells
+        self.food_type[envs, slot] = types
+        self.food_tick[envs, slot] = self.steps[envs]
+        self.flat[envs, OBS_FOOD + types, cells] = 1
+
+    # 移除食物並在別處重新生成
+    def _replace_food(self, envs, slots):
+        """替換食物"""
+        self.flat[envs, OBS_FOOD + self.food_type[envs, slots], self.food_cell[envs, slots]] = 0
+        self.food_cell[envs, slots] = -1
+        for slot in range(self.food_count):
+            selected = envs[slots == slot]
+            if len(selected):
+                self._spawn_food(selected, slot)
+
+    # 移除指定環境的尾巴一格
+    def _pop_tail(self, envs):
+        """移除尾巴"""
+        tail = self.body[envs, (self.head_index[envs] - self.count[envs] + 1) % self.capacity]
+        self.flat[envs, OBS_OWN_BODY, tail] -= 1
+        self.count[envs] -= 1
+
+    # 所有環境同時執行一個動作，回傳 (觀測, 獎勵, 是否結束, 是否截斷, 資訊)
+    def step(self, actions):
+        """執行動作"""
+        actions = np.asarray(actions, dtype=np.int64)
+        index = self.index
+        # 轉向 (長度大於 1 時不能直接掉頭)
+        turn = (actions != OPPOSITE[self.direction]) | (self.length <= 1)
+        self.direction = np.where(turn, actions, self.direction)
+        # 計算新的頭部，撞牆或撞到自己 (移進即將離開的尾巴除外) 就死亡
+        x = self.head % self.width + DIRECTION_X[self.direction]
+        y = self.head // self.width + DIRECTION_Y[self.direction]
+        inside = (x >= 0) & (x < self.width) & (y >= 0) & (y < self.height)
+        cells = np.where(inside, y * self.width + x, 0)
+        tail = self.body[index, (self.head_index - self.count + 1) % self.capacity]
+        hit = (self.flat[index, OBS_OWN_BODY, cells] > 0) & ~((cells == tail) & (self.count > 2))
+        dead = ~inside | hit
+        alive = np.flatnonzero(~dead)
+        cells = cells[alive]
+        # 移動：寫入新的頭部，超過目標長度時移除尾巴
+        self.flat[alive, OBS_OWN_HEAD, self.head[alive]] = 0
+        self.head_index[alive] += 1
+        self.body[alive, self.head_index[alive] % self.capacity] = cells
+        self.head[alive] = cells
+        self.flat[alive, OBS_OWN_BODY, cells] += 1
+        self.flat[alive, OBS_OWN_HEAD, cells] = 1
+        self.count[alive] += 1
+        self._pop_tail(alive[self.count[alive] > self.length[alive]])
+        self.steps += 1
+        # 吃食物：加分與變長，毒藥扣分並縮短 (至少保留 1 格)
+        score = self.score.copy()
+        rows, slots = np.nonzero(self.food_cell[alive] == cells[:, None])
+        if len(rows):
+            eaters = alive[rows]
+            points = FOOD_SCORES[self.food_type[eaters, slots]]
+            self.score[eaters] = np.maximum(0, self.score[eaters] + points)
+            self.length[eaters] += np.where(points > 0, points, -np.minimum(-points, self.length[eaters] - 1))
+            shrinking = eaters[self.count[eaters] > self.length[eaters]]
+            while len(shrinking):
+                self._pop_tail(shrinking)
+                shrinking = shrinking[self.count[shrinking] > self.length[shrinking]]
+            self._replace_food(eaters, slots)
+        # 超時的食物消失並在別處重新生成
+        rows, slots = np.nonzero(self.food_tick[alive] + FOOD_TIMEOUT_TICKS <= self.steps[alive, None])
+        if len(rows):
+            self._replace_food(alive[rows], slots)
+        reward = (self.score - score).astype(np.float32)
+        reward[dead] = ENV_DEATH_PENALTY
+        terminated = dead
+        truncated = ~dead & (self.steps >= self.max_steps)
+        info = {}
+        done = np.flatnonzero(terminated | truncated)
+        if len(done):
+            # 回傳結束回合的結果後自動重置
+            info = {'done': done, 'final_score': self.score[done], 'final_steps': self.steps[done]}
+            self._reset_envs(done)
+        return self.observation, reward, terminated, truncated, info
@@ -0,0 +1,276 @@
+import struct
+import socket
+import threading
+import queue
+from settings import *
+from protocol import encode_message, apply_keyframe, apply_delta
+
+# 觀戰串流：把 protocol 的關鍵幀/差量訊息壓成精簡的二進位幀
+# 每一幀前面加上 2 位元組長度，觀眾端依序讀取並套用到本地 Game
+
+FRAME_KEY = 0 # 關鍵幀
+FRAME_DIFF = 1 # 差量幀
+NO_HEAD = 0xFFFF # 差量中「蛇頭沒有移動」的標記
+MODES = ["single", "multi", "ai", "online", "arena"] # 模式名稱與編號的對照
+
+# 差量幀中各區段是否存在的旗標
+HAS_SNAKES = 1
+HAS_FOOD_ADDED = 2
+HAS_FOOD_REMOVED = 4
+HAS_INPUTS = 8
+HAS_WINNER = 16
+
+HEADER = struct.Struct('<BI') # 幀類型, tick
+LENGTH = struct.Struct('<H') # 幀長度前綴
+KEY_INFO = struct.Struct('<BBB') # 模式, 是否進行中, 蛇數量
+KEY_SNAKE = struct.Struct('<BBbbiBHH') # 玩家 ID, 顏色, 方向 x, 方向 y, 分數, 是否死亡, 目標長度, 身體格數
+DIFF_SNAKE = struct.Struct('<BHBiBH') # 蛇索引, 新頭部格子, 移除的尾巴數, 分數, 是否死亡, 目標長度
+FOOD = struct.Struct('<HB') # 格子, 食物類型
+CELL = struct.Struct('<H') # 格子
+INPUT = struct.Struct('<Bbb') # 蛇索引, 方向 x, 方向 y
+COUNT = struct.Struct('<B') # 數量
+WINNER = struct.Struct('<BH') # 是否進行中, 訊息位元組長度
+
+# 將字串編碼成長度前綴的 UTF-8 位元組
+def _pack_text(active, text):
+    """編碼結束訊息"""
+    data = text.encode('utf-8')
+    return WINNER.pack(active, len(data)) + data
+
+# 將關鍵幀或差量訊息編碼成二進位幀 (含長度前綴)
+def pack_frame(message):
+    """編碼二進位幀"""
+    if message['t'] == 'key':
+        parts = [HEADER.pack(FRAME_KEY, message['k']), KEY_INFO.pack(MODES.index(message['m']), message['a'], len(message['s']))]
+        for player_id, cells, direction, score, dead, length, color_index in message['s']:
+            parts.append(KEY_SNAKE.pack(player_id, color_index, direction[0], direction[1], score, dead, length, len(cells)))
+            parts.append(struct.pack(f'<{len(cells)}H', *cells))
+        parts.append(COUNT.pack(len(message['f'])))
+        parts.extend(FOOD.pack(cell, type_id) for cell, type_id in message['f'])
+        parts.append(_pack_text(message['a'], message['w']))
+    else:
+        flags = 0
+        sections = []
+        if 's' in message:
+            flags |= HAS_SNAKES
+            sections.append(COUNT.pack(len(message['s'])))
+            for index, head_cell, removed, score, dead, length in message['s']:
+                sections.append(DIFF_SNAKE.pack(index, NO_HEAD if head_cell < 0 else head_cell, removed, score, dead, length))
+        if 'f+' in message:
+            flags |= HAS_FOOD_ADDED
+            sections.append(COUNT.pack(len(message['f+'])))
+            sections.extend(FOOD.pack(cell, type_id) for cell, type_id in message['f+'])
+        if 'f-' in message:
+            flags |= HAS_FOOD_REMOVED
+            sections.append(COUNT.pack(len(message['f-'])))
+            sections.extend(CELL.pack(cell) for cell in message['f-'])
+        if 'i' in message:
+            flags |= HAS_INPUTS
+            sections.append(COUNT.pack(len(message['i'])))
+            sections.extend(INPUT.pack(index, dx, dy) for index, dx, dy in message['i'])
+        if 'w' in message:
+            flags |= HAS_WINNER
+            sections.append(_pack_text(message['a'], message['w']))
+        parts = [HEADER.pack(FRAME_DIFF, message['k']), COUNT.pack(flags)] + sections
+    body = b''.join(parts)
+    return LENGTH.pack(len(body)) + body
+
+# 將一個二進位幀 (不含長度前綴) 還原成與 protocol 相同格式的訊息字典
+def unpack_frame(body):
+    """解碼二進位幀"""
+    kind, tick = HEADER.unpack_from(body, 0)
+    offset = HEADER.size
+    if kind == FRAME_KEY:
+        mode_index, active, snake_count = KEY_INFO.unpack_from(body, offset)
+        offset += KEY_INFO.size
+        snakes = []
+        for _ in range(snake_count):
+            player_id, color_index, dx, dy, score, dead, length, cell_count = KEY_SNAKE.unpack_from(body, offset)
+            offset += KEY_SNAKE.size
+            cells = list(struct.unpack_from(f'<{cell_count}H', body, offset))
+            offset += cell_count * CELL.size
+            snakes.append([player_id, cells, [dx, dy], score, dead, length, color_index])
+        (food_count,) = COUNT.unpack_from(body, offset)
+        offset += COUNT.size
+        foods = []
+        for _ in range(food_count):
+            foods.append(list(FOOD.unpack_from(body, offset)))
+            offset += FOOD.size
+        active, text_length = WINNER.unpack_from(body, offset)
+        offset += WINNER.size
+        winner = body[offset:offset + text_length].decode('utf-8')
+        return {'t': 'key', 'k': tick, 'm': MODES[mode_index], 's': snakes, 'f': foods, 'a': active, 'w': winner}
+    message = {'t': 'd', 'k': tick}
+    (flags,) = COUNT.unpack_from(body, offset)
+    offset += COUNT.size
+    if flags & HAS_SNAKES:
+        (count,) = COUNT.unpack_from(body, offset)
+        offset += COUNT.size
+        changes = []
+        for _ in range(count):
+            index, head_cell, removed, score, dead, length = DIFF_SNAKE.unpack_from(body, offset)
+            offset += DIFF_SNAKE.size
+            changes.append([index, -1 if head_cell == NO_HEAD else head_cell, removed, score, dead, length])
+        message['s'] = changes
+    if flags & HAS_FOOD_ADDED:
+        (count,) = COUNT.unpack_from(body, offset)
+        offset += COUNT.size
+        message['f+'] = [list(FOOD.unpack_from(body, offset + i * FOOD.size)) for i in range(count)]
+        offset += count * FOOD.size
+    if flags & HAS_FOOD_REMOVED:
+        (count,) = COUNT.unpack_from(body, offset)
+        offset += COUNT.size
+        message['f-'] = list(struct.unpack_from(f'<{count}H', body, offset))
+        offset += count * CELL.size
+    if flags & HAS_INPUTS:
+        (count,) = COUNT.unpack_from(body, offset)
+        offset += COUNT.size
+        message['i'] = [list(INPUT.unpack_from(body, offset + i * INPUT.size)) for i in range(count)]
+        offset += count * INPUT.size
+    if flags & HAS_WINNER:
+        active, text_length = WINNER.unpack_from(body, offset)
+        offset += WINNER.size
+        message['a'] = active
+        message['w'] = body[offset:offset + text_length].decode('utf-8')
+    return message
+
+# 判斷一個已編碼的幀是否為關鍵幀
+def is_keyframe(frame):
+    """是否為關鍵幀"""
+    return frame[LENGTH.size] == FRAME_KEY
+
+# 觀戰串流的分送中心：每個 tick 只編碼一次，同一份位元組送給所有觀眾
+# 保留最近的關鍵幀與之後的差量，讓中途加入的觀眾可以立即同步
+class SpectatorStream:
+    def __init__(self, keyframe_interval=SPECTATOR_KEYFRAME_INTERVAL):
+        self.keyframe_interval = keyframe_interval # 關鍵幀間隔 (tick)
+        self.viewers = [] # 所有觀眾 (需要提供 deliver(frame, keyframe) 方法)
+        self.keyframe = None # 最近一個關鍵幀
+        self.backlog = [] # 最近關鍵幀之後的所有差量幀
+        self.frames = 0 # 已編碼的幀數
+        self.bytes = 0 # 已編碼的總位元組數 (與觀眾數量無關)
+
+    # 是否該插入新的關鍵幀
+    def needs_keyframe(self):
+        """是否需要關鍵幀"""
+        return self.keyframe is None or len(self.backlog) >= self.keyframe_interval - 1
+
+    # 編碼一則訊息並送給所有觀眾
+    def publish(self, message):
+        """發佈訊息"""
+        frame = pack_frame(message)
+        self.frames += 1
+        self.bytes += len(frame)
+        keyframe = message['t'] == 'key'
+        if keyframe:
+            self.keyframe = frame
+            self.backlog = []
+        else:
+            self.backlog.append(frame)
+        for viewer in self.viewers:
+            viewer.deliver(frame, keyframe)
+        return frame
+
+    # 由遊戲狀態產生這個 tick 的幀：依間隔插入關鍵幀，否則發佈差量
+    def publish_tick(self, game, tracker, delta):
+        """發佈一個 tick"""
+        if self.needs_keyframe():
+            return self.publish(tracker.keyframe(game)) # 關鍵幀與差量屬於同一個 tick，取代該差量
+        return self.publish(delta)
+
+    # 加入觀眾，先送出最近的關鍵幀與之後的差量
+    def add_viewer(self, viewer):
+        """加入觀眾"""
+        self.viewers.append(viewer)
+        if self.keyframe is not None:
+            viewer.deliver(b''.join([self.keyframe] + self.backlog), True)
+
+    # 移除觀眾
+    def remove_viewer(self, viewer):
+        """移除觀眾"""
+        if viewer in self.viewers:
+            self.viewers.remove(viewer)
+
+# 從位元組串流中逐幀解碼並套用到本地 Game
+class SpectatorDecoder:
+    def __init__(self, game):
+        self.game = game # 套用狀態的 Game
+        self.buffer = bytearray() # 尚未湊成完整幀的資料
+        self.has_state = False # 是否已收到關鍵幀
+        self.tick = 0 # 最近套用的 tick
+
+    # 餵入收到的位元組，回傳本次套用的幀數
+    def feed(self, data):
+        """餵入資料"""
+        self.buffer += data
+        applied = 0
+        offset = 0
+        while len(self.buffer) - offset >= LENGTH.size:
+            (length,) = LENGTH.unpack_from(self.buffer, offset)
+            end = offset + LENGTH.size + length
+            if len(self.buffer) < end:
+                break
+            self.apply(unpack_frame(bytes(self.buffer[offset + LENGTH.size:end])))
+            applied += 1
+            offset = end
+        del self.buffer[:offset]
+        return applied
+
+    # 套用一則已解碼的訊息；收到第一個關鍵幀之前的差量會被略過
+    def apply(self, message):
+        """套用訊息"""
+        if message['t'] == 'key':
+            apply_keyframe(self.game, message)
+            self.has_state = True
+        elif self.has_state:
+            apply_delta(self.game, message)
+        self.tick = message['k']
+
+# 觀眾端的連線：背景執行緒接收二進位幀，主迴圈每幀套用到本地 Game
+class SpectatorClient:
+    def __init__(self, game, host=SERVER_HOST, port=SERVER_PORT, room=None):
+        self.sock = socket.create_connection((host, port))
+        self.sock.sendall(encode_message({'t': 'watch', 'room': room})) # 請求觀戰，之後伺服器改送二進位幀
+        self.decoder = SpectatorDecoder(game)
+        self.chunks = queue.Queue() # 背景執行緒收到的資料
+        self.connected = True
+        threading.Thread(target=self._receive_loop, daemon=True).start()
+
+    # 是否已收到關鍵幀
+    @property
+    def has_state(self):
+        """是否已有狀態"""
+        return self.decoder.has_state
+
+    # 背景執行緒：持續讀取資料
+    def _receive_loop(self):
+        """接收迴圈"""
+        try:
+            while True:
+                data = self.sock.recv(65536)
+                if not data:
+                    break
+                self.chunks.put(data)
+        except OSError:
+            pass
+        self.connected = False
+
+    # 套用目前收到的所有資料
+    def sync(self):
+        """同步狀態"""
+        applied = 0
+        while True:
+            try:
+                applied += self.decoder.feed(self.chunks.get_nowait())
+            except queue.Empty:
+                return applied
+
+    # 關閉連線
+    def close(self):
+        """關閉連線"""
+        self.connected = False
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+            self.sock.close()
+        except OSError:
+            pass
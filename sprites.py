@@ -0,0 +1,94 @@
+import pygame
+from settings import *
+
+DEAD_COLOR = (100, 100, 100) # 死亡的蛇使用的灰色
+MAX_CACHED_PALETTES = 64 # 每組顏色最多保留的長度調色盤數量
+SPRITE_COLORKEY = (255, 0, 255) # 圖塊中代表透明的顏色 (蛇的顏色不會用到)
+
+# 計算漸變中第 index 節的顏色 (與原本逐節計算的公式相同，顏色從 start_color 漸變到 end_color)
+def gradient_color(start_color, end_color, index, count):
+    """計算漸變顏色"""
+    intensity = min(1.0, index / max(1, count - 1) * 1.2) # 漸變強度 (從 0 到約 1.2，超過 1 以 1 計)
+    return tuple(int(start + (end - start) * intensity) for start, end in zip(start_color, end_color))
+
+# 繪製一個邊長為 size 的圓角格子 (可選擇加上朝向 direction 的眼睛)
+def render_segment(color, direction=None, size=GRID_SIZE):
+    """繪製格子"""
+    # 以色鍵表示透明的圓角外側 (圓角沒有半透明的邊緣)，色鍵圖塊的繪製比逐像素透明快得多
+    sprite = pygame.Surface((size, size))
+    sprite.fill(SPRITE_COLORKEY)
+    sprite.set_colorkey(SPRITE_COLORKEY, pygame.RLEACCEL)
+    pygame.draw.rect(sprite, color, (1, 1, size - 2, size - 2), border_radius=min(8, size // 6))
+    if direction is not None:
+        eye_size = max(4 if size >= GRID_SIZE else 1, size // 10) # 縮小的格子 (例如競技場牆) 眼睛只剩一兩個像素
+        near = size // 4 # 靠近邊緣的眼睛位置
+        far = size - near - eye_size # 另一側的眼睛位置
+        dx, dy = direction
+        if dx == 0:
+            y = near if dy == -1 else far
+            eyes = ((near, y), (far, y))
+        else:
+            x = near if dx == -1 else far
+            eyes = ((x, near), (x, far))
+        for eye in eyes:
+            pygame.draw.rect(sprite, BLACK, (*eye, eye_size, eye_size))
+    return sprite
+
+# 一組顏色的蛇圖塊集：預先繪製的圓角格子 (依顏色快取)、四個方向的頭部，以及各長度的漸變調色盤
+# 繪製時只需查表取得每一節的圖塊，再以 Surface.blits 一次批次繪製
+class SnakeSprites:
+    def __init__(self, start_color, end_color, size=GRID_SIZE):
+        self.start_color = start_color # 漸變起始顏色
+        self.end_color = end_color # 漸變結束顏色
+        self.size = size # 圖塊邊長 (像素)
+        self.segments = {} # 已繪製的身體格子 {顏色: Surface}
+        self.heads = {} # 已繪製的頭部 {(顏色, 方向): Surface}
+        self.palettes = {} # 各長度的調色盤 {長度: [Surface, ...]}
+
+    # 取得指定顏色的身體格子
+    def segment(self, color):
+        """取得身體格子"""
+        sprite = self.segments.get(color)
+        if sprite is None:
+            sprite = self.segments[color] = render_segment(color, size=self.size)
+        return sprite
+
+    # 取得指定顏色與朝向的頭部
+    def head(self, color, direction):
+        """取得頭部"""
+        key = (color, direction)
+        sprite = self.heads.get(key)
+        if sprite is None:
+            sprite = self.heads[key] = render_segment(color, direction, self.size)
+        return sprite
+
+    # 取得長度為 count 的蛇每一節使用的圖塊 (第 index 個對應漸變的第 index 節)
+    def palette(self, count):
+        """取得調色盤"""
+        palette = self.palettes.get(count)
+        if palette is None:
+            if len(self.palettes) >= MAX_CACHED_PALETTES:
+                self.palettes.clear() # 長度不斷變化時避免無限累積
+            palette = self.palettes[count] = [self.segment(gradient_color(self.start_color, self.end_color, i, count)) for i in range(count)]
+        return palette
+
+    # 取得長度為 count 的蛇第 index 節的顏色
+    def color(self, index, count):
+        """取得顏色"""
+        return gradient_color(self.start_color, self.end_color, index, count)
+
+_sprite_sets = {} # 共用的圖塊集 {(起始顏色, 結束顏色, 邊長): SnakeSprites}
+
+# 取得一組顏色與大小的圖塊集 (相同顏色與大小的蛇共用)
+def get_snake_sprites(start_color, end_color, size=GRID_SIZE):
+    """取得圖塊集"""
+    key = (start_color, end_color, size)
+    sprites = _sprite_sets.get(key)
+    if sprites is None:
+        sprites = _sprite_sets[key] = SnakeSprites(start_color, end_color, size)
+    return sprites
+
+# 取得死亡的蛇使用的灰色格子
+def get_dead_segment(size=GRID_SIZE):
+    """取得死亡格子"""
+    return get_snake_sprites(DEAD_COLOR, DEAD_COLOR, size).segment(DEAD_COLOR)
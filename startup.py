@@ -0,0 +1,25 @@
+import time
+
+# 啟動計時：記錄程式啟動後各個階段完成的時間，用於找出拖慢第一幀的步驟
+class StartupTimer:
+    def __init__(self):
+        self.start = time.perf_counter() # 計時起點 (模組載入時)
+        self.marks = [] # 已記錄的 (階段名稱, 距離起點的秒數)
+
+    # 記錄一個階段完成的時間
+    def mark(self, name):
+        """記錄階段"""
+        self.marks.append((name, time.perf_counter() - self.start))
+
+    # 產生各階段耗時的報告文字
+    def report(self):
+        """產生報告"""
+        lines = ["啟動時間報告:"]
+        previous = 0.0
+        for name, elapsed in self.marks:
+            lines.append(f"  {name:<16} {elapsed * 1000:8.1f} 毫秒 (+{(elapsed - previous) * 1000:.1f})")
+            previous = elapsed
+        return "\n".join(lines)
+
+# 全域共用的啟動計時器 (越早匯入越準確)
+timer = StartupTimer()
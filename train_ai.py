@@ -0,0 +1,199 @@
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import time
+from settings import *
+from game import Game
+from objects import HeuristicAISnake
+
+# 以演化演算法訓練參數化電腦蛇 (HeuristicAISnake) 的啟發式權重
+# 每個候選權重在無畫面的電腦競技場中與原本的簡單 AI 對戰數局，以平均成績作為適應度
+# 一個世代的所有候選平行分配到行程池評估，同一世代使用相同的亂數種子，讓比較只反映權重的差異
+# 每個世代結束時寫入檢查點 (JSON)，中斷後可以用 --resume 從最後一個世代繼續
+#
+# 權重檔 (JSON) 的內容與 AI_HEURISTIC_WEIGHTS 相同：{'distance': ..., 'space': ..., 'poison': ..., 'opponent': ...}
+
+CHECKPOINT_VERSION = 1 # 檢查點格式版本
+WEIGHT_NAMES = sorted(AI_HEURISTIC_WEIGHTS) # 權重的固定順序 (基因的排列)
+SURVIVAL_BONUS = 5.0 # 存活到回合上限時額外加的適應度 (依存活比例計算)
+ELITE_COUNT = 2 # 直接保留到下一代的最佳候選數量
+TOURNAMENT_SIZE = 3 # 選擇親代時每次比較的候選數量
+
+# 讀取權重檔
+def load_weights(path):
+    """載入啟發式權重"""
+    with open(path, encoding="utf-8") as f:
+        weights = json.load(f)
+    unknown = set(weights) - set(AI_HEURISTIC_WEIGHTS)
+    if unknown:
+        raise ValueError(f"不支援的權重名稱: {', '.join(sorted(unknown))}")
+    return {name: float(value) for name, value in weights.items()}
+
+# 寫入 JSON 檔：先寫到暫存檔再取代，中斷時不會留下寫到一半的檔案
+def _write_json(path, data):
+    """寫入 JSON 檔"""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    os.replace(temp_path, path)
+
+# 進行一局無畫面的對戰：第一條蛇使用候選權重，其他蛇使用原本的簡單 AI，回傳候選的適應度
+# 食物的超時以遊戲的 tick 計算 (與畫面和實際時間無關)，每局的結果只取決於亂數種子
+def play_match(weights, seed, snakes=ARENA_SNAKES, max_ticks=ENV_MAX_STEPS):
+    """進行一局對戰"""
+    random.seed(seed)
+    game = Game(None, None, None)
+    game.reset_game(mode="arena", player_count=snakes)
+    first = game.snakes[0]
+    candidate = game.snakes[0] = HeuristicAISnake(first.player_id, first.get_head_position(), first.direction, (first.body_color, first.head_color), weights)
+    game.game_active = True
+    ticks = 0
+    while game.game_active and not candidate.is_dead and ticks < max_ticks:
+        game.update()
+        ticks += 1
+    return candidate.score + SURVIVAL_BONUS * ticks / max_ticks
+
+# 評估一個候選：在每個種子各進行一局，回傳平均適應度 (在行程池的工作行程中執行)
+def evaluate(task):
+    """評估候選權重"""
+    weights, seeds, snakes, max_ticks = task
+    return sum(play_match(weights, seed, snakes, max_ticks) for seed in seeds) / len(seeds)
+
+# 演化訓練器：保存族群與亂數狀態，可以寫入與還原檢查點
+class Trainer:
+    def __init__(self, population_size=24, games=8, sigma=0.5, snakes=ARENA_SNAKES, max_ticks=ENV_MAX_STEPS, seed=0):
+        self.population_size = population_size # 每個世代的候選數量
+        self.games = games # 每個候選每個世代進行的局數
+        self.sigma = sigma # 突變的標準差 (相對於權重大小)
+        self.snakes = snakes # 每局的蛇數量 (含候選)
+        self.max_ticks = max_ticks # 每局的 tick 上限
+        self.seed = seed # 訓練的亂數種子 (也決定每個世代對戰的種子)
+        self.rng = random.Random(seed) # 選擇、交配與突變使用的亂數產生器
+        self.generation = 0 # 已完成的世代數
+        self.population = [dict(AI_HEURISTIC_WEIGHTS)] # 目前的族群 (第一個是預設權重)
+        while len(self.population) < population_size:
+            self.population.append(self.mutate(AI_HEURISTIC_WEIGHTS, 1.0))
+        self.best = dict(AI_HEURISTIC_WEIGHTS) # 目前找到的最佳權重
+        self.best_fitness = None # 最佳權重的適應度
+        self.history = [] # 每個世代的紀錄
+
+    # 寫入檢查點
+    def save(self, path):
+        """儲存檢查點"""
+        _write_json(path, {
+            'version': CHECKPOINT_VERSION,
+            'settings': {'population_size': self.population_size, 'games': self.games, 'sigma': self.sigma,
+                         'snakes': self.snakes, 'max_ticks': self.max_ticks, 'seed': self.seed},
+            'generation': self.generation,
+            'population': self.population,
+            'best': self.best,
+            'best_fitness': self.best_fitness,
+            'history': self.history,
+            'rng': self.rng.getstate()
+        })
+
+    # 從檢查點還原訓練器
+    @classmethod
+    def load(cls, path):
+        """載入檢查點"""
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get('version') != CHECKPOINT_VERSION:
+            raise ValueError(f"不支援的檢查點版本: {path}")
+        trainer = cls(**data['settings'])
+        trainer.generation = data['generation']
+        trainer.population = data['population']
+        trainer.best = data['best']
+        trainer.best_fitness = data['best_fitness']
+        trainer.history = data['history']
+        version, state, gauss = data['rng']
+        trainer.rng.setstate((version, tuple(state), gauss)) # JSON 把 tuple 存成 list，還原時轉回
+        return trainer
+
+    # 產生突變的權重：每個權重加上與其大小成比例的常態雜訊
+    def mutate(self, weights, scale=None):
+        """突變"""
+        sigma = self.sigma if scale is None else scale
+        return {name: round(value + self.rng.gauss(0, sigma * max(1.0, abs(value))), 4) for name, value in weights.items()}
+
+    # 錦標賽選擇：隨機取幾個候選，回傳其中適應度最高的
+    def select(self, ranked):
+        """選擇親代"""
+        return min(self.rng.sample(range(len(ranked)), TOURNAMENT_SIZE))
+
+    # 以上一代的排名產生下一代：保留菁英，其餘由兩個親代均勻交配後突變
+    def breed(self, ranked):
+        """產生下一代"""
+        population = [weights for weights, _ in ranked[:ELITE_COUNT]]
+        while len(population) < self.population_size:
+            first = ranked[self.select(ranked)][0]
+            second = ranked[self.select(ranked)][0]
+            child = {name: (first if self.rng.random() < 0.5 else second)[name] for name in WEIGHT_NAMES}
+            population.append(self.mutate(child))
+        return population
+
+    # 評估目前的世代並產生下一代，回傳這個世代的紀錄
+    def step(self, pool, workers):
+        """執行一個世代"""
+        seeds = [self.seed * 1000003 + self.generation * self.games + i for i in range(self.games)]
+        tasks = [(weights, seeds, self.snakes, self.max_ticks) for weights in self.population]
+        start = time.perf_counter()
+        fitness = pool.map(evaluate, tasks, chunksize=1) if pool else list(map(evaluate, tasks))
+        elapsed = time.perf_counter() - start
+        ranked = sorted(zip(self.population, fitness), key=lambda item: -item[1]) # 排序是穩定的，同分時保留原順序
+        if self.best_fitness is None or ranked[0][1] > self.best_fitness:
+            self.best, self.best_fitness = dict(ranked[0][0]), ranked[0][1]
+        games = len(tasks) * self.games
+        record = {
+            'generation': self.generation,
+            'best_fitness': ranked[0][1],
+            'mean_fitness': sum(fitness) / len(fitness),
+            'games': games,
+            'seconds': elapsed,
+            'games_per_core_second': games / elapsed / workers # 用來估算訓練需要的時間與核心數
+        }
+        self.history.append(record)
+        self.population = self.breed(ranked)
+        self.generation += 1
+        return record
+
+# 以命令列執行訓練
+def main():
+    parser = argparse.ArgumentParser(description="以演化演算法訓練電腦蛇的啟發式權重")
+    parser.add_argument("--generations", type=int, default=20, help="要訓練到的世代數")
+    parser.add_argument("--population", type=int, default=24, help="每個世代的候選數量")
+    parser.add_argument("--games", type=int, default=8, help="每個候選每個世代進行的局數")
+    parser.add_argument("--sigma", type=float, default=0.5, help="突變的標準差 (相對於權重大小)")
+    parser.add_argument("--snakes", type=int, default=ARENA_SNAKES, help="每局的蛇數量 (含候選)")
+    parser.add_argument("--max-ticks", type=int, default=ENV_MAX_STEPS, help="每局的 tick 上限")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="平行評估的行程數 (1 表示不使用行程池)")
+    parser.add_argument("--seed", type=int, default=0, help="亂數種子")
+    parser.add_argument("--checkpoint", default="ai_training.json", help="檢查點檔案")
+    parser.add_argument("--resume", action="store_true", help="從檢查點繼續訓練")
+    parser.add_argument("--output", default="ai_weights.json", help="輸出最佳權重的檔案 (供 main.py --ai-weights 使用)")
+    args = parser.parse_args()
+    if args.resume and os.path.exists(args.checkpoint):
+        trainer = Trainer.load(args.checkpoint)
+        print(f"從第 {trainer.generation} 代繼續訓練: {args.checkpoint}")
+    else:
+        trainer = Trainer(args.population, args.games, args.sigma, args.snakes, args.max_ticks, args.seed)
+    workers = max(1, args.workers)
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+    try:
+        while trainer.generation < args.generations:
+            record = trainer.step(pool, workers)
+            trainer.save(args.checkpoint)
+            _write_json(args.output, trainer.best)
+            print(f"第 {record['generation']} 代: 最佳 {record['best_fitness']:.2f}  平均 {record['mean_fitness']:.2f}  "
+                  f"{record['games']} 局 / {record['seconds']:.1f} 秒  每核心 {record['games_per_core_second']:.1f} 局/秒")
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    print(f"最佳權重 ({trainer.best_fitness:.2f}): {json.dumps(trainer.best)}")
+
+# 程式執行入口
+if __name__ == "__main__":
+    main()